@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+from typing import Optional
+
+import redis.asyncio as redis
+from celery import Celery
+
+from config import REDIS_URL, FAIR_WINDOW_SECONDS, FAIR_SHARE_REQUESTS, FAIR_DEMOTION_STEP
+
+# Общий с ботом клиент задач backend
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai-task-common"))
+from celeryrpc import BackendRPC  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+celery_client = Celery(
+    "api-client",
+    broker=f"{REDIS_URL}/0",
+    backend=f"{REDIS_URL}/1"
+)
+
+# В Redis транспорте 0 — наивысший приоритет, как в celery_config backend
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 9
+
+celery_client.conf.task_routes = {
+    "get_user_by_google_id": {"queue": "user_auth", "priority": PRIORITY_INTERACTIVE},
+    "stream_chat_response": {"queue": "llm_tasks", "priority": PRIORITY_INTERACTIVE},
+}
+
+
+class FairPriority:
+    """Понижает приоритет задач пользователя, который за окно отправил больше fair_share запросов.
+
+    Счётчики в Redis общие для всех экземпляров API. Каждые fair_share запросов сверх нормы
+    опускают приоритет на step, но не ниже фоновых задач: тяжёлый пользователь уступает
+    остальным, а не обновлениям контекста.
+    """
+
+    def __init__(self, redis_url: str, window_seconds: int, fair_share: int, step: int):
+        self.redis_client = redis.from_url(f"{redis_url}/0", decode_responses=True)
+        self.window_seconds = window_seconds
+        self.fair_share = fair_share
+        self.step = step
+
+    async def priority(self, user_id: int, base: int = PRIORITY_INTERACTIVE) -> int:
+        window = int(time.time() // self.window_seconds)
+        key = f"fair_priority:{user_id}:{window}"
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, self.window_seconds * 2)
+                count, _ = await pipe.execute()
+        except Exception as e:
+            logger.warning("Fair priority counter error: %s", e)
+            return base
+        excess = count - self.fair_share
+        if excess <= 0:
+            return base
+        return min(base + self.step * ((excess - 1) // self.fair_share + 1), PRIORITY_BACKGROUND - 1)
+
+    async def close(self):
+        await self.redis_client.close()
+
+
+class ChatStreamHub:
+    """Читает стримы ответов для всех открытых сокетов.
+
+    Стримы делятся между читателями, у каждого не больше max_streams_per_reader ключей:
+    читатель держит одно соединение с блокирующим XREAD только по своим ключам, и новый
+    стрим будит только свой читатель. На один стрим могут подписаться несколько сокетов.
+    """
+
+    def __init__(self, redis_url: str, block_ms: int = 5000, max_streams_per_reader: int = 256):
+        self.redis_client = redis.from_url(f"{redis_url}/0", decode_responses=True)
+        self.block_ms = block_ms
+        self.max_streams_per_reader = max_streams_per_reader
+        # Ключ стрима -> {очередь подписчика: последний доставленный seq}
+        self.subscribers: dict = {}
+        self.readers: list = []
+        self._owners: dict = {}
+
+    async def start(self):
+        # Читатели создаются по мере появления стримов
+        pass
+
+    async def close(self):
+        for reader in self.readers:
+            await reader.close()
+        await self.redis_client.close()
+
+    async def subscribe(self, stream_id: str, offset: int = 0) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        key = f"chat_stream:{stream_id}"
+        reader = self._owners.get(key)
+        if reader is None:
+            reader = await self._reader_with_capacity()
+            self._owners[key] = reader
+            self.subscribers[key] = {queue: offset}
+            reader.offsets[key] = f"0-{offset}"
+            # Новый ключ попадёт в выборку со следующего XREAD
+            await reader.wake()
+        else:
+            # Стрим уже читается: читатель дочитает пропущенное этой очередью и добавит её к остальным
+            reader.joining.append((key, queue, offset))
+            await reader.wake()
+        return queue
+
+    def unsubscribe(self, stream_id: str, queue: asyncio.Queue):
+        key = f"chat_stream:{stream_id}"
+        subscribers = self.subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.pop(queue, None)
+        reader = self._owners[key]
+        reader.joining = [join for join in reader.joining if join[1] is not queue]
+        if not subscribers and not any(join[0] == key for join in reader.joining):
+            del self.subscribers[key]
+            del self._owners[key]
+            reader.offsets.pop(key, None)
+
+    async def _reader_with_capacity(self) -> "_StreamReader":
+        for reader in self.readers:
+            if len(reader.offsets) < self.max_streams_per_reader:
+                return reader
+        reader = _StreamReader(self)
+        await reader.start()
+        self.readers.append(reader)
+        return reader
+
+    def _deliver(self, key: str, entries: list):
+        subscribers = self.subscribers.get(key)
+        if subscribers is None:
+            return
+        for entry_id, fields in entries:
+            seq = int(fields["seq"])
+            message = {"seq": seq, "type": fields["type"], "data": fields.get("data", "")}
+            for queue, last_seq in subscribers.items():
+                # Очередь могла получить эту запись при дочитывании
+                if seq > last_seq:
+                    queue.put_nowait(message)
+                    subscribers[queue] = seq
+
+
+class _StreamReader:
+    """Блокирующий XREAD по части стримов ChatStreamHub и служебному стриму пробуждения"""
+
+    def __init__(self, hub: ChatStreamHub):
+        self.hub = hub
+        self.redis_client = hub.redis_client
+        self.wakeup_key = f"chat_stream_hub:wakeup:{uuid.uuid4().hex}"
+        self.wakeup_offset = "0-0"
+        self.offsets: dict = {}
+        # (ключ, очередь, seq) подписчиков уже читаемых стримов, ждущих дочитывания
+        self.joining: list = []
+        # Пробуждение уже отправлено и текущий XREAD прервётся: новые подписки его не повторяют
+        self._wakeup_pending = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.wakeup_offset = await self.redis_client.xadd(self.wakeup_key, {"wakeup": 1}, maxlen=1)
+        await self.redis_client.expire(self.wakeup_key, 86400)
+        self._task = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        await self.redis_client.delete(self.wakeup_key)
+
+    async def wake(self):
+        if self._wakeup_pending:
+            return
+        self._wakeup_pending = True
+        await self.redis_client.xadd(self.wakeup_key, {"wakeup": 1}, maxlen=1)
+
+    async def _join(self):
+        """Дочитывает каждой новой очереди записи до текущей позиции стрима и подключает её к доставке"""
+        while self.joining:
+            join = self.joining[0]
+            key, queue, offset = join
+            position = self.offsets[key]
+            entries = []
+            if offset < int(position.split("-")[1]):
+                entries = await self.redis_client.xrange(key, min=f"0-{offset + 1}", max=position)
+            # Подписчик мог отписаться, пока шло дочитывание
+            if join not in self.joining:
+                continue
+            self.joining.remove(join)
+            last_seq = offset
+            for entry_id, fields in entries:
+                last_seq = int(fields["seq"])
+                queue.put_nowait({"seq": last_seq, "type": fields["type"], "data": fields.get("data", "")})
+            self.hub.subscribers[key][queue] = last_seq
+
+    async def _read_loop(self):
+        while True:
+            try:
+                await self._join()
+                self._wakeup_pending = False
+                streams = {self.wakeup_key: self.wakeup_offset, **self.offsets}
+                response = await self.redis_client.xread(streams, block=self.hub.block_ms, count=100)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Chat stream hub read error: %s", e)
+                await asyncio.sleep(1)
+                continue
+
+            for key, entries in response or []:
+                if key == self.wakeup_key:
+                    self.wakeup_offset = entries[-1][0]
+                    continue
+                if key not in self.offsets:
+                    continue
+                self.offsets[key] = entries[-1][0]
+                self.hub._deliver(key, entries)
+
+
+backend_rpc = BackendRPC(REDIS_URL, celery_client)
+chat_stream_hub = ChatStreamHub(REDIS_URL)
+fair_priority = FairPriority(REDIS_URL, FAIR_WINDOW_SECONDS, FAIR_SHARE_REQUESTS, FAIR_DEMOTION_STEP)
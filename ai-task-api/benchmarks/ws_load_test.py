@@ -0,0 +1,128 @@
+"""WebSocket load test for /ws/{task_id} against a fake backend.
+
+The fake backend consumes Celery messages straight from the Redis broker, answers
+get_user_by_google_id through the result backend and writes stream_chat_response
+chunks into chat_stream:<stream_id>, so no backend workers, Postgres or LLM are needed.
+
+    pip install -r requirements-bench.txt
+    uvicorn main:app --port 8000 &
+    python -m benchmarks.ws_load_test --url ws://127.0.0.1:8000 --sockets 3000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+import redis.asyncio as redis
+import websockets
+
+from config import REDIS_URL
+
+PRIORITY_SEPARATOR = "\x06\x16"
+QUEUES = ["user_auth", "llm_tasks"]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))] if ordered else 0.0
+
+
+class FakeBackend:
+    def __init__(self, chunks: int, chunk_delay: float, workers: int):
+        self.broker = redis.from_url(f"{REDIS_URL}/0", decode_responses=True)
+        self.results = redis.from_url(f"{REDIS_URL}/1", decode_responses=True)
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.workers = workers
+        self.queue_keys = [f"{queue}{PRIORITY_SEPARATOR}{priority}" if priority else queue for queue in QUEUES for priority in range(10)]
+
+    async def run(self):
+        await asyncio.gather(*(self._consume() for _ in range(self.workers)))
+
+    async def _consume(self):
+        while True:
+            popped = await self.broker.brpop(self.queue_keys, timeout=1)
+            if not popped:
+                continue
+            message = json.loads(popped[1])
+            args, _, _ = json.loads(base64.b64decode(message["body"]))
+            headers = message["headers"]
+            asyncio.create_task(self._handle(headers["task"], headers["id"], args))
+
+    async def _handle(self, name: str, task_id: str, args: list):
+        if name == "get_user_by_google_id":
+            await self._store_result(task_id, {"id": 1, "google_id": args[0]})
+        elif name == "stream_chat_response":
+            stream_key = f"chat_stream:{args[3]}"
+            for seq in range(1, self.chunks + 1):
+                await asyncio.sleep(self.chunk_delay)
+                await self.broker.xadd(stream_key, {"seq": seq, "type": "chunk", "data": f"token{seq} "}, id=f"0-{seq}")
+            await self.broker.xadd(stream_key, {"seq": self.chunks + 1, "type": "done", "data": ""}, id=f"0-{self.chunks + 1}")
+            await self.broker.expire(stream_key, 600)
+
+    async def _store_result(self, task_id: str, result):
+        key = f"celery-task-meta-{task_id}"
+        meta = json.dumps({
+            "status": "SUCCESS",
+            "result": result,
+            "traceback": None,
+            "children": [],
+            "date_done": datetime.now(timezone.utc).isoformat(),
+            "task_id": task_id
+        })
+        await self.results.set(key, meta, ex=600)
+        await self.results.publish(key, meta)
+
+
+async def run_socket(url: str, index: int, stats: dict):
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(f"{url}/ws/{index % 100 + 1}?google_id=load-{index}", open_timeout=60) as socket:
+            await socket.recv()  # connected
+            sent = time.perf_counter()
+            await socket.send(json.dumps({"type": "chat_message", "message": "ping"}))
+            first_chunk = None
+            while True:
+                frame = json.loads(await socket.recv())
+                if frame["type"] == "response_chunk" and first_chunk is None:
+                    first_chunk = time.perf_counter() - sent
+                if frame["type"] in ("response_complete", "error"):
+                    break
+            stats["first_chunk"].append(first_chunk or 0.0)
+            stats["complete"].append(time.perf_counter() - sent)
+            stats["connect"].append(sent - started)
+    except Exception as e:
+        stats["errors"].append(str(e))
+
+
+async def main(args):
+    backend = FakeBackend(args.chunks, args.chunk_delay, args.backend_workers)
+    backend_task = asyncio.create_task(backend.run())
+
+    stats = {"connect": [], "first_chunk": [], "complete": [], "errors": []}
+    started = time.perf_counter()
+    await asyncio.gather(*(run_socket(args.url, index, stats) for index in range(args.sockets)))
+    elapsed = time.perf_counter() - started
+    backend_task.cancel()
+
+    print(f"sockets={args.sockets} completed={len(stats['complete'])} errors={len(stats['errors'])} wall={elapsed:.2f}s")
+    for name in ("connect", "first_chunk", "complete"):
+        values = stats[name]
+        if values:
+            print(f"{name:<12} mean={statistics.fmean(values) * 1000:8.1f}ms p50={percentile(values, 50) * 1000:8.1f}ms "
+                  f"p95={percentile(values, 95) * 1000:8.1f}ms p99={percentile(values, 99) * 1000:8.1f}ms")
+    if stats["errors"]:
+        print(f"first error: {stats['errors'][0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--sockets", type=int, default=3000)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    parser.add_argument("--backend-workers", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
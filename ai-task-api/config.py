@@ -9,10 +9,28 @@ class Settings:
         self.google_client_id = os.getenv("GOOGLE_CLIENT_ID", "")
         self.google_client_secret = os.getenv("GOOGLE_CLIENT_SECRET", "")
         self.google_redirect_uri = os.getenv("GOOGLE_REDIRECT_URI", "")
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        # Сверх fair_share запросов за окно приоритет задач пользователя понижается
+        self.fair_window_seconds = int(os.getenv("FAIR_WINDOW_SECONDS", "60"))
+        self.fair_share_requests = int(os.getenv("FAIR_SHARE_REQUESTS", "20"))
+        self.fair_demotion_step = int(os.getenv("FAIR_DEMOTION_STEP", "2"))
+        self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        # Уровни отдельных логгеров: "main=DEBUG,backendclient=WARNING"
+        self.log_levels = os.getenv("LOG_LEVELS", "")
+        self.log_format = os.getenv("LOG_FORMAT", "text")
+        self.log_debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
 
 GOOGLE_CLIENT_ID = Settings().google_client_id
 GOOGLE_CLIENT_SECRET = Settings().google_client_secret
 GOOGLE_REDIRECT_URI = Settings().google_redirect_uri
+REDIS_URL = Settings().redis_url
+FAIR_WINDOW_SECONDS = Settings().fair_window_seconds
+FAIR_SHARE_REQUESTS = Settings().fair_share_requests
+FAIR_DEMOTION_STEP = Settings().fair_demotion_step
+LOG_LEVEL = Settings().log_level
+LOG_LEVELS = Settings().log_levels
+LOG_FORMAT = Settings().log_format
+LOG_DEBUG_SAMPLE_RATE = Settings().log_debug_sample_rate
 GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
 GOOGLE_USER_INFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
@@ -7,9 +7,22 @@ from pydantic import BaseModel
 from typing import Optional
 import json
 import asyncio
+import logging
+import os
+import sys
+import uuid
 from datetime import datetime, timedelta
 
 from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI, GOOGLE_AUTH_URL, GOOGLE_TOKEN_URL, GOOGLE_USER_INFO_URL
+from backendclient import backend_rpc, chat_stream_hub, fair_priority
+# Общая с backend настройка логирования
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai-task-common"))
+from logsetup import configure_logging  # noqa: E402
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+CHAT_STREAM_IDLE_TIMEOUT = 300
 
 class User(BaseModel):
     email: str
@@ -31,9 +44,14 @@ class Task(CreateTask):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("API microservice started")
+    await backend_rpc.start()
+    await chat_stream_hub.start()
+    logger.info("API microservice started")
     yield
-    print("API microservice ended")
+    await chat_stream_hub.close()
+    await backend_rpc.close()
+    await fair_priority.close()
+    logger.info("API microservice ended")
 
 app = FastAPI(title="AI Task Manager API", lifespan=lifespan)
 
@@ -47,12 +65,13 @@ app.add_middleware(
 
 @app.options("/{path:path}")
 async def options_handler(path: str):
-    print(f"🔧 OPTIONS request for path: {path}")
+    logger.debug("OPTIONS request for path: %s", path)
     return {"message": "OK"}
 
 @app.middleware("http")
 async def cors_debug_middleware(request, call_next):
-    print(f"📡 {request.method} {request.url} - Origin: {request.headers.get('origin', 'No Origin')}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s %s - Origin: %s", request.method, request.url, request.headers.get('origin', 'No Origin'))
 
     if request.method == "OPTIONS":
         from fastapi.responses import Response
@@ -61,7 +80,7 @@ async def cors_debug_middleware(request, call_next):
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "*"
         response.headers["Access-Control-Max-Age"] = "600"
-        print(f"📤 Preflight response sent")
+        logger.debug("Preflight response sent")
         return response
     
     response = await call_next(request)
@@ -70,7 +89,7 @@ async def cors_debug_middleware(request, call_next):
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Headers"] = "*"
     
-    print(f"📤 Response status: {response.status_code}")
+    logger.debug("Response status: %s", response.status_code)
     return response
 
 @app.get("/health")
@@ -79,22 +98,22 @@ async def health_check():
 
 @app.websocket("/ws/test")
 async def websocket_test(websocket: WebSocket):
-    print("🔌 Test WebSocket connection attempt")
+    logger.info("Test WebSocket connection attempt")
     try:
         await websocket.accept()
-        print("✅ Test WebSocket accepted")
+        logger.info("Test WebSocket accepted")
         await websocket.send_json({"type": "test", "message": "WebSocket works!"})
         
         while True:
             try:
                 data = await websocket.receive_json()
-                print(f"📨 Test WebSocket received: {data}")
+                logger.debug("Test WebSocket received: %s", data)
                 await websocket.send_json({"type": "echo", "message": f"Echo: {data}"})
             except WebSocketDisconnect:
-                print("🔌 Test WebSocket disconnected")
+                logger.info("Test WebSocket disconnected")
                 break
     except Exception as e:
-        print(f"❌ Test WebSocket error: {e}")
+        logger.error("Test WebSocket error: %s", e)
         try:
             await websocket.send_json({"type": "error", "message": str(e)})
         except:
@@ -229,49 +248,94 @@ async def auth_google_callback(code: str):
     """
     return HTMLResponse(content=html_content)
 
+async def relay_chat_stream(websocket: WebSocket, stream_id: str, queue: asyncio.Queue):
+    """Пересылает события стрима ответа в сокет до маркера завершения"""
+    full_response = ""
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), CHAT_STREAM_IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            await websocket.send_json({"type": "error", "stream_id": stream_id, "message": "Response timed out"})
+            return
+        if event["type"] == "chunk":
+            full_response += event["data"]
+            await websocket.send_json({
+                "type": "response_chunk",
+                "chunk": event["data"],
+                "seq": event["seq"],
+                "full_response": full_response
+            })
+        elif event["type"] == "reset":
+            full_response = ""
+            await websocket.send_json({"type": "response_reset", "seq": event["seq"]})
+        elif event["type"] == "done":
+            await websocket.send_json({
+                "type": "response_complete",
+                "stream_id": stream_id,
+                "full_response": full_response
+            })
+            return
+        elif event["type"] == "error":
+            await websocket.send_json({"type": "error", "stream_id": stream_id, "message": event["data"]})
+            return
+
 @app.websocket("/ws/{task_id}")
 async def websocket_endpoint(websocket: WebSocket, task_id: int, google_id: str):
-    print(f"🔌 WebSocket connection attempt for task {task_id}, google_id: {google_id}")
+    logger.info("WebSocket connection attempt for task %s, google_id: %s", task_id, google_id)
     
     try:
         await websocket.accept()
-        print(f"✅ WebSocket accepted for task {task_id}")
+        logger.info("WebSocket accepted for task %s", task_id)
+
+        user = await backend_rpc.call("get_user_by_google_id", [google_id])
+        if not user:
+            await websocket.send_json({"type": "error", "message": "User not found"})
+            await websocket.close()
+            return
         
         await websocket.send_json({"type": "connected", "task_id": task_id})
-        print(f"📡 WebSocket connected successfully for task {task_id}")
+        logger.debug("WebSocket connected successfully for task %s", task_id)
         
         while True:
             try:
                 data = await websocket.receive_json()
-                print(f"📨 Received WebSocket message: {data}")
+                logger.debug("Received WebSocket message: %s", data)
                 
                 if data["type"] == "chat_message":
                     prompt = data["message"]
+                    # use_cache=false — запросить новый ответ в обход кэша ответов LLM
+                    use_cache = bool(data.get("use_cache", True))
+                    stream_id = uuid.uuid4().hex
                     
-                    await websocket.send_json({
-                        "type": "response_start",
-                        "message": prompt
-                    })
-                    
-                    # TODO: Здесь будет отправка в RabbitMQ для backend микросервиса
-                    # Пока что возвращаем заглушку
-                    await websocket.send_json({
-                        "type": "response_chunk",
-                        "chunk": "Сообщение получено. RabbitMQ интеграция в разработке...",
-                        "full_response": "Сообщение получено. RabbitMQ интеграция в разработке..."
-                    })
-                    
-                    await websocket.send_json({
-                        "type": "response_complete",
-                        "full_response": "Сообщение получено. RabbitMQ интеграция в разработке..."
-                    })
+                    # Подписываемся до отправки задачи, чтобы не пропустить первые чанки
+                    queue = await chat_stream_hub.subscribe(stream_id)
+                    try:
+                        priority = await fair_priority.priority(user["id"])
+                        await backend_rpc.send("stream_chat_response", [task_id, user["id"], prompt, stream_id, use_cache], priority=priority)
+                        await websocket.send_json({
+                            "type": "response_start",
+                            "message": prompt,
+                            "stream_id": stream_id
+                        })
+                        await relay_chat_stream(websocket, stream_id, queue)
+                    finally:
+                        chat_stream_hub.unsubscribe(stream_id, queue)
+
+                elif data["type"] == "resume":
+                    # Переподключение: дочитываем ответ с последнего полученного seq
+                    stream_id = data["stream_id"]
+                    queue = await chat_stream_hub.subscribe(stream_id, offset=int(data.get("offset", 0)))
+                    try:
+                        await relay_chat_stream(websocket, stream_id, queue)
+                    finally:
+                        chat_stream_hub.unsubscribe(stream_id, queue)
                     
             except WebSocketDisconnect:
-                print(f"🔌 WebSocket disconnected for task {task_id}")
+                logger.info("WebSocket disconnected for task %s", task_id)
                 break
                 
     except Exception as e:
-        print(f"❌ WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         try:
             await websocket.send_json({"type": "error", "message": str(e)})
         except:
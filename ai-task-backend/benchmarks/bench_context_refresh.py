@@ -0,0 +1,81 @@
+"""Time-to-first-token for a chat turn on a stale task context: sync regeneration vs stale-while-revalidate.
+
+Needs local Postgres/Redis (DATABASE_URL, REDIS_URL); the LLM is a fake in-process server:
+
+    python -m benchmarks.bench_context_refresh --turns 50 --latency 0.8
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+FAKE_PORT = 8089
+os.environ.setdefault("LLM_BASE_URL", f"http://127.0.0.1:{FAKE_PORT}/v1")
+os.environ.setdefault("LLM_TOKEN", "fake")
+
+from benchmarks.common import print_summary
+from benchmarks.fake_llm_server import FakeLLMServer
+from config import DATABASE_URL, REDIS_URL
+from databasemanager import DatabaseManager
+from llmmanager import LLMManager
+from redismanager import RedisManager
+
+
+async def first_token_latency(llm_manager: LLMManager, task: dict, background: bool) -> float:
+    started = time.perf_counter()
+    if background:
+        task_context = await llm_manager.get_fresh_task_context(task)
+        if task_context is None:
+            task_context = await llm_manager.get_last_good_context(task)
+    else:
+        task_context = await llm_manager.resolve_task_context(task)
+
+    stream = llm_manager.stream_answer("What should I do next?", task_context)
+    await stream.__anext__()
+    elapsed = time.perf_counter() - started
+    await stream.aclose()
+    return elapsed
+
+
+async def run(turns: int, latency: float):
+    server = await FakeLLMServer(latency=latency).start(port=FAKE_PORT)
+    db_manager = DatabaseManager(DATABASE_URL)
+    redis_manager = RedisManager(REDIS_URL)
+    llm_manager = LLMManager(db=db_manager, redis=redis_manager)
+    await db_manager.init_db()
+    await redis_manager.init_redis()
+
+    user = await db_manager.create_telegram_user(random.randint(10**8, 2 * 10**9), "benchmark")
+    created = await db_manager.create_task("Benchmark task", "Measure time to first token", user["id"])
+    for index in range(3):
+        await db_manager.create_exchange(created["id"], user["id"], f"question {index}", "answer " * 50)
+
+    try:
+        for label, background in (("before: sync refresh", False), ("after: stale-while-revalidate", True)):
+            latencies = []
+            for _ in range(turns):
+                # Ручная правка помечает контекст устаревшим
+                await db_manager.update_task_context(created["id"], user["id"], "Previously generated context")
+                await llm_manager.invalidate_task_cache(created["id"], user["id"])
+                task = await db_manager.get_task(created["id"], user["id"])
+                latencies.append(await first_token_latency(llm_manager, task, background))
+            print_summary(label, latencies)
+    finally:
+        await db_manager.delete_task(created["id"], user["id"])
+        await llm_manager.close()
+        await redis_manager.close()
+        await db_manager.close()
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.8)
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""End-to-end load test of the Celery pipelines with real workers.
+
+Needs local Postgres and Redis (DATABASE_URL, REDIS_URL); the LLM is the in-process fake
+server, and workers are started as subprocesses pointed at it:
+
+    python -m benchmarks.bench_e2e --mix chat-heavy --duration 60 --clients 32 --workers 2
+    python -m benchmarks.bench_e2e --mix read-heavy --baseline benchmarks/results/e2e-read-heavy-<ts>.json
+    python -m benchmarks.bench_e2e --mix read-heavy --worker-env DATABASE_ECHO=true --worker-env LOG_LEVEL=DEBUG
+
+Worker profiles (celery_config.WORKER_PROFILES) are compared by running the same mix with
+--profiles all and then --profiles llm,db --baseline <the first result>.
+
+Phases:
+  1. probe — every task of the mix runs once in-process; DatabaseManager.statement_count and
+     RedisManager.round_trip_count (REDIS_COUNT_ROUND_TRIPS, set by this script) give DB
+     statements and Redis round-trips per task;
+  2. load — --clients threads send tasks by the mix weights for --duration seconds and wait
+     for results; throughput and p50/p95/p99 latency (send → result) per task name.
+
+Results are written to benchmarks/results/e2e-<mix>-<timestamp>.json (or --output).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+FAKE_PORT = 8089
+os.environ.setdefault("LLM_BASE_URL", f"http://127.0.0.1:{FAKE_PORT}/v1")
+os.environ.setdefault("LLM_TOKEN", "fake")
+os.environ.setdefault("REDIS_COUNT_ROUND_TRIPS", "true")
+
+import celery_tasks.llm_management  # noqa: F401 — регистрация задач для probe
+import celery_tasks.task_management  # noqa: F401
+import celery_tasks.user_management  # noqa: F401
+from benchmarks.bench_llm_concurrency import start_fake_server
+from benchmarks.common import summarize
+from benchmarks.fake_llm_server import add_server_arguments, server_options
+from celery_config import celery_app
+from worker_lifecycle import get_db_manager, get_redis_manager, run_async, shutdown_resources
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class Fixture:
+    """Пользователи и задачи, на которых работает нагрузка"""
+
+    def __init__(self, users: list, tasks: list):
+        self.users = users
+        self.tasks = tasks
+        self.random = random.Random(42)
+
+    def user(self) -> dict:
+        return self.random.choice(self.users)
+
+    def task(self) -> dict:
+        return self.random.choice(self.tasks)
+
+
+def _chat(fixture: Fixture) -> list:
+    task = fixture.task()
+    return [task["id"], task["user_id"], f"question {fixture.random.randint(1, 50)}"]
+
+
+def _stream(fixture: Fixture) -> list:
+    task = fixture.task()
+    return [task["id"], task["user_id"], f"streamed question {fixture.random.randint(1, 50)}", uuid.uuid4().hex]
+
+
+def _create_task(fixture: Fixture) -> list:
+    return ["Benchmark task", "Created under load", fixture.user()["id"]]
+
+
+def _user_tasks(fixture: Fixture) -> list:
+    return [fixture.user()["id"]]
+
+
+def _task_by_id(fixture: Fixture) -> list:
+    task = fixture.task()
+    return [task["id"], task["user_id"]]
+
+
+def _task_exchanges(fixture: Fixture) -> list:
+    task = fixture.task()
+    return [task["id"], task["user_id"]]
+
+
+def _public_tasks(fixture: Fixture) -> list:
+    return []
+
+
+def _auth_existing(fixture: Fixture) -> list:
+    return [fixture.user()["telegram_id"], "benchmark", "", "", "", "", "", ""]
+
+
+def _auth_new(fixture: Fixture) -> list:
+    return [fixture.random.randint(2 * 10**9, 2**31 - 1), "benchmark", "", "", "", "", "", ""]
+
+
+def _user_by_telegram_id(fixture: Fixture) -> list:
+    return [fixture.user()["telegram_id"]]
+
+
+# Вес и генератор аргументов для каждой задачи смеси; authenticate_telegram_user (new) создаёт пользователей
+MIXES = {
+    "chat-heavy": {
+        "process_chat": (50, _chat),
+        "stream_chat_response": (20, _stream),
+        "get_user_tasks": (10, _user_tasks),
+        "get_task_by_id": (10, _task_by_id),
+        "create_new_task": (5, _create_task),
+        "get_task_exchanges": (5, _task_exchanges),
+    },
+    "read-heavy": {
+        "get_user_tasks": (40, _user_tasks),
+        "get_task_by_id": (20, _task_by_id),
+        "get_task_exchanges": (20, _task_exchanges),
+        "get_public_tasks": (10, _public_tasks),
+        "process_chat": (5, _chat),
+        "create_new_task": (5, _create_task),
+    },
+    "auth-burst": {
+        "authenticate_telegram_user": (60, _auth_existing),
+        "authenticate_telegram_user (new)": (10, _auth_new),
+        "get_user_by_telegram_id": (30, _user_by_telegram_id),
+    },
+}
+
+
+def task_name(label: str) -> str:
+    return label.split(" (")[0]
+
+
+def seed(users: int, tasks_per_user: int) -> Fixture:
+    db_manager = get_db_manager()
+    run_async(db_manager.init_db())
+    created_users, created_tasks = [], []
+    for _ in range(users):
+        user = run_async(db_manager.create_telegram_user(random.randint(10**8, 2 * 10**9), "benchmark"))
+        created_users.append(user)
+        for index in range(tasks_per_user):
+            created_tasks.append(run_async(db_manager.create_task(f"Task {index}", "Seeded for the e2e benchmark", user["id"], private=index % 2 == 0)))
+    return Fixture(created_users, created_tasks)
+
+
+def probe(mix: dict, fixture: Fixture) -> dict:
+    """Обращения к БД и Redis за одно выполнение задачи (в процессе, без брокера)"""
+    db_manager, redis_manager = get_db_manager(), get_redis_manager()
+    round_trips = {}
+    for label, (_, make_args) in mix.items():
+        statements, transactions, redis_trips = db_manager.statement_count, db_manager.transaction_count, redis_manager.round_trip_count
+        celery_app.tasks[task_name(label)](*make_args(fixture))
+        round_trips[label] = {
+            "db_statements": db_manager.statement_count - statements,
+            "db_transactions": db_manager.transaction_count - transactions,
+            "redis_round_trips": redis_manager.round_trip_count - redis_trips,
+        }
+    return round_trips
+
+
+def start_workers(count: int, concurrency: int, extra_env: list, profiles: list) -> list:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Счётчик round-trip нужен только probe в этом процессе; воркеры запускаются как в продакшене
+    env = dict({key: value for key, value in os.environ.items() if key != "REDIS_COUNT_ROUND_TRIPS"}, **dict(item.split("=", 1) for item in extra_env))
+    if profiles:
+        # По одному воркеру на профиль, запуск как в продакшене
+        return [
+            subprocess.Popen([sys.executable, "worker.py", profile, "-n", f"bench-{profile}@%h", "--loglevel=WARNING"], cwd=backend_dir, env=env)
+            for profile in profiles
+        ]
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "celery", "-A", "celery_config", "worker",
+             "-Q", "user_auth,task_management,llm_tasks", "-P", "threads", "-c", str(concurrency),
+             "-n", f"bench{index}@%h", "--loglevel=WARNING"],
+            cwd=backend_dir,
+            env=env
+        )
+        for index in range(count)
+    ]
+
+
+def run_load(mix: dict, fixture: Fixture, clients: int, duration: float, timeout: float) -> dict:
+    labels = list(mix)
+    weights = [mix[label][0] for label in labels]
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def _client(seed_value: int):
+        rng = random.Random(seed_value)
+        while time.monotonic() < deadline:
+            label = rng.choices(labels, weights)[0]
+            with lock:
+                args = mix[label][1](fixture)
+            started = time.perf_counter()
+            try:
+                celery_app.send_task(task_name(label), args=args).get(timeout=timeout)
+                with lock:
+                    latencies[label].append(time.perf_counter() - started)
+            except Exception as e:
+                with lock:
+                    errors[label] += 1
+                print(f"❌ {label}: {e}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(_client, range(clients)))
+    elapsed = time.perf_counter() - started
+
+    per_task = {
+        label: {**summarize(latencies[label]), "errors": errors[label], "throughput_per_s": round(len(latencies[label]) / elapsed, 2)}
+        for label in labels
+    }
+    completed = sum(len(values) for values in latencies.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "completed": completed,
+        "errors": sum(errors.values()),
+        "throughput_per_s": round(completed / elapsed, 2),
+        "all": summarize([value for values in latencies.values() for value in values]),
+        "per_task": per_task,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"\n{results['mix']}: {results['load']['throughput_per_s']} tasks/s, "
+          f"{results['load']['completed']} completed, {results['load']['errors']} errors")
+    print(f"{'task':<36} {'n':>6} {'tput/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'db':>4} {'redis':>6}")
+    for label, stats in results["load"]["per_task"].items():
+        trips = results["round_trips"].get(label, {})
+        line = (f"{label:<36} {stats['count']:>6} {stats['throughput_per_s']:>8} {stats['p50_ms']:>9.1f} "
+                f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {trips.get('db_statements', '-'):>4} {trips.get('redis_round_trips', '-'):>6}")
+        previous = (baseline or {}).get("load", {}).get("per_task", {}).get(label)
+        if previous and previous["p95_ms"]:
+            line += f"  p95 {stats['p95_ms'] / previous['p95_ms'] - 1:+.0%} vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="chat-heavy")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes to start; 0 uses already running workers")
+    parser.add_argument("--worker-concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks-per-user", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--profiles", default="", help="comma-separated worker profiles to start instead of --workers generic workers")
+    parser.add_argument("--worker-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the started workers, e.g. DATABASE_ECHO=true")
+    parser.add_argument("--output", default="")
+    parser.add_argument("--baseline", default="", help="earlier results JSON to compare p95 against")
+    add_server_arguments(parser)
+    parser.set_defaults(latency=0.2)
+    args = parser.parse_args()
+
+    mix = MIXES[args.mix]
+    start_fake_server(server_options(args))
+    workers = start_workers(args.workers, args.worker_concurrency, args.worker_env, [name for name in args.profiles.split(",") if name])
+    try:
+        fixture = seed(args.users, args.tasks_per_user)
+        round_trips = probe(mix, fixture)
+        load = run_load(mix, fixture, args.clients, args.duration, args.timeout)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait(timeout=30)
+        shutdown_resources()
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    results = {
+        "mix": args.mix,
+        "timestamp": timestamp,
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "round_trips": round_trips,
+        "load": load,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{args.mix}-{timestamp}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"\n✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""History loading for context building: full exchange log vs the SQL-truncated recent window.
+
+Seeds one task with --exchanges rows (responses of --response-chars characters) and
+compares the old full-history query with DatabaseManager.get_recent_exchanges:
+
+    python -m benchmarks.bench_history_window --exchanges 10000 --iterations 50
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import print_summary
+from config import DATABASE_URL
+from databasemanager import DatabaseManager, RESPONSE_SUMMARY_CHARS
+
+
+async def load_full_history(db_manager: DatabaseManager, task_id: int, user_id: int) -> int:
+    # Прежний путь generate_task_context: вся история, усечение в Python
+    async with db_manager.engine.begin() as conn:
+        result = await conn.execute(text("""
+            SELECT id, prompt, response, created_at FROM exchanges
+            WHERE task_id = :task_id AND user_id = :user_id
+            ORDER BY created_at ASC
+        """), {"task_id": task_id, "user_id": user_id})
+        history = [{"prompt": row[1], "response": row[2]} for row in result.fetchall()]
+    window = [exchange["response"][:RESPONSE_SUMMARY_CHARS] for exchange in history[-3:]]
+    return len(window)
+
+
+async def run(exchanges: int, response_chars: int, iterations: int):
+    db_manager = DatabaseManager(DATABASE_URL)
+    await db_manager.init_db()
+    user = await db_manager.create_telegram_user(random.randint(10**8, 2 * 10**9), "benchmark")
+    task = await db_manager.create_task("History benchmark", "Long-running task", user["id"])
+    try:
+        async with db_manager.engine.begin() as conn:
+            await conn.execute(text("""
+                INSERT INTO exchanges (task_id, user_id, prompt, response, response_summary, created_at)
+                SELECT :task_id, :user_id, 'prompt ' || g, repeat('x', :chars), LEFT(repeat('x', :chars), 100) || '...',
+                       NOW() - ((:total - g) || ' seconds')::interval
+                FROM generate_series(1, :total) g
+            """), {"task_id": task["id"], "user_id": user["id"], "chars": response_chars, "total": exchanges})
+        async with db_manager.engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("ANALYZE exchanges"))
+
+        for label, loader in (
+            ("before: full history", lambda: load_full_history(db_manager, task["id"], user["id"])),
+            ("after: recent window", lambda: db_manager.get_recent_exchanges(task["id"], user["id"], limit=3)),
+        ):
+            latencies = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                await loader()
+                latencies.append(time.perf_counter() - started)
+            print_summary(label, latencies)
+    finally:
+        await db_manager.delete_task(task["id"], user["id"])
+        await db_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--exchanges", type=int, default=10000)
+    parser.add_argument("--response-chars", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.exchanges, args.response_chars, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""LLM throughput per worker process: blocking OpenAI client vs the async LLMManager path.
+
+Starts a fake completion server in-process, so no network access or API key is needed:
+
+    python -m benchmarks.bench_llm_concurrency --requests 200 --latency 0.5
+    python -m benchmarks.bench_llm_concurrency --requests 200 --ttft 0.3 --tps 40 --answer-words 100
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FAKE_PORT = 8089
+os.environ.setdefault("LLM_BASE_URL", f"http://127.0.0.1:{FAKE_PORT}/v1")
+os.environ.setdefault("LLM_TOKEN", "fake")
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/benchmark")
+
+from openai import OpenAI
+
+from benchmarks.fake_llm_server import FakeLLMServer, add_server_arguments, server_options
+from config import LLM_BASE_URL, LLM_MAX_IN_FLIGHT, LLM_TOKEN
+from llmmanager import LLMManager
+
+
+def start_fake_server(options: dict) -> FakeLLMServer:
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    server = FakeLLMServer(**options)
+
+    async def _start():
+        await server.start(port=FAKE_PORT)
+        started.set()
+
+    threading.Thread(target=lambda: (loop.run_until_complete(_start()), loop.run_forever()), daemon=True).start()
+    started.wait()
+    return server
+
+
+def run_blocking_client(requests: int, worker_concurrency: int) -> float:
+    # Старый путь: синхронный клиент, параллелизм ограничен worker_concurrency
+    client = OpenAI(api_key=LLM_TOKEN, base_url=LLM_BASE_URL)
+
+    def _call(_):
+        client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=10
+        )
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=worker_concurrency) as pool:
+        list(pool.map(_call, range(requests)))
+    return time.perf_counter() - started
+
+
+async def run_async_manager(requests: int) -> float:
+    llm_manager = LLMManager()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(llm_manager.get_answer("ping", "benchmark context") for _ in range(requests)))
+        return time.perf_counter() - started
+    finally:
+        await llm_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--worker-concurrency", type=int, default=2)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    start_fake_server(server_options(args))
+
+    blocking = run_blocking_client(args.requests, args.worker_concurrency)
+    print(f"before: blocking client x{args.worker_concurrency}  {args.requests / blocking:8.1f} req/s ({blocking:.2f}s)")
+
+    async_elapsed = asyncio.run(run_async_manager(args.requests))
+    print(f"after:  async LLMManager x{LLM_MAX_IN_FLIGHT:<3} {args.requests / async_elapsed:8.1f} req/s ({async_elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
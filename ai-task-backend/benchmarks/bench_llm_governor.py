@@ -0,0 +1,98 @@
+"""Several workers hammering a provider at capacity: per-worker client retries vs the shared governor.
+
+Needs local Redis (REDIS_URL). The fake server answers 429 above --max-concurrent requests
+in flight. --workers LLMManager instances (one per simulated worker process, each with
+its own provider client) run --callers concurrent get_answer loops for --duration seconds:
+
+  - retries:  governor off, every client retries 429 on its own (LLM_MAX_RETRIES)
+  - governor: shared LLMGovernor, clients do not retry, AIMD finds the capacity
+
+    python -m benchmarks.bench_llm_governor --workers 4 --callers 32 --max-concurrent 40 --duration 20
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.bench_llm_concurrency import start_fake_server
+from benchmarks.common import print_summary
+from benchmarks.fake_llm_server import add_server_arguments, server_options
+from config import LLM_BASE_URL, LLM_MAX_RETRIES, LLM_MODEL, LLM_TOKEN, REDIS_URL
+from llmgovernor import INTERACTIVE, BACKGROUND, LLMGovernor, LLMRateLimited
+from llmmanager import LLMManager
+from llmproviders import OpenAICompatibleProvider
+from redismanager import LLM_GOVERNOR_KEYS, RedisManager
+
+
+async def run_scenario(args, use_governor: bool) -> dict:
+    redis_manager = RedisManager(REDIS_URL)
+    await redis_manager.init_redis()
+    await redis_manager.redis_client.delete(*LLM_GOVERNOR_KEYS)
+    managers = []
+    for _ in range(args.workers):
+        provider = OpenAICompatibleProvider(LLM_MODEL, LLM_TOKEN, LLM_BASE_URL, max_retries=0 if use_governor else LLM_MAX_RETRIES)
+        manager = LLMManager(redis=redis_manager, provider=provider)
+        if use_governor:
+            manager.governor = LLMGovernor(
+                redis_manager,
+                rpm=args.rpm,
+                tpm=0,
+                concurrency=(args.initial_concurrency, 1, 1000),
+                latency_target=args.latency_target,
+                background_share=0.5,
+                max_wait={INTERACTIVE: args.max_wait, BACKGROUND: 0}
+            )
+        managers.append(manager)
+
+    latencies, outcomes = [], {"ok": 0, "error": 0, "rejected": 0}
+    deadline = time.monotonic() + args.duration
+
+    async def _caller(manager: LLMManager):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                answer = await manager.get_answer("ping", "benchmark context", use_cache=False)
+            except LLMRateLimited:
+                outcomes["rejected"] += 1
+                continue
+            if answer.startswith("🚫"):
+                outcomes["error"] += 1
+            else:
+                outcomes["ok"] += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_caller(manager) for manager in managers for _ in range(args.callers)))
+    elapsed = time.perf_counter() - started
+    limits = [manager.governor.limit for manager in managers if manager.governor]
+    for manager in managers:
+        await manager.close()
+    await redis_manager.close()
+    return {"elapsed": elapsed, "latencies": latencies, "outcomes": outcomes, "limit": limits[0] if limits else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--callers", type=int, default=32, help="concurrent callers per worker")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--initial-concurrency", type=float, default=16)
+    parser.add_argument("--latency-target", type=float, default=5)
+    parser.add_argument("--max-wait", type=float, default=15, help="how long an interactive call may wait for a slot")
+    add_server_arguments(parser)
+    parser.set_defaults(max_concurrent=40, retry_after=1.0)
+    args = parser.parse_args()
+
+    server = start_fake_server(server_options(args))
+    for label, use_governor in (("retries", False), ("governor", True)):
+        rate_limited_before = server.rate_limited
+        result = asyncio.run(run_scenario(args, use_governor))
+        outcomes = result["outcomes"]
+        print(f"\n{label}: {outcomes['ok'] / result['elapsed']:.1f} answers/s, {outcomes['error']} errors, "
+              f"{outcomes['rejected']} rejected, {server.rate_limited - rate_limited_before} 429s from the provider"
+              + (f", final limit {result['limit']:.1f}" if result["limit"] is not None else ""))
+        print_summary(label, result["latencies"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Cost of logging on the calling thread: print vs synchronous handler vs queue handler.
+
+The sink stands in for the container's stdout; --sink-delay-us makes each write block
+for that long, the way a busy log driver or a full pipe does. Each variant runs
+--threads threads emitting --events records (the shape of the old per-request prints
+and SQL echo) and reports caller-side latency and total throughput:
+
+    python -m benchmarks.bench_logging --events 20000 --threads 8 --sink-delay-us 50
+"""
+import argparse
+import logging
+import os
+import sys
+import logging.handlers
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_summary
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ai-task-common"))
+from logsetup import DebugSampler  # noqa: E402
+
+MESSAGE = "SELECT id, task_name, task_description FROM tasks WHERE id = %s AND user_id = %s"
+
+
+class SlowSink:
+    """Поток вывода, каждая запись в который блокирует на delay секунд"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def write(self, data: str):
+        with self.lock:
+            self.writes += 1
+            if self.delay:
+                time.sleep(self.delay)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def make_logger(name: str, handler: logging.Handler, level: int = logging.INFO) -> logging.Logger:
+    logger = logging.getLogger(f"bench_logging.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def run_variant(label: str, emit, events: int, threads: int) -> dict:
+    latencies = [[] for _ in range(threads)]
+
+    def _worker(index: int):
+        for event in range(events // threads):
+            started = time.perf_counter()
+            emit(event, index)
+            latencies[index].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(_worker, range(threads)))
+    elapsed = time.perf_counter() - started
+    stats = print_summary(label, [value for values in latencies for value in values])
+    print(f"{'':<28} {events / elapsed:,.0f} events/s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sink-delay-us", type=float, default=50)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    delay = args.sink_delay_us / 1e6
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(process)d] %(message)s")
+
+    sink = SlowSink(delay)
+    run_variant("print", lambda event, index: print(f"📡 {MESSAGE} {event} {index}", file=sink, flush=True), args.events, args.threads)
+
+    sync_handler = logging.StreamHandler(SlowSink(delay))
+    sync_handler.setFormatter(formatter)
+    sync_logger = make_logger("sync", sync_handler)
+    run_variant("sync StreamHandler", lambda event, index: sync_logger.info(MESSAGE, event, index), args.events, args.threads)
+
+    def _queued(name: str, level: int, sample_rate: float = 1.0):
+        output = logging.StreamHandler(SlowSink(delay))
+        output.setFormatter(formatter)
+        records = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(records)
+        queue_handler.addFilter(DebugSampler(sample_rate))
+        listener = logging.handlers.QueueListener(records, output)
+        return make_logger(name, queue_handler, level), listener
+
+    queued_logger, listener = _queued("queued", logging.INFO)
+    listener.start()
+    run_variant("QueueHandler", lambda event, index: queued_logger.info(MESSAGE, event, index), args.events, args.threads)
+    started = time.perf_counter()
+    listener.stop()
+    print(f"{'':<28} listener drained the backlog in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    sampled_logger, listener = _queued("sampled", logging.DEBUG, args.sample_rate)
+    listener.start()
+    run_variant(f"QueueHandler debug@{args.sample_rate:g}", lambda event, index: sampled_logger.debug(MESSAGE, event, index), args.events, args.threads)
+    listener.stop()
+
+    disabled_logger, listener = _queued("disabled", logging.INFO)
+    run_variant("debug below level", lambda event, index: disabled_logger.debug(MESSAGE, event, index), args.events, args.threads)
+
+
+if __name__ == "__main__":
+    main()
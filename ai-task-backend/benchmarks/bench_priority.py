@@ -0,0 +1,81 @@
+"""Latency of interactive chat while the llm_tasks queue is flooded with background work.
+
+Needs local Postgres and Redis; the LLM is the in-process fake server. One llm worker
+with a small pool is started, --background generate_task_context tasks are queued, then
+--interactive process_chat requests are sent one every --interval seconds. The run is
+repeated with every task sent at the same default priority for comparison:
+
+    python -m benchmarks.bench_priority --background 200 --interactive 30 --concurrency 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_e2e import seed
+from benchmarks.bench_llm_concurrency import start_fake_server
+from benchmarks.common import print_summary
+from benchmarks.fake_llm_server import add_server_arguments, server_options
+from celery_config import celery_app
+from worker_lifecycle import shutdown_resources
+
+DEFAULT_PRIORITY = celery_app.conf.task_default_priority
+
+
+def run_scenario(fixture, background: int, interactive: int, interval: float, timeout: float, flat: bool) -> list:
+    # В flat режиме все задачи идут с одним приоритетом, как до введения схемы приоритетов
+    options = {"priority": DEFAULT_PRIORITY} if flat else {}
+    celery_app.control.purge()
+    for _ in range(background):
+        task = fixture.task()
+        celery_app.send_task("generate_task_context", args=[task["id"], task["user_id"]], **options)
+
+    def _chat(index: int) -> float:
+        time.sleep(index * interval)
+        task = fixture.task()
+        started = time.perf_counter()
+        celery_app.send_task("process_chat", args=[task["id"], task["user_id"], f"question {index}"], **options).get(timeout=timeout)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=interactive) as pool:
+        latencies = list(pool.map(_chat, range(interactive)))
+    celery_app.control.purge()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--background", type=int, default=200)
+    parser.add_argument("--interactive", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=4, help="llm worker pool size; small, so the queue backs up")
+    parser.add_argument("--timeout", type=float, default=600)
+    add_server_arguments(parser)
+    parser.set_defaults(latency=0.5)
+    args = parser.parse_args()
+
+    start_fake_server(server_options(args))
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    worker = subprocess.Popen(
+        [sys.executable, "worker.py", "llm", "-c", str(args.concurrency), "-n", "bench-priority@%h", "--loglevel=WARNING"],
+        cwd=backend_dir
+    )
+    try:
+        fixture = seed(users=5, tasks_per_user=4)
+        results = {}
+        for label, flat in (("flat priority", True), ("interactive first", False)):
+            results[label] = run_scenario(fixture, args.background, args.interactive, args.interval, args.timeout, flat)
+    finally:
+        worker.terminate()
+        worker.wait(timeout=30)
+        shutdown_resources()
+
+    print(f"\nprocess_chat latency with {args.background} background tasks queued, llm worker -c {args.concurrency}")
+    for label, latencies in results.items():
+        print_summary(label, latencies)
+
+
+if __name__ == "__main__":
+    main()
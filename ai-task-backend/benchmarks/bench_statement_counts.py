@@ -0,0 +1,70 @@
+"""SQL statements and transactions issued per Celery task body.
+
+Runs the task functions in-process against local Postgres/Redis (DATABASE_URL, REDIS_URL)
+with a fake LLM server, and reads DatabaseManager.statement_count/transaction_count:
+
+    python -m benchmarks.bench_statement_counts
+"""
+import asyncio
+import os
+import random
+import threading
+
+FAKE_PORT = 8089
+os.environ.setdefault("LLM_BASE_URL", f"http://127.0.0.1:{FAKE_PORT}/v1")
+os.environ.setdefault("LLM_TOKEN", "fake")
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from celery_tasks.llm_management import process_chat_celery
+from celery_tasks.task_management import (
+    change_task_status_celery,
+    create_new_task_celery,
+    delete_task_by_id_celery,
+    get_task_exchanges_celery,
+    update_task_context_by_user_celery,
+    update_task_privacy_celery,
+)
+from worker_lifecycle import get_db_manager, run_async, shutdown_resources
+
+
+def start_fake_server():
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def _start():
+        await FakeLLMServer(latency=0.05).start(port=FAKE_PORT)
+        started.set()
+
+    threading.Thread(target=lambda: (loop.run_until_complete(_start()), loop.run_forever()), daemon=True).start()
+    started.wait()
+
+
+def measure(label: str, fn, *args):
+    db_manager = get_db_manager()
+    statements, transactions = db_manager.statement_count, db_manager.transaction_count
+    result = fn(*args)
+    print(f"{label:<28} statements={db_manager.statement_count - statements:<3} transactions={db_manager.transaction_count - transactions}")
+    return result
+
+
+def main():
+    start_fake_server()
+    db_manager = get_db_manager()
+    run_async(db_manager.init_db())
+    user = run_async(db_manager.create_telegram_user(random.randint(10**8, 2 * 10**9), "benchmark"))
+    try:
+        created = measure("create_new_task", create_new_task_celery, "Statement count", "Benchmark task", user["id"])
+        task_id = created["task"]["id"]
+        measure("process_chat (new context)", process_chat_celery, task_id, user["id"], "first question")
+        measure("process_chat (fresh context)", process_chat_celery, task_id, user["id"], "second question")
+        measure("get_task_exchanges", get_task_exchanges_celery, task_id, user["id"])
+        measure("change_task_status", change_task_status_celery, task_id, user["id"], "in progress")
+        measure("update_task_context_by_user", update_task_context_by_user_celery, task_id, user["id"], "edited context")
+        measure("update_task_privacy", update_task_privacy_celery, task_id, user["id"], False)
+        measure("delete_task_by_id", delete_task_by_id_celery, task_id, user["id"])
+    finally:
+        shutdown_resources()
+
+
+if __name__ == "__main__":
+    main()
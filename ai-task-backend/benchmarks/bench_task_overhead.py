@@ -0,0 +1,58 @@
+"""Per-task overhead: a fresh engine + asyncio.run per task vs long-lived worker resources.
+
+Run from ai-task-backend with DATABASE_URL / REDIS_URL pointing at local services:
+
+    python -m benchmarks.bench_task_overhead --tasks 200
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import print_summary
+from config import DATABASE_URL
+from databasemanager import DatabaseManager
+from llmmanager import LLMManager
+from worker_lifecycle import WorkerResources
+
+
+def run_per_task_resources(tasks: int) -> list:
+    latencies = []
+    for _ in range(tasks):
+        started = time.perf_counter()
+
+        async def _task():
+            db_manager = DatabaseManager(DATABASE_URL)
+            llm_manager = LLMManager(db=db_manager)
+            await db_manager.get_user_by_id(-1)
+            await llm_manager.close()
+            await db_manager.close()
+
+        asyncio.run(_task())
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_worker_resources(tasks: int) -> list:
+    resources = WorkerResources()
+    latencies = []
+    try:
+        for _ in range(tasks):
+            started = time.perf_counter()
+            resources.run(resources.db_manager.get_user_by_id(-1))
+            latencies.append(time.perf_counter() - started)
+    finally:
+        resources.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200)
+    args = parser.parse_args()
+
+    print_summary("before: per-task resources", run_per_task_resources(args.tasks))
+    print_summary("after: worker resources", run_worker_resources(args.tasks))
+
+
+if __name__ == "__main__":
+    main()
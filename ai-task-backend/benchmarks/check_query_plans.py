@@ -0,0 +1,103 @@
+"""EXPLAIN-based check that the hot DatabaseManager queries use index scans.
+
+Applies migrations, optionally seeds synthetic rows (the planner prefers sequential
+scans on tiny tables), runs ANALYZE and inspects each plan:
+
+    python -m benchmarks.check_query_plans --seed-users 2000 --tasks-per-user 20 --exchanges-per-task 20
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import text
+
+from config import DATABASE_URL
+from databasemanager import DatabaseManager
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+# Запросы совпадают с WHERE/ORDER BY соответствующих методов DatabaseManager
+HOT_QUERIES = {
+    "get_users_tasks": ("""
+        SELECT id, task_name, task_status, created_at FROM tasks
+        WHERE user_id = :user_id ORDER BY created_at DESC, id DESC LIMIT 50
+    """, "idx_tasks_user_created"),
+    "get_public_tasks": ("""
+        SELECT t.id, t.task_name, t.created_at FROM tasks t
+        WHERE t.private = FALSE ORDER BY t.created_at DESC, t.id DESC LIMIT 50
+    """, "idx_tasks_public_created"),
+    "get_task_exchanges": ("""
+        SELECT id, prompt, response, created_at FROM exchanges
+        WHERE task_id = :task_id AND user_id = :user_id ORDER BY created_at ASC, id ASC LIMIT 50
+    """, "idx_exchanges_task_created"),
+    "get_user_by_email": ("""
+        SELECT id FROM users WHERE email = :email
+    """, "idx_users_email"),
+}
+
+
+def collect_index_nodes(plan: dict) -> list:
+    nodes = []
+    if plan.get("Node Type") in INDEX_NODES:
+        nodes.append(plan.get("Index Name"))
+    for child in plan.get("Plans", []):
+        nodes.extend(collect_index_nodes(child))
+    return nodes
+
+
+async def seed(db_manager: DatabaseManager, users: int, tasks_per_user: int, exchanges_per_task: int):
+    async with db_manager.engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO users (google_id, email, name)
+            SELECT 'plan-check-' || g, 'plan-check-' || g || '@example.com', 'User ' || g
+            FROM generate_series(1, :users) g
+            ON CONFLICT DO NOTHING
+        """), {"users": users})
+        await conn.execute(text("""
+            INSERT INTO tasks (task_name, task_description, task_context, task_status, private, user_id, created_at)
+            SELECT 'Task ' || g, 'Description', 'no context', 'not solved', (g % 10 <> 0), u.id, NOW() - (g || ' minutes')::interval
+            FROM users u, generate_series(1, :tasks) g
+            WHERE u.google_id LIKE 'plan-check-%'
+        """), {"tasks": tasks_per_user})
+        await conn.execute(text("""
+            INSERT INTO exchanges (task_id, user_id, prompt, response)
+            SELECT t.id, t.user_id, 'prompt ' || g, 'response ' || g
+            FROM tasks t JOIN users u ON u.id = t.user_id, generate_series(1, :exchanges) g
+            WHERE u.google_id LIKE 'plan-check-%'
+        """), {"exchanges": exchanges_per_task})
+    async with db_manager.engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE users"))
+        await conn.execute(text("ANALYZE tasks"))
+        await conn.execute(text("ANALYZE exchanges"))
+
+
+async def main(args) -> int:
+    db_manager = DatabaseManager(DATABASE_URL)
+    try:
+        await db_manager.init_db()
+        if args.seed_users:
+            await seed(db_manager, args.seed_users, args.tasks_per_user, args.exchanges_per_task)
+
+        async with db_manager.engine.begin() as conn:
+            row = (await conn.execute(text("SELECT id, user_id FROM tasks ORDER BY id DESC LIMIT 1"))).fetchone()
+        params = {"user_id": row[1] if row else 1, "task_id": row[0] if row else 1, "email": "plan-check-1@example.com"}
+
+        failures = 0
+        for name, (query, expected_index) in HOT_QUERIES.items():
+            plan = await db_manager.explain(query, params)
+            indexes = collect_index_nodes(plan)
+            ok = expected_index in indexes
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name:<20} {plan['Node Type']:<18} indexes={indexes or '-'} (expected {expected_index})")
+        return 1 if failures else 0
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed-users", type=int, default=0)
+    parser.add_argument("--tasks-per-user", type=int, default=20)
+    parser.add_argument("--exchanges-per-task", type=int, default=20)
+    sys.exit(asyncio.run(main(parser.parse_args())))
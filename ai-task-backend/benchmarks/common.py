@@ -0,0 +1,28 @@
+import statistics
+from typing import Iterable
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: Iterable[float]) -> dict:
+    values = list(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def print_summary(label: str, latencies: Iterable[float]):
+    stats = summarize(latencies)
+    print(f"{label:<28} n={stats['count']:<6} mean={stats['mean_ms']:>9.3f}ms "
+          f"p50={stats['p50_ms']:>9.3f}ms p95={stats['p95_ms']:>9.3f}ms p99={stats['p99_ms']:>9.3f}ms")
+    return stats
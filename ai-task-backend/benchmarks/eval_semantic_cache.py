@@ -0,0 +1,80 @@
+"""Offline evaluation of the semantic cache: hit rate and false positives per similarity threshold.
+
+Every "cached" prompt goes into one task index; each "query" is looked up in it. A hit
+counts as correct only when the pair is labelled a duplicate and the nearest entry is
+its own cached prompt. Pairs come from a JSONL file ({"cached", "query", "duplicate"})
+or from a small built-in sample:
+
+    python -m benchmarks.eval_semantic_cache --pairs pairs.jsonl --embedder hashed
+"""
+import argparse
+import json
+import time
+
+from semanticcache import TaskVectorIndex, load_embedder
+
+SAMPLE_PAIRS = [
+    ("How do I split this task into subtasks?", "how can I split this task into subtasks", True),
+    ("What is the deadline for this task?", "What's the deadline for this task", True),
+    ("Summarize the progress so far", "Summarize progress so far please", True),
+    ("Which database should I use for the backend?", "Which database should I use for my backend?", True),
+    ("Write unit tests for the login form", "write unit tests for login form", True),
+    ("What are the next steps?", "what are the next steps", True),
+    ("Explain the error in the deployment logs", "Explain the errors in the deployment log", True),
+    ("How long will the migration take?", "How long would the migration take?", True),
+    ("What is the deadline for this task?", "What is the budget for this task?", False),
+    ("Write unit tests for the login form", "Write unit tests for the signup form", False),
+    ("How do I deploy to production?", "How do I roll back a production deploy?", False),
+    ("Summarize the progress so far", "Summarize the risks so far", False),
+    ("Which database should I use for the backend?", "Which framework should I use for the frontend?", False),
+    ("Translate the description to Russian", "Translate the description to German", False),
+    ("How many hours did I spend on this?", "How many hours are left on this?", False),
+    ("List the open questions", "List the closed questions", False),
+]
+
+
+def load_pairs(path: str) -> list:
+    if not path:
+        return SAMPLE_PAIRS
+    with open(path) as f:
+        return [(row["cached"], row["query"], bool(row["duplicate"])) for row in map(json.loads, f) if row]
+
+
+def evaluate(pairs: list, embedder_spec: str, thresholds: list):
+    embedder = load_embedder(embedder_spec)
+    cached_prompts = list(dict.fromkeys(cached for cached, _, _ in pairs))
+
+    started = time.perf_counter()
+    cached_vectors = embedder.embed(cached_prompts)
+    query_vectors = embedder.embed([query for _, query, _ in pairs])
+    elapsed = time.perf_counter() - started
+    print(f"embedded {len(cached_prompts) + len(pairs)} prompts in {elapsed * 1000:.1f}ms "
+          f"({(len(cached_prompts) + len(pairs)) / elapsed:.0f}/s, dim={embedder.dim})")
+
+    index = TaskVectorIndex(embedder.dim, max_entries=len(cached_prompts))
+    index.add(cached_vectors, ["ctx"] * len(cached_prompts), cached_prompts)
+
+    matches = [index.search(vector, "ctx") for vector in query_vectors]
+    duplicates = sum(1 for _, _, duplicate in pairs if duplicate)
+    print(f"{'threshold':>9} {'hit_rate':>9} {'recall':>7} {'false_pos':>9} {'precision':>9}")
+    for threshold in thresholds:
+        hits = correct = false_positives = 0
+        for (cached, _, duplicate), (score, matched) in zip(pairs, matches):
+            if score < threshold:
+                continue
+            hits += 1
+            if duplicate and matched == cached:
+                correct += 1
+            else:
+                false_positives += 1
+        print(f"{threshold:>9.2f} {hits / len(pairs):>9.2%} {correct / max(duplicates, 1):>7.2%} "
+              f"{false_positives:>9} {correct / hits if hits else 1.0:>9.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", default="")
+    parser.add_argument("--embedder", default="hashed")
+    parser.add_argument("--thresholds", default="0.80,0.85,0.87,0.90,0.95")
+    args = parser.parse_args()
+    evaluate(load_pairs(args.pairs), args.embedder, [float(value) for value in args.thresholds.split(",")])
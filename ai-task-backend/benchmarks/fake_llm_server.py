@@ -0,0 +1,212 @@
+"""Minimal OpenAI-compatible chat completions server for offline benchmarks.
+
+    python -m benchmarks.fake_llm_server --port 8089 --latency 0.5
+    python -m benchmarks.fake_llm_server --ttft 0.3 --tps 50 --error-rate 0.01 --rate-limit-rate 0.05 --seed 1
+    python -m benchmarks.fake_llm_server --max-concurrent 20
+
+With --ttft/--tps each word of the answer is one token: the first arrives after ttft,
+the rest at tps tokens per second (non-streaming responses wait for the whole answer).
+Otherwise --latency is the total response time. Injected failures return 500 or 429
+with Retry-After; with --max-concurrent, requests above that many in flight get 429
+like a provider at capacity. Point the backend at it with LLM_PROVIDER=fake or
+LLM_BASE_URL=http://127.0.0.1:8089/v1.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Optional
+
+
+class FakeLLMServer:
+    def __init__(
+        self,
+        latency: float = 0.5,
+        answer: str = "This is a fake answer from the local completion server.",
+        ttft: Optional[float] = None,
+        tokens_per_second: Optional[float] = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        max_concurrent: Optional[int] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.answer = answer
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        # Фиксированный seed даёт одинаковую последовательность отказов между прогонами
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.rate_limited = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8089):
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                payload = json.loads(body or b"{}")
+
+                failure = self._pick_failure()
+                if failure is not None:
+                    await self._send_error(writer, *failure)
+                else:
+                    self.in_flight += 1
+                    try:
+                        if payload.get("stream"):
+                            await self._send_stream(writer, payload)
+                        else:
+                            await self._send_completion(writer, payload)
+                    finally:
+                        self.in_flight -= 1
+                self.requests_served += 1
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _pick_failure(self) -> Optional[tuple]:
+        if self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+            self.rate_limited += 1
+            return 429, "rate_limit_exceeded", "Too many concurrent requests"
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            return 429, "rate_limit_exceeded", "Rate limit reached (injected)"
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors_injected += 1
+            return 500, "server_error", "Internal error (injected)"
+        return None
+
+    async def _send_error(self, writer: asyncio.StreamWriter, status: int, code: str, message: str):
+        body = json.dumps({"error": {"message": message, "type": code, "code": code}}).encode()
+        reason = "Too Many Requests" if status == 429 else "Internal Server Error"
+        headers = f"Retry-After: {self.retry_after:g}\r\n" if status == 429 else ""
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n{headers}".encode()
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+    def _token_delays(self, tokens: int) -> list:
+        """Пауза перед каждым токеном: ttft перед первым, затем 1/tps"""
+        if self.ttft is None and self.tokens_per_second is None:
+            return [self.latency / max(tokens, 1)] * tokens
+        ttft = self.ttft if self.ttft is not None else 0.0
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        return [ttft] + [per_token] * (tokens - 1)
+
+    def _answer_words(self, payload: dict) -> list:
+        words = self.answer.split(" ")
+        max_tokens = payload.get("max_tokens")
+        return words[:max_tokens] if max_tokens else words
+
+    async def _send_completion(self, writer: asyncio.StreamWriter, payload: dict):
+        words = self._answer_words(payload)
+        await asyncio.sleep(sum(self._token_delays(len(words))))
+        answer = " ".join(words)
+        body = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)}
+        }).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, payload: dict):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        words = self._answer_words(payload)
+        for index, (word, delay) in enumerate(zip(words, self._token_delays(len(words)))):
+            await asyncio.sleep(delay)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": word if index == 0 else f" {word}"}, "finish_reason": None}]
+            }
+            self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Параметры фейкового сервера, общие для сервера и бенчмарков"""
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--ttft", type=float, default=None)
+    parser.add_argument("--tps", type=float, default=None)
+    parser.add_argument("--answer-words", type=int, default=0, help="generate an answer of N words instead of the default sentence")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--max-concurrent", type=int, default=None, help="answer 429 above this many requests in flight")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_options(args: argparse.Namespace) -> dict:
+    options = {
+        "latency": args.latency,
+        "ttft": args.ttft,
+        "tokens_per_second": args.tps,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "retry_after": args.retry_after,
+        "max_concurrent": args.max_concurrent,
+        "seed": args.seed
+    }
+    if args.answer_words:
+        options["answer"] = " ".join(f"word{index}" for index in range(args.answer_words))
+    return options
+
+
+async def serve(host: str, port: int, **options):
+    server = await FakeLLMServer(**options).start(host, port)
+    print(f"✅ Fake LLM server listening on http://{host}:{port}/v1 ({options})")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, **server_options(args)))
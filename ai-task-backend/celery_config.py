@@ -1,5 +1,13 @@
+import os
+import sys
+
 from celery import Celery
-from config import REDIS_URL
+from celery.signals import setup_logging
+from config import REDIS_URL, LLM_WORKER_CONCURRENCY, DB_WORKER_CONCURRENCY, DB_WORKER_PREFETCH
+
+# Общая с API настройка логирования
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai-task-common"))
+from logsetup import configure_logging  # noqa: E402
 
 celery_app = Celery("ai-task-backend", 
     broker=f"{REDIS_URL}/0", 
@@ -53,18 +61,102 @@ celery_app.conf.update(
     task_soft_time_limit=1200,
     task_acks_late=True,
     worker_prefetch_multiplier=1,
+    # Значения по умолчанию для запуска без профиля; см. WORKER_PROFILES
     worker_concurrency=2,
     worker_max_tasks_per_child=1000,
     worker_max_memory_per_child=1024 * 1024 * 1024,
 )
 
+# Профили воркеров, выбираются по имени при запуске: python worker.py llm
+WORKER_PROFILES = {
+    # Задачи LLM только ждут сеть: вызовы идут на общем event loop процесса (worker_lifecycle),
+    # потоки пула лишь ждут результат, поэтому один процесс держит десятки запросов
+    "llm": {
+        "queues": ["llm_tasks"],
+        "pool": "threads",
+        "concurrency": LLM_WORKER_CONCURRENCY,
+        "prefetch_multiplier": 1,
+    },
+    # Короткие запросы к БД: процесс на ядро, предвыборка экономит обращения к брокеру
+    "db": {
+        "queues": ["user_auth", "task_management"],
+        "pool": "prefork",
+        "concurrency": DB_WORKER_CONCURRENCY,
+        "prefetch_multiplier": DB_WORKER_PREFETCH,
+        "max_tasks_per_child": 1000,
+    },
+    # Прежний режим: один воркер на все очереди
+    "all": {
+        "queues": ["user_auth", "task_management", "llm_tasks"],
+        "pool": "prefork",
+        "concurrency": 2,
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": 1000,
+    },
+}
+
+def worker_argv(profile: str) -> list:
+    """Аргументы celery worker для профиля"""
+    options = WORKER_PROFILES[profile]
+    argv = [
+        "worker",
+        "-Q", ",".join(options["queues"]),
+        "-P", options["pool"],
+        "-c", str(options["concurrency"]),
+        "--prefetch-multiplier", str(options["prefetch_multiplier"]),
+        "-n", f"{profile}@%h",
+    ]
+    if "max_tasks_per_child" in options:
+        argv += ["--max-tasks-per-child", str(options["max_tasks_per_child"])]
+    return argv
+
 celery_app.conf.task_queue_max_priority = 10
 celery_app.conf.task_default_priority = 5
 
+# В Redis транспорте 0 — наивысший приоритет
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 9
+
+# Приоритет по умолчанию для задач, которые отправляют по имени (API, бот) и сам backend:
+# пользователь ждёт ответа — interactive, обновление контекста — background
+TASK_PRIORITIES = {
+    "process_chat": PRIORITY_INTERACTIVE,
+    "stream_chat_response": PRIORITY_INTERACTIVE,
+    "generate_task_response": PRIORITY_INTERACTIVE,
+    "get_ai_answer": PRIORITY_INTERACTIVE,
+    "authenticate_telegram_user": PRIORITY_INTERACTIVE,
+    "authenticate_google_user": PRIORITY_INTERACTIVE,
+    "get_user_by_google_id": PRIORITY_INTERACTIVE,
+    "get_user_by_telegram_id": PRIORITY_INTERACTIVE,
+    "get_user_tasks": PRIORITY_INTERACTIVE,
+    "get_task_by_id": PRIORITY_INTERACTIVE,
+    "get_task_exchanges": PRIORITY_INTERACTIVE,
+    "generate_task_context": PRIORITY_BACKGROUND,
+    "get_task_context": PRIORITY_BACKGROUND,
+}
+
+for _name, _priority in TASK_PRIORITIES.items():
+    celery_app.conf.task_routes[_name]["priority"] = _priority
+
+# Сколько раз фоновая задача уступает очередь, если её ждут интерактивные
+BACKGROUND_MAX_YIELDS = 3
+BACKGROUND_YIELD_SECONDS = 2
+
+celery_app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "queue_order_strategy": "priority",
+}
+
 celery_app.conf.task_annotations = {
     '*': {
         'retry_backoff': True,
         'retry_jitter': True,
         'max_retries': 3,
     }
-}
\ No newline at end of file
+}
+
+
+@setup_logging.connect
+def _configure_worker_logging(**kwargs):
+    # Подключённый обработчик отключает собственную настройку логирования Celery
+    configure_logging()
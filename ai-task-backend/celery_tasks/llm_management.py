@@ -1,181 +1,257 @@
-from celery_config import celery_app
-from databasemanager import DatabaseManager
-from llmmanager import LLMManager
-from config import DATABASE_URL
+import logging
+from celery_config import celery_app, PRIORITY_BACKGROUND, BACKGROUND_MAX_YIELDS, BACKGROUND_YIELD_SECONDS
+from config import CONTEXT_REFRESH_MODE
+from llmgovernor import BACKGROUND, LLMRateLimited
+from llmmanager import CONTEXT_GENERATION_MAX_SECONDS, LLMStreamError
+from metrics import metrics
+from worker_lifecycle import run_async, get_db_manager, get_llm_manager, get_exchange_writer
 import asyncio
+import random
+
+logger = logging.getLogger(__name__)
+
+# Пометка фонового обновления живёт до запуска задачи и всей генерации контекста;
+# при каждом откладывании задачи она продлевается на время ожидания
+CONTEXT_REFRESH_LOCK_SECONDS = max(300, int(CONTEXT_GENERATION_MAX_SECONDS))
+
+def rate_limited_response(task_id: int, exc: LLMRateLimited) -> dict:
+    """Ответ пользователю сразу, без повторов: лимит LLM исчерпан и ожидание истекло"""
+    return {"response": f"🚫 AI is busy, try again in {exc.retry_after:.0f}s", "task_id": task_id, "retry_after": exc.retry_after}
+
+async def get_chat_context(task: dict) -> str:
+    """Контекст для ответа в чате: в режиме background устаревший контекст обновляется в фоне"""
+    llm_manager = get_llm_manager()
+    if CONTEXT_REFRESH_MODE != "background":
+        try:
+            return await llm_manager.resolve_task_context(task)
+        except LLMRateLimited:
+            # Лимит LLM исчерпан: отвечаем с последним известным контекстом
+            return await llm_manager.get_last_good_context(task)
+
+    task_context = await llm_manager.get_fresh_task_context(task)
+    if task_context is not None:
+        return task_context
+
+    # Одно фоновое обновление на задачу, остальные запросы используют последний контекст
+    if await llm_manager.redis.acquire_context_refresh(task["id"], task["user_id"], CONTEXT_REFRESH_LOCK_SECONDS):
+        await asyncio.to_thread(
+            generate_task_context_celery.apply_async,
+            args=[task["id"], task["user_id"]],
+            kwargs={"only_if_stale": True},
+            priority=PRIORITY_BACKGROUND
+        )
+    return await llm_manager.get_last_good_context(task)
 
 @celery_app.task(name="process_chat", bind=True, max_retries=2)
-def process_chat_celery(self, task_id: int, user_id: int, prompt: str):
+def process_chat_celery(self, task_id: int, user_id: int, prompt: str, use_cache: bool = True):
     """Обработка чат сообщения через AI"""
     try:
         async def _process_chat():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
             
             # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
+            with metrics.span("task_stage_seconds", task="process_chat", stage="get_task"):
+                task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            # Инвалидируем кэш
-            await llm_manager.invalidate_task_cache(task_id, user_id)
-            
-            # Генерируем контекст
-            task_context = await llm_manager.generate_task_context(
-                task["task_name"], 
-                task["task_description"], 
-                task["id"], 
-                user_id, 
-                task["task_context"]
-            )
-            
-            # Обновляем контекст в БД
-            await db_manager.update_task_context(task_id, user_id, task_context)
+            # Берём контекст, перегенерируя его только если он устарел
+            with metrics.span("task_stage_seconds", task="process_chat", stage="context"):
+                task_context = await get_chat_context(task)
             
             # Получаем ответ от AI
-            result = llm_manager.get_answer(prompt, task_context)
+            with metrics.span("task_stage_seconds", task="process_chat", stage="answer"):
+                result = await llm_manager.get_answer(prompt, task_context, use_cache=use_cache, task_id=task_id, user_id=user_id)
             
             # Создаем обмен
-            await db_manager.create_exchange(task_id, user_id, prompt, result)
+            with metrics.span("task_stage_seconds", task="process_chat", stage="exchange"):
+                await get_exchange_writer().submit(task_id, user_id, prompt, result)
             
             return {"response": result, "task_id": task_id}
         
-        return asyncio.run(_process_chat())
+        return run_async(_process_chat())
+    except LLMRateLimited as exc:
+        logger.warning("Chat for task %s rejected by LLM governor: %s", task_id, exc)
+        return rate_limited_response(task_id, exc)
     except Exception as exc:
-        print(f"❌ Error processing chat: {exc}")
+        logger.error("Error processing chat: %s", exc)
         raise self.retry(exc=exc, countdown=120)
 
 @celery_app.task(name="generate_task_context", bind=True, max_retries=2)
-def generate_task_context_celery(self, task_id: int, user_id: int):
+def generate_task_context_celery(self, task_id: int, user_id: int, only_if_stale: bool = False, yields: int = 0):
     """Генерация контекста задачи"""
     try:
         async def _generate_context():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
+            
+            if only_if_stale and yields < BACKGROUND_MAX_YIELDS and await llm_manager.redis.queue_length("llm_tasks", range(PRIORITY_BACKGROUND)):
+                # Интерактивные запросы ждут воркер (в том числе пониженные FairPriority до PRIORITY_BACKGROUND - 1):
+                # откладываем обновление, блокировка обновления остаётся за задачей
+                await llm_manager.redis.extend_context_refresh(task_id, user_id, CONTEXT_REFRESH_LOCK_SECONDS + BACKGROUND_YIELD_SECONDS)
+                await asyncio.to_thread(
+                    generate_task_context_celery.apply_async,
+                    args=[task_id, user_id],
+                    kwargs={"only_if_stale": True, "yields": yields + 1},
+                    countdown=BACKGROUND_YIELD_SECONDS,
+                    priority=PRIORITY_BACKGROUND
+                )
+                return {"context": None, "task_id": task_id, "deferred": True}
             
             # Проверяем права доступа
             task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            # Генерируем контекст
-            task_context = await llm_manager.generate_task_context(
-                task["task_name"], 
-                task["task_description"], 
-                task["id"], 
-                user_id, 
-                task["task_context"]
-            )
+            if only_if_stale:
+                # Фоновое обновление: перегенерируем, только если контекст всё ещё устарел.
+                # При исчерпанном лимите LLM блокировка остаётся за отложенной задачей
+                try:
+                    task_context = await llm_manager.resolve_task_context(task, BACKGROUND)
+                except LLMRateLimited:
+                    raise
+                except BaseException:
+                    await llm_manager.redis.release_context_refresh(task_id, user_id)
+                    raise
+                await llm_manager.redis.release_context_refresh(task_id, user_id)
+                return {"context": task_context, "task_id": task_id}
             
-            # Обновляем контекст в БД
-            await db_manager.update_task_context(task_id, user_id, task_context)
+            # Генерируем контекст и обновляем его в БД
+            task_context = await llm_manager.regenerate_task_context(task, BACKGROUND)
             
             return {"context": task_context, "task_id": task_id}
         
-        return asyncio.run(_generate_context())
+        return run_async(_generate_context())
+    except LLMRateLimited as exc:
+        # Фоновая задача не ждёт слот и не тратит повторы: откладывается до освобождения лимита
+        countdown = exc.retry_after * (1 + random.random())
+        logger.info("Context generation for task %s deferred by %.1fs: %s", task_id, countdown, exc)
+        if only_if_stale:
+            # Блокировка не должна истечь раньше отложенного запуска, иначе начнётся второе обновление
+            run_async(get_llm_manager().redis.extend_context_refresh(task_id, user_id, CONTEXT_REFRESH_LOCK_SECONDS + int(countdown)))
+        generate_task_context_celery.apply_async(
+            args=[task_id, user_id],
+            kwargs={"only_if_stale": only_if_stale, "yields": yields},
+            countdown=countdown,
+            priority=PRIORITY_BACKGROUND
+        )
+        return {"context": None, "task_id": task_id, "deferred": True}
     except Exception as exc:
-        print(f"❌ Error generating task context: {exc}")
+        logger.error("Error generating task context: %s", exc)
         raise self.retry(exc=exc, countdown=60)
 
 @celery_app.task(name="get_ai_answer")
-def get_ai_answer_celery(prompt: str, context: str):
+def get_ai_answer_celery(prompt: str, context: str, use_cache: bool = True):
     """Получение ответа от AI"""
     try:
         async def _get_answer():
-            llm_manager = LLMManager()
-            result = llm_manager.get_answer(prompt, context)
+            llm_manager = get_llm_manager()
+            result = await llm_manager.get_answer(prompt, context, use_cache=use_cache)
             return {"response": result}
         
-        return asyncio.run(_get_answer())
+        return run_async(_get_answer())
     except Exception as exc:
-        print(f"❌ Error getting AI answer: {exc}")
+        logger.error("Error getting AI answer: %s", exc)
         return None
 
 @celery_app.task(name="stream_chat_response", bind=True, max_retries=2)
-def stream_chat_response_celery(self, task_id: int, user_id: int, prompt: str):
-    """Стриминг ответа от AI"""
+def stream_chat_response_celery(self, task_id: int, user_id: int, prompt: str, stream_id: str = "", use_cache: bool = True):
+    """Стриминг ответа от AI в Redis Stream chat_stream:<stream_id>"""
+    stream_id = stream_id or self.request.id
     try:
         async def _stream_response():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
+            redis_manager = llm_manager.redis
+            
+            # Повторная попытка продолжает нумерацию, клиент отбрасывает полученные чанки по reset
+            seq = await redis_manager.get_chat_stream_last_seq(stream_id)
+            if seq:
+                seq += 1
+                await redis_manager.append_chat_stream(stream_id, seq, "reset")
             
             # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
+            with metrics.span("task_stage_seconds", task="stream_chat_response", stage="get_task"):
+                task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            # Инвалидируем кэш
-            await llm_manager.invalidate_task_cache(task_id, user_id)
-            
-            # Генерируем контекст
-            task_context = await llm_manager.generate_task_context(
-                task["task_name"], 
-                task["task_description"], 
-                task["id"], 
-                user_id, 
-                task["task_context"]
-            )
+            # Берём контекст, перегенерируя его только если он устарел
+            with metrics.span("task_stage_seconds", task="stream_chat_response", stage="context"):
+                task_context = await get_chat_context(task)
             
-            # Обновляем контекст в БД
-            await db_manager.update_task_context(task_id, user_id, task_context)
-            
-            # Собираем все чанки ответа
+            # Публикуем чанки по мере поступления
             response_chunks = []
-            stream = llm_manager.stream_answer(prompt, task_context)
+            stream = llm_manager.stream_answer(prompt, task_context, use_cache=use_cache, task_id=task_id, user_id=user_id)
             
-            for chunk in stream:
-                if chunk and chunk.strip():
-                    response_chunks.append(chunk)
+            with metrics.span("task_stage_seconds", task="stream_chat_response", stage="answer"):
+                async for chunk in stream:
+                    if chunk and chunk.strip():
+                        response_chunks.append(chunk)
+                        seq += 1
+                        await redis_manager.append_chat_stream(stream_id, seq, "chunk", chunk)
             
             full_response = "".join(response_chunks)
             
-            # Создаем обмен
-            await db_manager.create_exchange(task_id, user_id, prompt, full_response)
+            # Создаем обмен один раз в конце
+            with metrics.span("task_stage_seconds", task="stream_chat_response", stage="exchange"):
+                await get_exchange_writer().submit(task_id, user_id, prompt, full_response)
+            await redis_manager.append_chat_stream(stream_id, seq + 1, "done")
             
-            return {"response": full_response, "task_id": task_id}
+            return {"response": full_response, "task_id": task_id, "stream_id": stream_id}
         
-        return asyncio.run(_stream_response())
+        return run_async(_stream_response())
+    except LLMRateLimited as exc:
+        logger.warning("Stream for task %s rejected by LLM governor: %s", task_id, exc)
+        run_async(_publish_stream_error(stream_id, rate_limited_response(task_id, exc)["response"]))
+        return {"response": "", "task_id": task_id, "stream_id": stream_id, "retry_after": exc.retry_after}
+    except LLMStreamError as exc:
+        # Ответ оборван ошибкой провайдера: не сохраняем его как обмен и не шлём done
+        run_async(_publish_stream_error(stream_id, str(exc)))
+        return {"response": "", "task_id": task_id, "stream_id": stream_id, "error": str(exc)}
     except Exception as exc:
-        print(f"❌ Error streaming chat response: {exc}")
+        logger.error("Error streaming chat response: %s", exc)
+        if self.request.retries >= self.max_retries:
+            run_async(_publish_stream_error(stream_id, str(exc)))
         raise self.retry(exc=exc, countdown=120)
 
+async def _publish_stream_error(stream_id: str, message: str):
+    redis_manager = get_llm_manager().redis
+    seq = await redis_manager.get_chat_stream_last_seq(stream_id)
+    await redis_manager.append_chat_stream(stream_id, seq + 1, "error", message)
+
 @celery_app.task(name="generate_task_response")
-def generate_task_response_celery(task_id: int, user_id: int, prompt: str):
+def generate_task_response_celery(task_id: int, user_id: int, prompt: str, use_cache: bool = True):
     """Генерация ответа для задачи (alias для process_chat)"""
     try:
         async def _generate_response():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
             
             # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
+            with metrics.span("task_stage_seconds", task="generate_task_response", stage="get_task"):
+                task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            # Инвалидируем кэш
-            await llm_manager.invalidate_task_cache(task_id, user_id)
-            
-            # Генерируем контекст
-            task_context = await llm_manager.generate_task_context(
-                task["task_name"], 
-                task["task_description"], 
-                task["id"], 
-                user_id, 
-                task["task_context"]
-            )
-            
-            # Обновляем контекст в БД
-            await db_manager.update_task_context(task_id, user_id, task_context)
+            # Берём контекст, перегенерируя его только если он устарел
+            with metrics.span("task_stage_seconds", task="generate_task_response", stage="context"):
+                task_context = await get_chat_context(task)
             
             # Получаем ответ от AI
-            result = llm_manager.get_answer(prompt, task_context)
+            with metrics.span("task_stage_seconds", task="generate_task_response", stage="answer"):
+                result = await llm_manager.get_answer(prompt, task_context, use_cache=use_cache, task_id=task_id, user_id=user_id)
             
             # Создаем обмен
-            await db_manager.create_exchange(task_id, user_id, prompt, result)
+            with metrics.span("task_stage_seconds", task="generate_task_response", stage="exchange"):
+                await get_exchange_writer().submit(task_id, user_id, prompt, result)
             
             return {"response": result, "task_id": task_id}
         
-        return asyncio.run(_generate_response())
+        return run_async(_generate_response())
+    except LLMRateLimited as exc:
+        return rate_limited_response(task_id, exc)
     except Exception as exc:
-        print(f"❌ Error generating task response: {exc}")
+        logger.error("Error generating task response: %s", exc)
         return None
@@ -1,29 +1,25 @@
+import logging
 from celery_config import celery_app
-from databasemanager import DatabaseManager
-from llmmanager import LLMManager
-from config import DATABASE_URL
-import asyncio
+from worker_lifecycle import run_async, get_db_manager, get_llm_manager, get_exchange_writer
+from llmgovernor import LLMRateLimited
+from celery_tasks.llm_management import get_chat_context, rate_limited_response
+
+logger = logging.getLogger(__name__)
 
 @celery_app.task(name="create_new_task", bind=True)
 def create_new_task_celery(self, task_name: str, task_description: str, user_id: int, private: bool = True):
     """Создание новой задачи"""
     try:
         async def _create_task():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
-            
-            # Проверяем пользователя
-            user = await db_manager.get_user_by_id(user_id)
-            if not user:
-                raise ValueError("User not found")
+            db_manager = get_db_manager()
             
-            # Создаем задачу
+            # Создаем задачу (пользователь проверяется тем же запросом)
             created_task = await db_manager.create_task(task_name, task_description, user_id, private)
             return {"message": "Success", "task": created_task}
         
-        return asyncio.run(_create_task())
+        return run_async(_create_task())
     except Exception as exc:
-        print(f"❌ Error creating task: {exc}")
+        logger.error("Error creating task: %s", exc)
         raise self.retry(exc=exc, countdown=30)
 
 @celery_app.task(name="delete_task_by_id", bind=True)
@@ -31,19 +27,15 @@ def delete_task_by_id_celery(self, task_id: int, user_id: int):
     """Удаление задачи"""
     try:
         async def _delete_task():
-            db_manager = DatabaseManager(DATABASE_URL)
-            
-            # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
-            if not task:
-                raise ValueError("Task not found or access denied")
+            db_manager = get_db_manager()
             
+            # Права доступа проверяются в самом DELETE
             deleted_task = await db_manager.delete_task(task_id, user_id)
             return {"message": "Task deleted successfully", "task_id": deleted_task["id"]}
         
-        return asyncio.run(_delete_task())
+        return run_async(_delete_task())
     except Exception as exc:
-        print(f"❌ Error deleting task: {exc}")
+        logger.error("Error deleting task: %s", exc)
         raise self.retry(exc=exc, countdown=30)
 
 @celery_app.task(name="get_task_by_id", bind=True)
@@ -51,50 +43,50 @@ def get_task_by_id_celery(self, task_id: int, user_id: int):
     """Получение задачи по ID"""
     try:
         async def _get_task():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             
             task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             return task
         
-        return asyncio.run(_get_task())
+        return run_async(_get_task())
     except Exception as exc:
-        print(f"❌ Error getting task: {exc}")
+        logger.error("Error getting task: %s", exc)
         return None
 
 @celery_app.task(name="get_user_tasks", bind=True)
-def get_user_tasks_celery(self, user_id: int):
-    """Получение всех задач пользователя"""
+def get_user_tasks_celery(self, user_id: int, cursor: str = "", limit: int = 50):
+    """Получение страницы задач пользователя (новые первыми)"""
     try:
         async def _get_tasks():
-            db_manager = DatabaseManager(DATABASE_URL)
-            tasks = await db_manager.get_users_tasks(user_id)
-            return {"user_id": user_id, "tasks": tasks}
+            db_manager = get_db_manager()
+            page = await db_manager.get_users_tasks(user_id, limit=limit, cursor=cursor or None)
+            return {"user_id": user_id, "tasks": page["items"], "next_cursor": page["next_cursor"]}
         
-        return asyncio.run(_get_tasks())
+        return run_async(_get_tasks())
     except Exception as exc:
-        print(f"❌ Error getting user tasks: {exc}")
+        logger.error("Error getting user tasks: %s", exc)
         return None
 
 @celery_app.task(name="get_task_exchanges", bind=True)
-def get_task_exchanges_celery(self, task_id: int, user_id: int):
-    """Получение обменов для задачи"""
+def get_task_exchanges_celery(self, task_id: int, user_id: int, cursor: str = "", limit: int = 50, descending: bool = False):
+    """Получение страницы обменов для задачи"""
     try:
         async def _get_exchanges():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             
             # Проверяем права доступа
             task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            exchanges = await db_manager.get_task_exchanges(task_id, user_id)
-            return {"task": task, "exchanges": exchanges}
+            page = await db_manager.get_task_exchanges(task_id, user_id, limit=limit, cursor=cursor or None, descending=descending)
+            return {"task": task, "exchanges": page["items"], "next_cursor": page["next_cursor"]}
         
-        return asyncio.run(_get_exchanges())
+        return run_async(_get_exchanges())
     except Exception as exc:
-        print(f"❌ Error getting task exchanges: {exc}")
+        logger.error("Error getting task exchanges: %s", exc)
         return None
 
 @celery_app.task(name="get_task_context", bind=True)
@@ -102,31 +94,24 @@ def get_task_context_celery(self, task_id: int, user_id: int):
     """Получение контекста задачи"""
     try:
         async def _get_context():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
             
             task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            # Генерируем или получаем контекст
-            task_context = await llm_manager.generate_task_context(
-                task["task_name"], 
-                task["task_description"], 
-                task["id"], 
-                user_id, 
-                task["task_context"]
-            )
-            
-            # Обновляем контекст если изменился
-            if task_context != task["task_context"]:
-                await db_manager.update_task_context(task_id, user_id, task_context)
+            # Получаем контекст, перегенерируя его только если он устарел
+            task_context = await llm_manager.resolve_task_context(task)
             
             return {"task": task, "context": task_context}
         
-        return asyncio.run(_get_context())
+        return run_async(_get_context())
+    except LLMRateLimited as exc:
+        logger.warning("Context for task %s rejected by LLM governor: %s", task_id, exc)
+        return rate_limited_response(task_id, exc)
     except Exception as exc:
-        print(f"❌ Error getting task context: {exc}")
+        logger.error("Error getting task context: %s", exc)
         return None
 
 @celery_app.task(name="change_task_status", bind=True)
@@ -134,19 +119,15 @@ def change_task_status_celery(self, task_id: int, user_id: int, status: str):
     """Изменение статуса задачи"""
     try:
         async def _change_status():
-            db_manager = DatabaseManager(DATABASE_URL)
-            
-            # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
-            if not task:
-                raise ValueError("Task not found or access denied")
+            db_manager = get_db_manager()
             
+            # Права доступа проверяются в самом UPDATE
             await db_manager.update_task_status(task_id, user_id, status)
             return {"message": "Task status changed successfully"}
         
-        return asyncio.run(_change_status())
+        return run_async(_change_status())
     except Exception as exc:
-        print(f"❌ Error changing task status: {exc}")
+        logger.error("Error changing task status: %s", exc)
         raise self.retry(exc=exc, countdown=30)
 
 @celery_app.task(name="update_task_context_by_user", bind=True)
@@ -154,23 +135,19 @@ def update_task_context_by_user_celery(self, task_id: int, user_id: int, context
     """Обновление контекста задачи пользователем"""
     try:
         async def _update_context():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
-            
-            # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
-            if not task:
-                raise ValueError("Task not found or access denied")
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
             
+            # Права доступа проверяются в самом UPDATE
             await db_manager.update_task_context(task_id, user_id, context)
             # Инвалидируем кэш
             await llm_manager.invalidate_task_cache(task_id, user_id)
             
             return {"message": "Task context updated successfully"}
         
-        return asyncio.run(_update_context())
+        return run_async(_update_context())
     except Exception as exc:
-        print(f"❌ Error updating task context: {exc}")
+        logger.error("Error updating task context: %s", exc)
         raise self.retry(exc=exc, countdown=30)
 
 @celery_app.task(name="update_task_privacy", bind=True)
@@ -178,72 +155,59 @@ def update_task_privacy_celery(self, task_id: int, user_id: int, private: bool):
     """Обновление приватности задачи"""
     try:
         async def _update_privacy():
-            db_manager = DatabaseManager(DATABASE_URL)
-            
-            # Проверяем права доступа
-            task = await db_manager.get_task(task_id, user_id)
-            if not task:
-                raise ValueError("Task not found or access denied")
+            db_manager = get_db_manager()
             
+            # Права доступа проверяются в самом UPDATE
             updated_task = await db_manager.update_task_privacy(task_id, user_id, private)
             return {"message": "Task privacy updated successfully", "task": updated_task}
         
-        return asyncio.run(_update_privacy())
+        return run_async(_update_privacy())
     except Exception as exc:
-        print(f"❌ Error updating task privacy: {exc}")
+        logger.error("Error updating task privacy: %s", exc)
         raise self.retry(exc=exc, countdown=30)
 
 @celery_app.task(name="get_public_tasks")
-def get_public_tasks_celery():
-    """Получение публичных задач"""
+def get_public_tasks_celery(cursor: str = "", limit: int = 50):
+    """Получение страницы публичных задач"""
     try:
         async def _get_public():
-            db_manager = DatabaseManager(DATABASE_URL)
-            tasks = await db_manager.get_public_tasks()
-            return {"tasks": tasks}
+            db_manager = get_db_manager()
+            page = await db_manager.get_public_tasks(limit=limit, cursor=cursor or None)
+            return {"tasks": page["items"], "next_cursor": page["next_cursor"]}
         
-        return asyncio.run(_get_public())
+        return run_async(_get_public())
     except Exception as exc:
-        print(f"❌ Error getting public tasks: {exc}")
+        logger.error("Error getting public tasks: %s", exc)
         return None
 
 @celery_app.task(name="create_task_exchange", bind=True)
-def create_task_exchange_celery(self, task_id: int, user_id: int, prompt: str):
+def create_task_exchange_celery(self, task_id: int, user_id: int, prompt: str, use_cache: bool = True):
     """Создание обмена сообщениями с AI"""
     try:
         async def _create_exchange():
-            db_manager = DatabaseManager(DATABASE_URL)
-            llm_manager = LLMManager()
+            db_manager = get_db_manager()
+            llm_manager = get_llm_manager()
             
             # Проверяем права доступа
             task = await db_manager.get_task(task_id, user_id)
             if not task:
                 raise ValueError("Task not found or access denied")
             
-            # Инвалидируем кэш
-            await llm_manager.invalidate_task_cache(task_id, user_id)
-            
-            # Генерируем контекст
-            task_context = await llm_manager.generate_task_context(
-                task["task_name"], 
-                task["task_description"], 
-                task["id"], 
-                user_id, 
-                task["task_context"]
-            )
-            
-            # Обновляем контекст в БД
-            await db_manager.update_task_context(task_id, user_id, task_context)
+            # Берём контекст, перегенерируя его только если он устарел
+            task_context = await get_chat_context(task)
             
             # Получаем ответ от AI
-            result = llm_manager.get_answer(prompt, task_context)
+            result = await llm_manager.get_answer(prompt, task_context, use_cache=use_cache, task_id=task_id, user_id=user_id)
             
             # Создаем обмен
-            await db_manager.create_exchange(task_id, user_id, prompt, result)
+            await get_exchange_writer().submit(task_id, user_id, prompt, result)
             
             return {"message": "Exchange created successfully", "exchange": result}
         
-        return asyncio.run(_create_exchange())
+        return run_async(_create_exchange())
+    except LLMRateLimited as exc:
+        logger.warning("Exchange for task %s rejected by LLM governor: %s", task_id, exc)
+        return rate_limited_response(task_id, exc)
     except Exception as exc:
-        print(f"❌ Error creating task exchange: {exc}")
+        logger.error("Error creating task exchange: %s", exc)
         raise self.retry(exc=exc, countdown=60)
\ No newline at end of file
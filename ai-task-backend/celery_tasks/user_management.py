@@ -1,15 +1,16 @@
+import logging
 from celery_config import celery_app
-from databasemanager import DatabaseManager
-from config import DATABASE_URL
 from datetime import datetime
-import asyncio
+from worker_lifecycle import run_async, get_db_manager
+
+logger = logging.getLogger(__name__)
 
 @celery_app.task(name="authenticate_telegram_user", bind=True, max_retries=3)
 def authenticate_telegram_user_celery(self, telegram_id: int, telegram_username: str, email: str, name: str, picture: str, access_token: str, refresh_token: str, expires_at: str):
     """Аутентификация Telegram пользователя"""
     try:
         async def _auth_telegram():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             
             existing_user = await db_manager.get_user_by_telegram_id(telegram_id)
             if existing_user:
@@ -26,9 +27,9 @@ def authenticate_telegram_user_celery(self, telegram_id: int, telegram_username:
                     expires_at if expires_at else None
                 )
         
-        return asyncio.run(_auth_telegram())
+        return run_async(_auth_telegram())
     except Exception as exc:
-        print(f"❌ Error authenticating telegram user: {exc}")
+        logger.error("Error authenticating telegram user: %s", exc)
         raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
 
 @celery_app.task(name="authenticate_google_user", bind=True, max_retries=3)
@@ -36,7 +37,7 @@ def authenticate_google_user_celery(self, google_id: str, email: str, name: str,
     """Аутентификация Google пользователя"""
     try:
         async def _auth_google():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             
             if expires_at:
                 expires_datetime = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
@@ -64,9 +65,9 @@ def authenticate_google_user_celery(self, google_id: str, email: str, name: str,
                     expires_datetime
                 )
         
-        return asyncio.run(_auth_google())
+        return run_async(_auth_google())
     except Exception as exc:
-        print(f"❌ Error authenticating google user: {exc}")
+        logger.error("Error authenticating google user: %s", exc)
         raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
 
 @celery_app.task(name="get_user_by_google_id")
@@ -74,12 +75,12 @@ def get_user_by_google_id_celery(google_id: str):
     """Получение пользователя по Google ID"""
     try:
         async def _get_user():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             return await db_manager.get_user_by_google_id(google_id)
         
-        return asyncio.run(_get_user())
+        return run_async(_get_user())
     except Exception as exc:
-        print(f"❌ Error getting user by google_id: {exc}")
+        logger.error("Error getting user by google_id: %s", exc)
         return None
 
 @celery_app.task(name="get_user_by_telegram_id")
@@ -87,12 +88,12 @@ def get_user_by_telegram_id_celery(telegram_id: int):
     """Получение пользователя по Telegram ID"""
     try:
         async def _get_user():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             return await db_manager.get_user_by_telegram_id(telegram_id)
         
-        return asyncio.run(_get_user())
+        return run_async(_get_user())
     except Exception as exc:
-        print(f"❌ Error getting user by telegram_id: {exc}")
+        logger.error("Error getting user by telegram_id: %s", exc)
         return None
 
 @celery_app.task(name="update_user_tokens", bind=True, max_retries=2)
@@ -101,7 +102,7 @@ def update_user_tokens_celery(self, google_id: str, access_token: str,
     """Обновление токенов пользователя"""
     try:
         async def _update_tokens():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             
             expires_datetime = None
             if expires_at:
@@ -114,9 +115,9 @@ def update_user_tokens_celery(self, google_id: str, access_token: str,
                 expires_datetime
             )
         
-        return asyncio.run(_update_tokens())
+        return run_async(_update_tokens())
     except Exception as exc:
-        print(f"❌ Error updating user tokens: {exc}")
+        logger.error("Error updating user tokens: %s", exc)
         raise self.retry(exc=exc, countdown=30) 
 
 @celery_app.task(name="init_database")
@@ -124,11 +125,11 @@ def init_database_celery():
     """Инициализация базы данных"""
     try:
         async def _init_db():
-            db_manager = DatabaseManager(DATABASE_URL)
+            db_manager = get_db_manager()
             await db_manager.init_db()
             return {"status": "success", "message": "Database initialized"}
         
-        return asyncio.run(_init_db())
+        return run_async(_init_db())
     except Exception as exc:
-        print(f"❌ Error initializing database: {exc}")
+        logger.error("Error initializing database: %s", exc)
         return {"status": "error", "message": str(exc)} 
\ No newline at end of file
@@ -9,8 +9,123 @@ class Settings:
         self.database_url = os.getenv("DATABASE_URL", "")
         self.llm_token = os.getenv("LLM_TOKEN", "")
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.llm_base_url = os.getenv("LLM_BASE_URL", "")
+        # openai — LLM_BASE_URL/LLM_TOKEN, fake — локальный benchmarks.fake_llm_server, module:attr — своя фабрика
+        self.llm_provider = os.getenv("LLM_PROVIDER", "openai")
+        self.llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.fake_llm_url = os.getenv("FAKE_LLM_URL", "http://127.0.0.1:8089/v1")
+        self.llm_max_in_flight = int(os.getenv("LLM_MAX_IN_FLIGHT", "64"))
+        self.llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+        self.llm_timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.context_refresh_exchanges = int(os.getenv("CONTEXT_REFRESH_EXCHANGES", "5"))
+        self.context_refresh_seconds = int(os.getenv("CONTEXT_REFRESH_SECONDS", "3600"))
+        # sync — чат ждёт перегенерации контекста, background — отвечает по последнему контексту и обновляет его в фоне
+        self.context_refresh_mode = os.getenv("CONTEXT_REFRESH_MODE", "sync")
+        self.exchange_write_behind = os.getenv("EXCHANGE_WRITE_BEHIND", "false").lower() == "true"
+        self.exchange_buffer_size = int(os.getenv("EXCHANGE_BUFFER_SIZE", "1000"))
+        self.exchange_batch_size = int(os.getenv("EXCHANGE_BATCH_SIZE", "200"))
+        self.exchange_flush_seconds = float(os.getenv("EXCHANGE_FLUSH_SECONDS", "1.0"))
+        # Повторы записи буфера при временной недоступности БД: паузы 0.5, 1, 2, ... (до 30) секунд
+        self.exchange_max_retries = int(os.getenv("EXCHANGE_MAX_RETRIES", "6"))
+        self.exchange_retry_seconds = float(os.getenv("EXCHANGE_RETRY_SECONDS", "0.5"))
+        self.task_cache_ttl_seconds = int(os.getenv("TASK_CACHE_TTL_SECONDS", "300"))
+        self.identity_cache_size = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+        self.identity_cache_ttl_seconds = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+        self.identity_redis_ttl_seconds = int(os.getenv("IDENTITY_REDIS_TTL_SECONDS", "600"))
+        self.llm_response_cache = os.getenv("LLM_RESPONSE_CACHE", "false").lower() == "true"
+        self.llm_response_cache_ttl_seconds = int(os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+        self.llm_response_cache_max_entries = int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "50000"))
+        self.llm_response_cache_max_chars = int(os.getenv("LLM_RESPONSE_CACHE_MAX_CHARS", "20000"))
+        self.semantic_cache = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+        self.semantic_cache_embedder = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashed")
+        self.semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.87"))
+        self.semantic_cache_max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))
+        self.semantic_cache_max_tasks = int(os.getenv("SEMANTIC_CACHE_MAX_TASKS", "1000"))
+        # Общий для всех воркеров лимитер LLM: token bucket в Redis и AIMD предел одновременных запросов
+        self.llm_governor = os.getenv("LLM_GOVERNOR", "false").lower() == "true"
+        self.llm_rpm = int(os.getenv("LLM_RPM", "0"))
+        self.llm_tpm = int(os.getenv("LLM_TPM", "0"))
+        self.llm_concurrency_initial = float(os.getenv("LLM_CONCURRENCY_INITIAL", "32"))
+        self.llm_concurrency_min = float(os.getenv("LLM_CONCURRENCY_MIN", "2"))
+        self.llm_concurrency_max = float(os.getenv("LLM_CONCURRENCY_MAX", "256"))
+        self.llm_latency_target_seconds = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "20"))
+        self.llm_background_share = float(os.getenv("LLM_BACKGROUND_SHARE", "0.5"))
+        self.llm_interactive_max_wait_seconds = float(os.getenv("LLM_INTERACTIVE_MAX_WAIT_SECONDS", "15"))
+        self.llm_background_max_wait_seconds = float(os.getenv("LLM_BACKGROUND_MAX_WAIT_SECONDS", "0"))
+        self.worker_profile = os.getenv("WORKER_PROFILE", "all")
+        self.llm_worker_concurrency = int(os.getenv("LLM_WORKER_CONCURRENCY", "64"))
+        self.db_worker_concurrency = int(os.getenv("DB_WORKER_CONCURRENCY", str(os.cpu_count() or 2)))
+        self.db_worker_prefetch = int(os.getenv("DB_WORKER_PREFETCH", "4"))
+        self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        # Уровни отдельных логгеров: "sqlalchemy.engine=INFO,redismanager=DEBUG"
+        self.log_levels = os.getenv("LOG_LEVELS", "")
+        self.log_format = os.getenv("LOG_FORMAT", "text")
+        self.log_debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+        self.database_echo = os.getenv("DATABASE_ECHO", "false").lower() == "true"
+        # Подсчёт round-trip к Redis для бенчмарков; в продакшене выключен
+        self.redis_count_round_trips = os.getenv("REDIS_COUNT_ROUND_TRIPS", "false").lower() == "true"
+        self.metrics_enabled = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+        self.metrics_flush_seconds = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+        self.metrics_port = int(os.getenv("METRICS_PORT", "9808"))
+        self.llm_prompt_token_budget = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "4000"))
+        self.context_prompt_token_budget = int(os.getenv("CONTEXT_PROMPT_TOKEN_BUDGET", "3000"))
 
 DATABASE_URL = Settings().database_url
 LLM_TOKEN = Settings().llm_token
 REDIS_URL = Settings().redis_url
-
+LLM_BASE_URL = Settings().llm_base_url
+LLM_PROVIDER = Settings().llm_provider
+LLM_MODEL = Settings().llm_model
+LLM_MAX_RETRIES = Settings().llm_max_retries
+FAKE_LLM_URL = Settings().fake_llm_url
+LLM_MAX_IN_FLIGHT = Settings().llm_max_in_flight
+LLM_MAX_CONNECTIONS = Settings().llm_max_connections
+LLM_TIMEOUT_SECONDS = Settings().llm_timeout_seconds
+CONTEXT_REFRESH_EXCHANGES = Settings().context_refresh_exchanges
+CONTEXT_REFRESH_SECONDS = Settings().context_refresh_seconds
+CONTEXT_REFRESH_MODE = Settings().context_refresh_mode
+EXCHANGE_WRITE_BEHIND = Settings().exchange_write_behind
+EXCHANGE_BUFFER_SIZE = Settings().exchange_buffer_size
+EXCHANGE_BATCH_SIZE = Settings().exchange_batch_size
+EXCHANGE_FLUSH_SECONDS = Settings().exchange_flush_seconds
+EXCHANGE_MAX_RETRIES = Settings().exchange_max_retries
+EXCHANGE_RETRY_SECONDS = Settings().exchange_retry_seconds
+TASK_CACHE_TTL_SECONDS = Settings().task_cache_ttl_seconds
+IDENTITY_CACHE_SIZE = Settings().identity_cache_size
+IDENTITY_CACHE_TTL_SECONDS = Settings().identity_cache_ttl_seconds
+IDENTITY_REDIS_TTL_SECONDS = Settings().identity_redis_ttl_seconds
+LLM_RESPONSE_CACHE = Settings().llm_response_cache
+LLM_RESPONSE_CACHE_TTL_SECONDS = Settings().llm_response_cache_ttl_seconds
+LLM_RESPONSE_CACHE_MAX_ENTRIES = Settings().llm_response_cache_max_entries
+LLM_RESPONSE_CACHE_MAX_CHARS = Settings().llm_response_cache_max_chars
+SEMANTIC_CACHE = Settings().semantic_cache
+SEMANTIC_CACHE_EMBEDDER = Settings().semantic_cache_embedder
+SEMANTIC_CACHE_THRESHOLD = Settings().semantic_cache_threshold
+SEMANTIC_CACHE_MAX_ENTRIES = Settings().semantic_cache_max_entries
+SEMANTIC_CACHE_MAX_TASKS = Settings().semantic_cache_max_tasks
+LLM_GOVERNOR = Settings().llm_governor
+LLM_RPM = Settings().llm_rpm
+LLM_TPM = Settings().llm_tpm
+LLM_CONCURRENCY_INITIAL = Settings().llm_concurrency_initial
+LLM_CONCURRENCY_MIN = Settings().llm_concurrency_min
+LLM_CONCURRENCY_MAX = Settings().llm_concurrency_max
+LLM_LATENCY_TARGET_SECONDS = Settings().llm_latency_target_seconds
+LLM_BACKGROUND_SHARE = Settings().llm_background_share
+LLM_INTERACTIVE_MAX_WAIT_SECONDS = Settings().llm_interactive_max_wait_seconds
+LLM_BACKGROUND_MAX_WAIT_SECONDS = Settings().llm_background_max_wait_seconds
+WORKER_PROFILE = Settings().worker_profile
+LLM_WORKER_CONCURRENCY = Settings().llm_worker_concurrency
+DB_WORKER_CONCURRENCY = Settings().db_worker_concurrency
+DB_WORKER_PREFETCH = Settings().db_worker_prefetch
+LOG_LEVEL = Settings().log_level
+LOG_LEVELS = Settings().log_levels
+LOG_FORMAT = Settings().log_format
+LOG_DEBUG_SAMPLE_RATE = Settings().log_debug_sample_rate
+DATABASE_ECHO = Settings().database_echo
+REDIS_COUNT_ROUND_TRIPS = Settings().redis_count_round_trips
+METRICS_ENABLED = Settings().metrics_enabled
+METRICS_FLUSH_SECONDS = Settings().metrics_flush_seconds
+METRICS_PORT = Settings().metrics_port
+LLM_PROMPT_TOKEN_BUDGET = Settings().llm_prompt_token_budget
+CONTEXT_PROMPT_TOKEN_BUDGET = Settings().context_prompt_token_budget
@@ -1,13 +1,68 @@
+import logging
 from sqlalchemy.ext.asyncio import  create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import text
+from sqlalchemy import event, text
 from datetime import datetime
+import base64
+import json
 from typing import Optional
 
+from config import DATABASE_ECHO, TASK_CACHE_TTL_SECONDS, IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL_SECONDS, IDENTITY_REDIS_TTL_SECONDS
+from identitycache import IdentityCache, identity_aliases
+from metrics import instrument_methods
+from migrations import run_migrations
+from redismanager import RedisManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Усечённый ответ для окна истории в контексте задачи
+RESPONSE_SUMMARY_CHARS = 100
+
+def _response_summary_sql(column: str) -> str:
+    return f"LEFT({column}, :summary_chars) || CASE WHEN length({column}) > :summary_chars THEN '...' ELSE '' END"
+
+def _encode_cursor(created_at: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def _page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+# Поля пользователя, возвращаемые поиском по идентификатору; токены сюда не входят
+USER_IDENTITY_FIELDS = ("id", "telegram_id", "telegram_username", "google_id", "email", "name", "picture", "created_at")
+
+def _user_record(row) -> dict:
+    return dict(zip(USER_IDENTITY_FIELDS, row))
+
+def _make_page(items: list, limit: int) -> dict:
+    """Запрос выбирает limit + 1 строк: лишняя строка означает, что есть следующая страница"""
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = _encode_cursor(items[-1]["created_at"], items[-1]["id"]) if has_more else None
+    return {"items": items, "next_cursor": next_cursor}
+
+@instrument_methods("db")
 class DatabaseManager:
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, cache: Optional[RedisManager] = None, echo: bool = DATABASE_ECHO):
+        # Read-through кэш записей задач и списков; инвалидируется при каждой записи в tasks
+        self.cache = cache
+        self.identity_cache = IdentityCache(
+            cache,
+            max_entries=IDENTITY_CACHE_SIZE,
+            ttl_seconds=IDENTITY_CACHE_TTL_SECONDS,
+            redis_ttl_seconds=IDENTITY_REDIS_TTL_SECONDS
+        ) if cache is not None else None
         self.engine = create_async_engine(
             database_url, 
-            echo=True,
+            echo=False,
             pool_pre_ping=True,
             pool_recycle=300,
             pool_size=5,
@@ -18,58 +73,76 @@ class DatabaseManager:
             class_= AsyncSession,
             expire_on_commit= False
         )
+        if echo:
+            # Вместо echo=True, который вешает на sqlalchemy.engine свой синхронный StreamHandler:
+            # SQL пишется через общую очередь логирования
+            logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+        # Счётчики обращений к БД для измерения числа запросов на задачу
+        self.statement_count = 0
+        self.transaction_count = 0
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._count_statement)
+        event.listen(self.engine.sync_engine, "begin", self._count_transaction)
+
+    def _count_statement(self, *args):
+        self.statement_count += 1
+
+    def _count_transaction(self, *args):
+        self.transaction_count += 1
+
+    async def close(self):
+        await self.engine.dispose()
+
+    async def _invalidate_identities(self, aliases: list):
+        if self.identity_cache is not None:
+            await self.identity_cache.invalidate(aliases)
+
+    async def _find_user(self, alias: str, column: str, value):
+        async def _load():
+            async with self.engine.begin() as conn:
+                result = await conn.execute(text(f"""SELECT {', '.join(USER_IDENTITY_FIELDS)} FROM users WHERE {column} = :value"""), {"value": value})
+                row = result.fetchone()
+                return _user_record(row) if row is not None else None
+
+        if self.identity_cache is None:
+            return await _load()
+        return await self.identity_cache.get(alias, _load)
+
+    async def _invalidate_tasks(self, task_ids: list, user_ids: list, public_feed: bool = True):
+        if self.cache is not None:
+            await self.cache.invalidate_task_records(task_ids, user_ids, public_feed=public_feed)
 
     async def init_db(self):
         async with self.engine.begin() as conn:
-            print("creating db...")
-
-            await conn.execute(text("""CREATE TABLE IF NOT EXISTS users (
-                                    id SERIAL PRIMARY KEY,
-                                    telegram_id INTEGER UNIQUE,
-                                    telegram_username VARCHAR(255),
-                                    google_id VARCHAR(255) UNIQUE,
-                                    email TEXT,
-                                    name VARCHAR(255),
-                                    picture TEXT,
-                                    access_token TEXT,
-                                    refresh_token TEXT,
-                                    token_expires_at TIMESTAMP,
-                                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)"""))
-            
-            await conn.execute(text("""CREATE TABLE IF NOT EXISTS tasks (
-                                    id SERIAL PRIMARY KEY,
-                                    task_name TEXT NOT NULL,
-                                    task_description TEXT NOT NULL,
-                                    task_context TEXT,
-                                    task_status TEXT NOT NULL,
-                                    private BOOLEAN DEFAULT TRUE,
-                                    user_id INTEGER NOT NULL,
-                                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)"""))
-                                    
-            await conn.execute(text("""CREATE TABLE IF NOT EXISTS exchanges (
-            id SERIAL PRIMARY KEY,
-            task_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            prompt TEXT NOT NULL,
-            response TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)"""))
-            
-
-            print("db created")
-
-    async def get_all_tasks(self):
+            logger.info("creating db...")
+            applied = await run_migrations(conn)
+            logger.info("db created (applied migrations: %s)", applied or 'none')
+
+    async def explain(self, query: str, params: Optional[dict] = None) -> dict:
+        """План выполнения запроса (EXPLAIN FORMAT JSON)"""
         async with self.engine.begin() as conn:
-            result = await conn.execute(text("""
+            result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params or {})
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return plan[0]["Plan"]
+
+    async def get_all_tasks(self, limit: Optional[int] = None, cursor: Optional[str] = None):
+        limit = _page_size(limit)
+        params = {"limit": limit + 1}
+        cursor_clause = ""
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = _decode_cursor(cursor)
+            cursor_clause = "WHERE (t.created_at, t.id) < (:cursor_created_at, :cursor_id)"
+        async with self.engine.begin() as conn:
+            result = await conn.execute(text(f"""
                 SELECT t.id, t.task_name, t.task_description, t.task_status, t.private, t.user_id, t.created_at, t.updated_at, u.name as user_name, u.email as user_email 
                 FROM tasks t 
                 JOIN users u ON t.user_id = u.id
-                ORDER BY t.created_at DESC
-            """))
-            return [{
+                {cursor_clause}
+                ORDER BY t.created_at DESC, t.id DESC
+                LIMIT :limit
+            """), params)
+            return _make_page([{
                 "id": row[0],
                 "task_name": row[1],
                 "task_description": row[2],
@@ -80,21 +153,24 @@ class DatabaseManager:
                 "updated_at": row[7],
                 "user_name": row[8],
                 "user_email": row[9]
-            } for row in result.fetchall()]
+            } for row in result.fetchall()], limit)
 
     async def create_task(self, task_name: str, task_description: str, user_id: int, private: bool = True):
         async with self.engine.begin() as conn:
+            # Проверка пользователя и вставка одним запросом
             result = await conn.execute(text("""
                 INSERT INTO tasks (task_name, task_description, task_context, task_status, private, user_id) 
-                VALUES (:task_name, :task_description, 'no context', 'not solved', :private, :user_id) 
+                SELECT :task_name, :task_description, 'no context', 'not solved', :private, id
+                FROM users WHERE id = :user_id
                 RETURNING id, created_at
             """), {"task_name": task_name, "task_description": task_description, "private": private, "user_id": user_id})
             row = result.fetchone()
             if row is None:
-                raise Exception("Failed to create task")
-            task_id = row[0]
-            created_at = row[1]
-            return {"id": task_id, "task_name": task_name, "task_description": task_description, "task_context": "no context", "task_status": "not solved", "private": private, "user_id": user_id, "created_at": created_at}
+                raise ValueError("User not found")
+        task_id = row[0]
+        created_at = row[1]
+        await self._invalidate_tasks([task_id], [user_id], public_feed=not private)
+        return {"id": task_id, "task_name": task_name, "task_description": task_description, "task_context": "no context", "task_status": "not solved", "private": private, "user_id": user_id, "created_at": created_at, "exchange_count": 0, "context_exchange_count": 0, "context_updated_at": None}
         
     async def delete_task(self, task_id: int, user_id: int):
         async with self.engine.begin() as conn:
@@ -104,12 +180,19 @@ class DatabaseManager:
             """), {"task_id": task_id, "user_id": user_id})
             if result.rowcount == 0:
                 raise Exception("Task not found or you don't have permission to delete it")
-            return {"id": task_id}
+        await self._invalidate_tasks([task_id], [user_id])
+        return {"id": task_id}
         
     async def get_task(self, task_id: int, user_id: int):
+        if self.cache is None:
+            return await self._load_task(task_id, user_id)
+        return await self.cache.get_task_record(task_id, user_id, lambda: self._load_task(task_id, user_id), ttl_seconds=TASK_CACHE_TTL_SECONDS)
+
+    async def _load_task(self, task_id: int, user_id: int):
         async with self.engine.begin() as conn:
             result = await conn.execute(text("""
-                SELECT t.id, t.task_name, t.task_description, t.task_context, t.task_status, t.private, t.user_id, t.created_at, u.name as user_name, u.email as user_email 
+                SELECT t.id, t.task_name, t.task_description, t.task_context, t.task_status, t.private, t.user_id, t.created_at, u.name as user_name, u.email as user_email,
+                       t.exchange_count, t.context_exchange_count, t.context_updated_at
                 FROM tasks t 
                 JOIN users u ON t.user_id = u.id 
                 WHERE t.id = :task_id AND t.user_id = :user_id
@@ -117,17 +200,36 @@ class DatabaseManager:
             row = result.fetchone()
             if row is None:
                 raise Exception("Task not found or you don't have permission to access it")
-            return {"id": row[0], "task_name": row[1], "task_description": row[2], "task_context": row[3], "task_status": row[4], "private": row[5], "user_id": row[6], "created_at": row[7], "user_name": row[8], "user_email": row[9]}
+            return {"id": row[0], "task_name": row[1], "task_description": row[2], "task_context": row[3], "task_status": row[4], "private": row[5], "user_id": row[6], "created_at": row[7], "user_name": row[8], "user_email": row[9], "exchange_count": row[10], "context_exchange_count": row[11], "context_updated_at": row[12]}
 
-    async def update_task_context(self, task_id: int, user_id: int, task_context: str):
+    async def update_task_context(self, task_id: int, user_id: int, task_context: str, exchange_count: Optional[int] = None):
         async with self.engine.begin() as conn:
-            await conn.execute(text("""UPDATE tasks SET task_context = :task_context WHERE id = :task_id AND user_id = :user_id"""), {"task_context": task_context, "task_id": task_id, "user_id": user_id})
-            return {"id": task_id, "task_context": task_context}
+            if exchange_count is not None:
+                # Контекст сгенерирован по истории из exchange_count обменов
+                result = await conn.execute(text("""
+                    UPDATE tasks SET task_context = :task_context, context_exchange_count = :exchange_count, context_updated_at = (NOW() AT TIME ZONE 'utc')
+                    WHERE id = :task_id AND user_id = :user_id
+                    RETURNING id
+                """), {"task_context": task_context, "exchange_count": exchange_count, "task_id": task_id, "user_id": user_id})
+            else:
+                # Ручное редактирование: контекст будет объединён с историей при следующем обращении
+                result = await conn.execute(text("""
+                    UPDATE tasks SET task_context = :task_context, context_updated_at = NULL
+                    WHERE id = :task_id AND user_id = :user_id
+                    RETURNING id
+                """), {"task_context": task_context, "task_id": task_id, "user_id": user_id})
+            if result.fetchone() is None:
+                raise Exception("Task not found or you don't have permission to update it")
+        await self._invalidate_tasks([task_id], [], public_feed=False)
+        return {"id": task_id, "task_context": task_context}
 
     async def update_task_status(self, task_id: int, user_id: int, status: str):
         async with self.engine.begin() as conn:
-            await conn.execute(text("""UPDATE tasks SET task_status = :status WHERE id = :task_id AND user_id = :user_id"""), {"status": status, "task_id": task_id, "user_id": user_id})
-            return {"id": task_id, "task_status": status}
+            result = await conn.execute(text("""UPDATE tasks SET task_status = :status WHERE id = :task_id AND user_id = :user_id RETURNING id"""), {"status": status, "task_id": task_id, "user_id": user_id})
+            if result.fetchone() is None:
+                raise Exception("Task not found or you don't have permission to update it")
+        await self._invalidate_tasks([task_id], [user_id])
+        return {"id": task_id, "task_status": status}
 
     async def create_google_user(self, google_id: str, email: str, name: Optional[str] = None, picture: Optional[str] = None, access_token: Optional[str] = None, refresh_token: Optional[str] = None, token_expires_at: Optional[datetime] = None):
         async with self.engine.begin() as conn:
@@ -135,7 +237,8 @@ class DatabaseManager:
             row = result.fetchone()
             if row is None:
                 raise Exception("Failed to create user")
-            return {"id": row[0], "google_id": google_id, "email": email, "name": name, "picture": picture, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at}
+        await self._invalidate_identities(identity_aliases({"id": row[0], "google_id": google_id}))
+        return {"id": row[0], "google_id": google_id, "email": email, "name": name, "picture": picture, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at}
 
     async def create_telegram_user(self, telegram_id: int, telegram_username: str, google_id: Optional[str] = None, email: Optional[str] = None, name: Optional[str] = None, picture: Optional[str] = None, access_token: Optional[str] = None, refresh_token: Optional[str] = None, token_expires_at: Optional[datetime] = None):
         async with self.engine.begin() as conn:
@@ -143,36 +246,33 @@ class DatabaseManager:
             row = result.fetchone()
             if row is None:
                 raise Exception("Failed to create user")
-            return {"id": row[0], "telegram_id": telegram_id, "telegram_username": telegram_username, "google_id": google_id, "email": email, "name": name, "picture": picture, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at}
+        await self._invalidate_identities(identity_aliases({"id": row[0], "telegram_id": telegram_id, "google_id": google_id}))
+        return {"id": row[0], "telegram_id": telegram_id, "telegram_username": telegram_username, "google_id": google_id, "email": email, "name": name, "picture": picture, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at}
     
     async def get_user_by_telegram_id(self, telegram_id: int):
+        return await self._find_user(f"telegram:{telegram_id}", "telegram_id", telegram_id)
+
+    async def get_users_tasks(self, user_id: int, limit: Optional[int] = None, cursor: Optional[str] = None):
+        limit = _page_size(limit)
+        if self.cache is None:
+            return await self._load_users_tasks(user_id, limit, cursor)
+        return await self.cache.get_user_tasks_page(user_id, limit, cursor, lambda: self._load_users_tasks(user_id, limit, cursor), ttl_seconds=TASK_CACHE_TTL_SECONDS)
+
+    async def _load_users_tasks(self, user_id: int, limit: int, cursor: Optional[str]):
+        params = {"user_id": user_id, "limit": limit + 1}
+        cursor_clause = ""
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = _decode_cursor(cursor)
+            cursor_clause = "AND (created_at, id) < (:cursor_created_at, :cursor_id)"
         async with self.engine.begin() as conn:
-            result = await conn.execute(text("""SELECT * FROM users WHERE telegram_id = :telegram_id"""), {"telegram_id": telegram_id})
-            row = result.fetchone()
-            if row is None:
-                return None
-            return {
-                "id": row[0],
-                "telegram_id": row[1],
-                "telegram_username": row[2],
-                "google_id": row[3],
-                "email": row[4],
-                "name": row[5],
-                "picture": row[6],
-                "access_token": row[7],
-                "refresh_token": row[8],
-                "token_expires_at": row[9],
-                "created_at": row[10]
-            }
-    async def get_users_tasks(self, user_id: int):
-        async with self.engine.begin() as conn:
-            result = await conn.execute(text("""
+            result = await conn.execute(text(f"""
                 SELECT id, task_name, task_description, task_status, private, user_id, created_at, updated_at
                 FROM tasks 
-                WHERE user_id = :user_id
-                ORDER BY created_at DESC
-            """), {"user_id": user_id})
-            return [{
+                WHERE user_id = :user_id {cursor_clause}
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """), params)
+            return _make_page([{
                 "id": row[0],
                 "task_name": row[1],
                 "task_description": row[2],
@@ -181,108 +281,145 @@ class DatabaseManager:
                 "user_id": row[5],
                 "created_at": row[6],
                 "updated_at": row[7]
-            } for row in result.fetchall()]
+            } for row in result.fetchall()], limit)
 
     async def get_user_by_email(self, email:str):
+        # email не уникален и в кэш не попадает
         async with self.engine.begin() as conn:
-            result = await conn.execute(text("""SELECT * FROM users WHERE email = :email"""), {"email": email})
+            result = await conn.execute(text(f"""SELECT {', '.join(USER_IDENTITY_FIELDS)} FROM users WHERE email = :email ORDER BY id LIMIT 1"""), {"email": email})
             row = result.fetchone()
-            if row is None:
-                return None
-            return {
-                "id": row[0],
-                "google_id": row[1],
-                "email": row[2],
-                "name": row[3],
-                "picture": row[4],
-                "access_token": row[5],
-                "refresh_token": row[6],
-                "token_expires_at": row[7],
-                "created_at": row[8]
-            }
+            return _user_record(row) if row is not None else None
     
     async def update_user_tokens(self, google_id: str, access_token: str, refresh_token: Optional[str] = None, token_expires_at: Optional[datetime] = None):
         async with self.engine.begin() as conn:
             if refresh_token:
-                await conn.execute(text("""UPDATE users SET access_token = :access_token, refresh_token = :refresh_token, token_expires_at = :token_expires_at WHERE google_id = :google_id"""), {"google_id": google_id, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at})
+                result = await conn.execute(text("""UPDATE users SET access_token = :access_token, refresh_token = :refresh_token, token_expires_at = :token_expires_at WHERE google_id = :google_id RETURNING id, telegram_id"""), {"google_id": google_id, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at})
             else:
-                await conn.execute(text("""UPDATE users SET access_token = :access_token, token_expires_at = :token_expires_at WHERE google_id = :google_id"""), {"google_id": google_id, "access_token": access_token, "token_expires_at": token_expires_at})
-            return {"google_id": google_id, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at}
+                result = await conn.execute(text("""UPDATE users SET access_token = :access_token, token_expires_at = :token_expires_at WHERE google_id = :google_id RETURNING id, telegram_id"""), {"google_id": google_id, "access_token": access_token, "token_expires_at": token_expires_at})
+            row = result.fetchone()
+        if row is not None:
+            await self._invalidate_identities(identity_aliases({"id": row[0], "telegram_id": row[1], "google_id": google_id}))
+        return {"google_id": google_id, "access_token": access_token, "refresh_token": refresh_token, "token_expires_at": token_expires_at}
 
     async def get_user_by_google_id(self, google_id:str):
-        async with self.engine.begin() as conn:
-            result = await conn.execute(text("""SELECT * FROM users WHERE google_id = :google_id"""), {"google_id": google_id})
-            row = result.fetchone()
-            if row is None:
-                return None
-            return {
-                "id": row[0],
-                "google_id": row[1],
-                "email": row[2],
-                "name": row[3],
-                "picture": row[4],
-                "access_token": row[5],
-                "refresh_token": row[6],
-                "token_expires_at": row[7],
-                "created_at": row[8]
-            }
+        return await self._find_user(f"google:{google_id}", "google_id", google_id)
 
     async def get_user_by_id(self, user_id: int):
-        async with self.engine.begin() as conn:
-            result = await conn.execute(text("""SELECT * FROM users WHERE id = :user_id"""), {"user_id": user_id})
-            row = result.fetchone()
-            if row is None:
-                return None
-            return {
-                "id": row[0],
-                "google_id": row[1],
-                "email": row[2],
-                "name": row[3],
-                "picture": row[4],
-                "access_token": row[5],
-                "refresh_token": row[6],
-                "token_expires_at": row[7],
-                "created_at": row[8]
-            }
+        return await self._find_user(f"id:{user_id}", "id", user_id)
 
     async def connect_google_user_to_telegram_user(self, google_id: str, telegram_id: int):
         async with self.engine.begin() as conn:
-            await conn.execute(text("""UPDATE users SET google_id = :google_id WHERE telegram_id = :telegram_id"""), {"google_id": google_id, "telegram_id": telegram_id})
-            return {"google_id": google_id, "telegram_id": telegram_id}
+            # Прежний google_id тоже нужно вычистить из кэша
+            result = await conn.execute(text("""
+                UPDATE users u SET google_id = :google_id
+                FROM (SELECT id, google_id AS old_google_id FROM users WHERE telegram_id = :telegram_id FOR UPDATE) old
+                WHERE u.id = old.id
+                RETURNING u.id, old.old_google_id
+            """), {"google_id": google_id, "telegram_id": telegram_id})
+            rows = result.fetchall()
+        aliases = [f"google:{google_id}"]
+        for row in rows:
+            aliases += identity_aliases({"id": row[0], "telegram_id": telegram_id, "google_id": row[1]})
+        await self._invalidate_identities(aliases)
+        return {"google_id": google_id, "telegram_id": telegram_id}
 
     async def create_exchange(self, task_id: int, user_id: int, prompt: str, response: str):
         async with self.engine.begin() as conn:
-            check = await conn.execute(text("""
-                SELECT 1 FROM tasks WHERE id = :task_id AND user_id = :user_id
-            """), {"task_id": task_id, "user_id": user_id})
-            if check.fetchone() is None:
-                raise Exception("Task not found or you don't have permission to add exchanges to it")
-            
-            result = await conn.execute(text("""
-                INSERT INTO exchanges (task_id, user_id, prompt, response) 
-                VALUES (:task_id, :user_id, :prompt, :response)
+            # Проверка владельца, счётчик обменов и вставка одним запросом
+            result = await conn.execute(text(f"""
+                WITH owned AS (
+                    UPDATE tasks SET exchange_count = exchange_count + 1
+                    WHERE id = :task_id AND user_id = :user_id
+                    RETURNING id
+                )
+                INSERT INTO exchanges (task_id, user_id, prompt, response, response_summary) 
+                SELECT owned.id, :user_id, :prompt, :response, {_response_summary_sql(':response')}
+                FROM owned
                 RETURNING id, created_at
-            """), {"task_id": task_id, "user_id": user_id, "prompt": prompt, "response": response})
+            """), {"task_id": task_id, "user_id": user_id, "prompt": prompt, "response": response, "summary_chars": RESPONSE_SUMMARY_CHARS})
             row = result.fetchone()
             if row is None:
-                raise Exception("Failed to create exchange")
-            return {"id": row[0], "task_id": task_id, "user_id": user_id, "prompt": prompt, "response": response, "created_at": row[1]}
+                raise Exception("Task not found or you don't have permission to add exchanges to it")
+        # exchange_count в записи задачи изменился
+        await self._invalidate_tasks([task_id], [], public_feed=False)
+        return {"id": row[0], "task_id": task_id, "user_id": user_id, "prompt": prompt, "response": response, "created_at": row[1]}
 
-    async def get_task_exchanges(self, task_id: int, user_id: int):
+    async def create_exchanges(self, exchanges: list) -> int:
+        """Пакетная вставка обменов одним запросом; строки чужих задач пропускаются"""
+        if not exchanges:
+            return 0
         async with self.engine.begin() as conn:
-            check = await conn.execute(text("""
-                SELECT 1 FROM tasks WHERE id = :task_id AND user_id = :user_id
-            """), {"task_id": task_id, "user_id": user_id})
-            if check.fetchone() is None:
-                raise Exception("Task not found or you don't have permission to view its exchanges")
-            
-            result = await conn.execute(text("""
-                SELECT id, prompt, response, created_at 
-                FROM exchanges 
+            result = await conn.execute(text(f"""
+                WITH rows AS (
+                    SELECT * FROM unnest(
+                        CAST(:task_ids AS INTEGER[]),
+                        CAST(:user_ids AS INTEGER[]),
+                        CAST(:prompts AS TEXT[]),
+                        CAST(:responses AS TEXT[])
+                    ) WITH ORDINALITY AS r(task_id, user_id, prompt, response, ord)
+                ),
+                owned AS (
+                    UPDATE tasks t SET exchange_count = t.exchange_count + c.total
+                    FROM (SELECT task_id, user_id, COUNT(*) AS total FROM rows GROUP BY task_id, user_id) c
+                    WHERE t.id = c.task_id AND t.user_id = c.user_id
+                    RETURNING t.id, t.user_id
+                )
+                INSERT INTO exchanges (task_id, user_id, prompt, response, response_summary)
+                SELECT rows.task_id, rows.user_id, rows.prompt, rows.response, {_response_summary_sql('rows.response')}
+                FROM rows JOIN owned ON owned.id = rows.task_id AND owned.user_id = rows.user_id
+                ORDER BY rows.ord
+                RETURNING id
+            """), {
+                "task_ids": [exchange["task_id"] for exchange in exchanges],
+                "user_ids": [exchange["user_id"] for exchange in exchanges],
+                "prompts": [exchange["prompt"] for exchange in exchanges],
+                "responses": [exchange["response"] for exchange in exchanges],
+                "summary_chars": RESPONSE_SUMMARY_CHARS
+            })
+            written = len(result.fetchall())
+        await self._invalidate_tasks([exchange["task_id"] for exchange in exchanges], [], public_feed=False)
+        return written
+
+    async def get_recent_exchanges(self, task_id: int, user_id: int, limit: int = 3, prompt_chars: int = 500):
+        """Последние limit обменов в хронологическом порядке, уже усечённые в SQL"""
+        async with self.engine.begin() as conn:
+            result = await conn.execute(text(f"""
+                SELECT id, LEFT(prompt, :prompt_chars), COALESCE(response_summary, {_response_summary_sql('response')}), created_at
+                FROM exchanges
                 WHERE task_id = :task_id AND user_id = :user_id
-                ORDER BY created_at ASC
-            """), {"task_id": task_id, "user_id": user_id})
-            return [{"id": row[0], "prompt": row[1], "response": row[2], "created_at": row[3]} for row in result.fetchall()]
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """), {"task_id": task_id, "user_id": user_id, "limit": limit, "prompt_chars": prompt_chars, "summary_chars": RESPONSE_SUMMARY_CHARS})
+            rows = result.fetchall()
+            return [{"id": row[0], "prompt": row[1], "response_summary": row[2], "created_at": row[3]} for row in reversed(rows)]
+
+    async def get_task_exchanges(self, task_id: int, user_id: int, limit: Optional[int] = None, cursor: Optional[str] = None, descending: bool = False):
+        """Страница истории обменов; descending=True листает от последних сообщений к первым"""
+        limit = _page_size(limit)
+        params = {"task_id": task_id, "user_id": user_id, "limit": limit + 1}
+        direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+        cursor_clause = ""
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = _decode_cursor(cursor)
+            cursor_clause = f"AND (created_at, id) {comparison} (:cursor_created_at, :cursor_id)"
+        async with self.engine.begin() as conn:
+            # Одна выборка: нет строк — задача чужая, одна строка с NULL — обменов нет
+            result = await conn.execute(text(f"""
+                SELECT e.id, e.prompt, e.response, e.created_at
+                FROM tasks t
+                LEFT JOIN LATERAL (
+                    SELECT id, prompt, response, created_at 
+                    FROM exchanges 
+                    WHERE task_id = t.id AND user_id = t.user_id {cursor_clause}
+                    ORDER BY created_at {direction}, id {direction}
+                    LIMIT :limit
+                ) e ON TRUE
+                WHERE t.id = :task_id AND t.user_id = :user_id
+            """), params)
+            rows = result.fetchall()
+            if not rows:
+                raise Exception("Task not found or you don't have permission to view its exchanges")
+            return _make_page([{"id": row[0], "prompt": row[1], "response": row[2], "created_at": row[3]} for row in rows if row[0] is not None], limit)
 
     async def update_task_privacy(self, task_id: int, user_id: int, private: bool):
         async with self.engine.begin() as conn:
@@ -292,18 +429,31 @@ class DatabaseManager:
             """), {"private": private, "task_id": task_id, "user_id": user_id})
             if result.rowcount == 0:
                 raise Exception("Task not found or you don't have permission to update it")
-            return {"id": task_id, "private": private}
+        await self._invalidate_tasks([task_id], [user_id])
+        return {"id": task_id, "private": private}
 
-    async def get_public_tasks(self):
+    async def get_public_tasks(self, limit: Optional[int] = None, cursor: Optional[str] = None):
+        limit = _page_size(limit)
+        if self.cache is None:
+            return await self._load_public_tasks(limit, cursor)
+        return await self.cache.get_public_tasks_page(limit, cursor, lambda: self._load_public_tasks(limit, cursor), ttl_seconds=TASK_CACHE_TTL_SECONDS)
+
+    async def _load_public_tasks(self, limit: int, cursor: Optional[str]):
+        params = {"limit": limit + 1}
+        cursor_clause = ""
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = _decode_cursor(cursor)
+            cursor_clause = "AND (t.created_at, t.id) < (:cursor_created_at, :cursor_id)"
         async with self.engine.begin() as conn:
-            result = await conn.execute(text("""
+            result = await conn.execute(text(f"""
                 SELECT t.id, t.task_name, t.task_description, t.task_status, t.private, t.user_id, t.created_at, t.updated_at, u.name as user_name, u.email as user_email 
                 FROM tasks t 
                 JOIN users u ON t.user_id = u.id
-                WHERE t.private = FALSE
-                ORDER BY t.created_at DESC
-            """))
-            return [{
+                WHERE t.private = FALSE {cursor_clause}
+                ORDER BY t.created_at DESC, t.id DESC
+                LIMIT :limit
+            """), params)
+            return _make_page([{
                 "id": row[0],
                 "task_name": row[1],
                 "task_description": row[2],
@@ -314,6 +464,4 @@ class DatabaseManager:
                 "updated_at": row[7],
                 "user_name": row[8],
                 "user_email": row[9]
-            } for row in result.fetchall()]
-
-   
\ No newline at end of file
+            } for row in result.fetchall()], limit)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from databasemanager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Верхняя граница паузы между повторами записи, секунды
+MAX_RETRY_DELAY_SECONDS = 30
+
+
+def is_retryable(error: Exception) -> bool:
+    """Обрыв соединения или таймаут БД — запись можно повторить; нарушение ограничений или чужая задача — нет"""
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+    return isinstance(error, OSError)
+
+
+class ExchangeWriter:
+    """Отложенная пакетная запись обменов.
+
+    Обмены копятся в памяти процесса и записываются пачками по batch_size или раз в
+    flush_interval секунд. При заполненном буфере запись идёт синхронно, при остановке
+    воркера буфер сбрасывается в БД. Выключенный writer пишет каждый обмен сразу.
+
+    При временной ошибке БД пачка возвращается в начало буфера и повторяется с
+    экспоненциальной паузой, не более max_retries раз. Сразу отбрасываются только
+    обмены, которые не записать никогда (чужая задача, нарушение ограничений).
+    """
+
+    def __init__(self, db: DatabaseManager, enabled: bool = False, max_buffer: int = 1000, batch_size: int = 200, flush_interval: float = 1.0, max_retries: int = 6, retry_delay: float = 0.5):
+        self.db = db
+        self.enabled = enabled
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.buffer: list = []
+        self.stats = {"buffered": 0, "written": 0, "sync_writes": 0, "batches": 0, "retried": 0, "failed": 0}
+        self._retry_at = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        if not self.enabled:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def submit(self, task_id: int, user_id: int, prompt: str, response: str) -> Optional[dict]:
+        """Возвращает созданный обмен при синхронной записи и None, если обмен поставлен в буфер"""
+        if not self.enabled or len(self.buffer) >= self.max_buffer:
+            if self.enabled:
+                self.stats["sync_writes"] += 1
+            return await self.db.create_exchange(task_id, user_id, prompt, response)
+
+        self.buffer.append({"task_id": task_id, "user_id": user_id, "prompt": prompt, "response": response, "attempts": 0})
+        self.stats["buffered"] += 1
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+        return None
+
+    async def flush(self) -> bool:
+        """True, если буфер записан целиком; False, если запись отложена до следующего повтора"""
+        if not self.enabled:
+            return True
+        async with self._flush_lock:
+            while self.buffer:
+                if asyncio.get_running_loop().time() < self._retry_at:
+                    return False
+                batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+                try:
+                    self.stats["written"] += await self.db.create_exchanges(batch)
+                    self.stats["batches"] += 1
+                except Exception as e:
+                    if is_retryable(e):
+                        self._requeue(batch, e)
+                        return False
+                    logger.error("Batch exchange write failed, writing one by one: %s", e)
+                    if not await self._write_individually(batch):
+                        return False
+            return True
+
+    async def _write_individually(self, batch: list) -> bool:
+        for index, exchange in enumerate(batch):
+            try:
+                await self.db.create_exchange(exchange["task_id"], exchange["user_id"], exchange["prompt"], exchange["response"])
+                self.stats["written"] += 1
+            except Exception as e:
+                if is_retryable(e):
+                    self._requeue(batch[index:], e)
+                    return False
+                self.stats["failed"] += 1
+                logger.error("Dropping exchange for task %s: %s", exchange["task_id"], e)
+        return True
+
+    def _requeue(self, exchanges: list, error: Exception):
+        """Возвращает обмены в начало буфера и назначает следующий повтор"""
+        kept = []
+        for exchange in exchanges:
+            exchange["attempts"] += 1
+            if exchange["attempts"] > self.max_retries:
+                self.stats["failed"] += 1
+                logger.error("Dropping exchange for task %s after %s attempts: %s", exchange["task_id"], exchange["attempts"], error)
+            else:
+                kept.append(exchange)
+        if not kept:
+            return
+        self.stats["retried"] += len(kept)
+        self.buffer = kept + self.buffer
+        attempts = max(exchange["attempts"] for exchange in kept)
+        delay = min(MAX_RETRY_DELAY_SECONDS, self.retry_delay * 2 ** (attempts - 1))
+        self._retry_at = asyncio.get_running_loop().time() + delay
+        logger.warning("Exchange write failed, retrying %s exchanges in %.1fs: %s", len(kept), delay, error)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Exchange flush error: %s", e)
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        # Повторы ограничены max_retries, поэтому цикл завершается и при недоступной БД
+        while not await self.flush():
+            await asyncio.sleep(max(0.0, self._retry_at - asyncio.get_running_loop().time()))
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from metrics import metrics
+from redismanager import RedisManager
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_INVALIDATION_CHANNEL = "identity_invalidate"
+
+
+def identity_aliases(record: dict) -> list:
+    """Все ключи, по которым пользователь может быть найден"""
+    aliases = [f"id:{record['id']}"]
+    if record.get("telegram_id") is not None:
+        aliases.append(f"telegram:{record['telegram_id']}")
+    if record.get("google_id"):
+        aliases.append(f"google:{record['google_id']}")
+    return aliases
+
+
+class IdentityCache:
+    """Двухуровневый кэш пользователей: ограниченный LRU с TTL в памяти процесса поверх Redis.
+
+    Инвалидация удаляет записи из Redis, увеличивает версии алиасов (загрузка, начатая до неё,
+    не перезапишет Redis устаревшей записью) и через pub/sub очищает локальные кэши всех воркеров;
+    локальный TTL ограничивает устаревание, если сообщение было потеряно.
+    """
+
+    def __init__(self, redis: RedisManager, max_entries: int = 10000, ttl_seconds: float = 60, redis_ttl_seconds: int = 600):
+        self.redis = redis
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+        self._entries: OrderedDict = OrderedDict()
+        # Растёт при каждой инвалидации; запись, загруженная до неё, не сохраняется
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.redis.redis_client is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+
+    async def get(self, alias: str, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        entry = self._entries.get(alias)
+        if entry is not None:
+            expires_at, record = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(alias)
+                self.stats["local_hits"] += 1
+                metrics.inc("cache_requests_total", cache="identity", result="local_hit")
+                return dict(record)
+            del self._entries[alias]
+
+        generation = self._generation
+        version, record = await self.redis.get_identity(alias)
+        if record is not None:
+            self.stats["redis_hits"] += 1
+            metrics.inc("cache_requests_total", cache="identity", result="redis_hit")
+            if generation == self._generation:
+                self._remember([alias], record)
+            return record
+
+        self.stats["misses"] += 1
+        metrics.inc("cache_requests_total", cache="identity", result="miss")
+        record = await loader()
+        # Отсутствующих пользователей не кэшируем: их создание не должно ждать TTL
+        if record is not None and generation == self._generation:
+            aliases = identity_aliases(record)
+            # Инвалидация из другого воркера во время загрузки меняет версию алиаса, и устаревшая
+            # запись не попадёт в Redis; инвалидация затрагивает все алиасы пользователя, так что
+            # достаточно версии алиаса, по которому искали
+            if version is not None:
+                await self.redis.set_identity(alias, version, aliases, record, ttl_seconds=self.redis_ttl_seconds)
+            self._remember(aliases, record)
+        return record
+
+    async def invalidate(self, aliases: list):
+        self._forget(aliases)
+        await self.redis.invalidate_identities(aliases, IDENTITY_INVALIDATION_CHANNEL)
+
+    def _remember(self, aliases: list, record: dict):
+        expires_at = time.monotonic() + self.ttl_seconds
+        for alias in aliases:
+            self._entries[alias] = (expires_at, dict(record))
+            self._entries.move_to_end(alias)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _forget(self, aliases: list):
+        self._generation += 1
+        self.stats["invalidations"] += 1
+        for alias in aliases:
+            self._entries.pop(alias, None)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(IDENTITY_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._forget(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Identity invalidation listener error: %s", e)
+                # Пропущенные инвалидации неизвестны — сбрасываем локальный уровень
+                self._generation += 1
+                self._entries.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from metrics import metrics
+from redismanager import RedisManager
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Множители AIMD: 429 режет лимит вдвое, медленный ответ — на 10%
+RATE_LIMITED_DECREASE = 0.5
+SLOW_DECREASE = 0.9
+DECREASE_COOLDOWN_SECONDS = 2
+# Пауза для всех воркеров после 429 без Retry-After
+DEFAULT_RETRY_AFTER_SECONDS = 5
+
+
+class LLMRateLimited(Exception):
+    """Слот для вызова LLM не получен за допустимое для приоритета время"""
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(f"LLM rate limited ({reason}), retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+class LLMGovernor:
+    """Лимитер вызовов LLM, общий для всех LLMManager через Redis.
+
+    Перед вызовом берётся слот: свободная конкурентность и запас в bucket запросов (rpm) и
+    токенов (tpm). Предел конкурентности подстраивается по AIMD: растёт на 1/limit за каждый
+    успешный ответ и умножается на RATE_LIMITED_DECREASE после 429 (все воркеры при этом
+    выдерживают Retry-After) или на SLOW_DECREASE, если ответ дольше latency_target.
+
+    Фоновым вызовам доступна только background_share лимитов, остальное — запас для
+    интерактивных. Если слот не освобождается за max_wait приоритета, бросается LLMRateLimited.
+    Без Redis вызовы не ограничиваются.
+    """
+
+    def __init__(
+        self,
+        redis: RedisManager,
+        rpm: int,
+        tpm: int,
+        concurrency: tuple,
+        latency_target: float,
+        background_share: float,
+        max_wait: dict,
+        lease_seconds: float = 300
+    ):
+        self.redis = redis
+        self.rpm = rpm
+        self.tpm = tpm
+        # (начальный, минимальный, максимальный) предел одновременных запросов
+        self.concurrency = concurrency
+        self.latency_target = latency_target
+        self.shares = {INTERACTIVE: 1.0, BACKGROUND: background_share}
+        self.max_wait = max_wait
+        # Аренда слота истекает сама, если процесс умер, не вернув его
+        self.lease_seconds = lease_seconds
+        self.stats = {"acquired": 0, "waited_seconds_total": 0.0, "rejected": 0, "rate_limited": 0, "slow": 0}
+        self.limit = concurrency[0]
+
+    async def acquire(self, tokens: int, priority: str) -> Optional[str]:
+        lease_id = uuid.uuid4().hex
+        started = time.monotonic()
+        deadline = started + self.max_wait[priority]
+        while True:
+            result = await self.redis.governor_acquire(
+                self.rpm, self.tpm, tokens, self.shares[priority], lease_id, self.lease_seconds, self.concurrency[0]
+            )
+            if result is None:
+                return None
+            granted, wait, reason = result
+            if granted:
+                waited = time.monotonic() - started
+                self.stats["acquired"] += 1
+                self.stats["waited_seconds_total"] += waited
+                metrics.observe("llm_governor_wait_seconds", waited, priority=priority)
+                return lease_id
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self.stats["rejected"] += 1
+                metrics.inc("llm_governor_rejected_total", priority=priority, reason=reason)
+                raise LLMRateLimited(wait, reason)
+            # Джиттер разводит ожидающих, чтобы они не проверяли bucket одновременно
+            await asyncio.sleep(wait * (1 + random.random() * 0.2))
+
+    async def release(self, lease_id: Optional[str], token_correction: int, outcome: str, retry_after: float = 0):
+        if outcome in ("rate_limited", "slow"):
+            self.stats[outcome] += 1
+            metrics.inc("llm_governor_signals_total", outcome=outcome)
+        if lease_id is None:
+            return
+        limit = await self.redis.governor_release(
+            lease_id, token_correction, outcome, retry_after, self.concurrency,
+            RATE_LIMITED_DECREASE, SLOW_DECREASE, DECREASE_COOLDOWN_SECONDS
+        )
+        if limit is not None:
+            self.limit = limit
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: str):
+        """with governor.slot(...) as usage: вызов LLM. usage["tokens"] — фактический расход, если известен,
+        usage["latency"] — задержка для AIMD (для стрима — до первого чанка). 429 провайдера
+        превращается в LLMRateLimited"""
+        lease_id = await self.acquire(tokens, priority)
+        usage = {"tokens": tokens, "latency": None}
+        started = time.perf_counter()
+        # Отмена и прерванный стрим считаются ошибкой и не меняют лимит
+        outcome, retry_after = "error", 0.0
+        try:
+            yield usage
+            outcome = "ok"
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            outcome, retry_after = "rate_limited", retry_after_seconds(e)
+            logger.warning("LLM provider rate limited, pausing calls for %.1fs", retry_after)
+            # Вызывающий код обрабатывает 429 провайдера так же, как отказ лимитера
+            raise LLMRateLimited(retry_after, "provider") from e
+        finally:
+            latency = usage["latency"] if usage["latency"] is not None else time.perf_counter() - started
+            if outcome == "ok" and latency > self.latency_target:
+                outcome = "slow"
+            await self.release(lease_id, tokens - usage["tokens"], outcome, retry_after)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "limit": self.limit}
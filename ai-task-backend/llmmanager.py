@@ -1,103 +1,369 @@
-from openai import OpenAI
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import timezone
+from typing import Optional
 
-from config import LLM_TOKEN, DATABASE_URL, REDIS_URL
+from config import (
+    DATABASE_URL, REDIS_URL, LLM_MAX_IN_FLIGHT,
+    CONTEXT_REFRESH_EXCHANGES, CONTEXT_REFRESH_SECONDS,
+    LLM_RESPONSE_CACHE, LLM_RESPONSE_CACHE_TTL_SECONDS, LLM_RESPONSE_CACHE_MAX_ENTRIES, LLM_RESPONSE_CACHE_MAX_CHARS,
+    SEMANTIC_CACHE, SEMANTIC_CACHE_EMBEDDER, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_MAX_TASKS,
+    LLM_PROMPT_TOKEN_BUDGET, CONTEXT_PROMPT_TOKEN_BUDGET,
+    LLM_GOVERNOR, LLM_RPM, LLM_TPM, LLM_CONCURRENCY_INITIAL, LLM_CONCURRENCY_MIN, LLM_CONCURRENCY_MAX,
+    LLM_LATENCY_TARGET_SECONDS, LLM_BACKGROUND_SHARE, LLM_INTERACTIVE_MAX_WAIT_SECONDS, LLM_BACKGROUND_MAX_WAIT_SECONDS,
+    LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES
+)
 from databasemanager import DatabaseManager
+from llmgovernor import BACKGROUND, INTERACTIVE, LLMGovernor, LLMRateLimited
+from llmproviders import LLMProvider, create_provider
+from metrics import instrument_methods, metrics
+from promptbuilder import PromptBuilder, TokenCounter, MESSAGE_OVERHEAD_TOKENS
 from redismanager import RedisManager
+from semanticcache import SemanticCache, load_embedder
 
+logger = logging.getLogger(__name__)
+
+ANSWER_TEMPERATURE = 0.7
+ANSWER_MAX_TOKENS = 1000
+# Размер чанка при воспроизведении ответа из кэша
+REPLAY_CHUNK_CHARS = 64
+# Наибольшее время генерации контекста: ожидание слота в лимитере, все попытки запроса к LLM
+# и запас на чтение истории и запись в БД. Столько ждут параллельные вызовы лидера single-flight
+CONTEXT_GENERATION_MAX_SECONDS = (
+    max(LLM_INTERACTIVE_MAX_WAIT_SECONDS, LLM_BACKGROUND_MAX_WAIT_SECONDS)
+    + LLM_TIMEOUT_SECONDS * (LLM_MAX_RETRIES + 1)
+    + 30
+)
+
+
+class LLMStreamError(Exception):
+    """Провайдер LLM не смог выдать потоковый ответ; уже отправленные чанки неполные"""
+
+
+@instrument_methods("llm")
 class LLMManager:
-    def __init__(self):
-        self.client = OpenAI(api_key=LLM_TOKEN)
-        self.model = "gpt-4o-mini"  
-        self.db = DatabaseManager(database_url=DATABASE_URL)
-        self.redis = RedisManager(redis_url=REDIS_URL)
+    def __init__(self, db: Optional[DatabaseManager] = None, redis: Optional[RedisManager] = None, provider: Optional[LLMProvider] = None):
+        self.provider = provider or create_provider()
+        # Ограничение числа одновременных запросов к LLM в рамках процесса
+        self.in_flight = asyncio.Semaphore(LLM_MAX_IN_FLIGHT)
+        self.model = self.provider.model
+        self.prompt_builder = PromptBuilder(TokenCounter(self.model))
+        self.response_cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bypassed": 0}
+        self._owns_db = db is None
+        self._owns_redis = redis is None
+        self.db = db or DatabaseManager(database_url=DATABASE_URL)
+        self.redis = redis or RedisManager(redis_url=REDIS_URL)
+        self.semantic_cache = SemanticCache(
+            self.redis,
+            load_embedder(SEMANTIC_CACHE_EMBEDDER),
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            max_entries_per_task=SEMANTIC_CACHE_MAX_ENTRIES,
+            max_tasks=SEMANTIC_CACHE_MAX_TASKS,
+            ttl_seconds=LLM_RESPONSE_CACHE_TTL_SECONDS
+        ) if SEMANTIC_CACHE else None
+        self.governor = LLMGovernor(
+            self.redis,
+            rpm=LLM_RPM,
+            tpm=LLM_TPM,
+            concurrency=(LLM_CONCURRENCY_INITIAL, LLM_CONCURRENCY_MIN, LLM_CONCURRENCY_MAX),
+            latency_target=LLM_LATENCY_TARGET_SECONDS,
+            background_share=LLM_BACKGROUND_SHARE,
+            max_wait={INTERACTIVE: LLM_INTERACTIVE_MAX_WAIT_SECONDS, BACKGROUND: LLM_BACKGROUND_MAX_WAIT_SECONDS}
+        ) if LLM_GOVERNOR else None
     
     async def init_redis(self):
         await self.redis.init_redis()
 
-    def get_answer(self, prompt: str, task_context: str) -> str:
-        try:
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are an AI assistant helping with task management. Here's the task context:\n{task_context}"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
+    async def close(self):
+        await self.provider.close()
+        if self._owns_redis:
+            await self.redis.close()
+        if self._owns_db:
+            await self.db.close()
 
-            answer = completion.choices[0].message.content
-            if answer and "<think>" in answer and "</think>" in answer:
-                clean_answer = answer.split("</think>")[-1].strip()
-            else:
-                clean_answer = answer or "No answer"
-                
-            return clean_answer
+    def _system_prompt(self, task_context: str) -> str:
+        return f"You are an AI assistant helping with task management. Here's the task context:\n{task_context}"
+
+    def fit_answer_prompt(self, task_context: str, prompt: str) -> tuple:
+        """(system_prompt, prompt) в пределах LLM_PROMPT_TOKEN_BUDGET: сначала урезается контекст задачи, затем вопрос"""
+        def render(task_context: str, prompt: str) -> str:
+            return self._system_prompt(task_context) + prompt
+
+        # Бюджет без служебных токенов двух сообщений
+        parts = self.prompt_builder.fit(
+            render,
+            {"task_context": task_context, "prompt": prompt},
+            ["task_context", "prompt"],
+            LLM_PROMPT_TOKEN_BUDGET - 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        return self._system_prompt(parts["task_context"]), parts["prompt"]
+
+    def _clean_answer(self, answer: Optional[str]) -> str:
+        if answer and "<think>" in answer and "</think>" in answer:
+            return answer.split("</think>")[-1].strip()
+        return answer or "No answer"
+
+    def _replay_chunks(self, answer: str) -> list:
+        """Режет ответ по словам на чанки около REPLAY_CHUNK_CHARS; в каждом есть непробельный символ"""
+        chunks, current = [], ""
+        for word in re.findall(r"\s*\S+", answer):
+            current += word
+            if len(current) >= REPLAY_CHUNK_CHARS:
+                chunks.append(current)
+                current = ""
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def response_cache_key(self, system_prompt: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        payload = json.dumps([self.model, system_prompt, prompt, temperature, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _record_response_cache(self, name: str):
+        self.response_cache_stats[name] += 1
+        metrics.inc("cache_requests_total", cache="llm_response", result=name)
+        await self.redis.incr_stats("llm_response_cache_stats", name)
+
+    async def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key is None:
+            return None
+        answer = await self.redis.get_llm_response(cache_key)
+        await self._record_response_cache("hits" if answer is not None else "misses")
+        return answer
+
+    async def _store_cached_response(self, cache_key: Optional[str], answer: str):
+        if cache_key is None or len(answer) > LLM_RESPONSE_CACHE_MAX_CHARS:
+            return
+        evicted = await self.redis.set_llm_response(cache_key, answer, LLM_RESPONSE_CACHE_TTL_SECONDS, LLM_RESPONSE_CACHE_MAX_ENTRIES)
+        await self._record_response_cache("stores")
+        if evicted:
+            self.response_cache_stats["evictions"] += evicted
+            await self.redis.incr_stats("llm_response_cache_stats", "evictions", evicted)
+
+    async def _response_cache_key_for(self, system_prompt: str, prompt: str, use_cache: bool) -> Optional[str]:
+        """Ключ кэша ответа или None, если кэш выключен или обойдён вызывающим"""
+        if not LLM_RESPONSE_CACHE:
+            return None
+        if not use_cache:
+            await self._record_response_cache("bypassed")
+            return None
+        return self.response_cache_key(system_prompt, prompt, ANSWER_TEMPERATURE, ANSWER_MAX_TOKENS)
+
+    async def _lookup_answer(self, cache_key: Optional[str], system_prompt: str, prompt: str, scope: Optional[tuple]) -> Optional[str]:
+        """Точное совпадение, затем близкий по смыслу вопрос в той же задаче"""
+        answer = await self._get_cached_response(cache_key)
+        if answer is None and self.semantic_cache is not None and scope is not None:
+            answer = await self.semantic_cache.lookup(*scope, system_prompt, prompt)
+        return answer
+
+    async def _remember_answer(self, cache_key: Optional[str], system_prompt: str, prompt: str, scope: Optional[tuple], answer: str):
+        await self._store_cached_response(cache_key, answer)
+        if self.semantic_cache is not None and scope is not None and len(answer) <= LLM_RESPONSE_CACHE_MAX_CHARS:
+            await self.semantic_cache.store(*scope, system_prompt, prompt, answer)
+
+    async def get_response_cache_stats(self) -> dict:
+        return {"process": dict(self.response_cache_stats), "cluster": await self.redis.get_stats("llm_response_cache_stats")}
+
+    @asynccontextmanager
+    async def _llm_slot(self, messages: list, max_tokens: int, priority: str):
+        """Предел запросов процесса и, если включён, общий лимитер; отдаёт usage для поправки расхода токенов"""
+        async with self.in_flight:
+            if self.governor is None:
+                yield {"tokens": 0, "latency": None}
+                return
+            estimated_tokens = self.prompt_builder.messages_tokens(messages) + max_tokens
+            async with self.governor.slot(estimated_tokens, priority) as usage:
+                yield usage
+
+    def _semantic_scope(self, task_id: Optional[int], user_id: Optional[int], use_cache: bool) -> Optional[tuple]:
+        if not use_cache or task_id is None or user_id is None:
+            return None
+        return (task_id, user_id)
+
+    async def get_answer(self, prompt: str, task_context: str, use_cache: bool = True, task_id: Optional[int] = None, user_id: Optional[int] = None, priority: str = INTERACTIVE) -> str:
+        system_prompt, prompt = self.fit_answer_prompt(task_context, prompt)
+        cache_key = await self._response_cache_key_for(system_prompt, prompt, use_cache)
+        scope = self._semantic_scope(task_id, user_id, use_cache)
+        cached_answer = await self._lookup_answer(cache_key, system_prompt, prompt, scope)
+        if cached_answer is not None:
+            return cached_answer
+
+        messages = [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        try:
+            async with self._llm_slot(messages, ANSWER_MAX_TOKENS, priority) as usage:
+                answer = await self.provider.complete(
+                    messages,
+                    temperature=ANSWER_TEMPERATURE,
+                    max_tokens=ANSWER_MAX_TOKENS
+                )
+                usage["tokens"] = self.prompt_builder.messages_tokens(messages) + self.prompt_builder.counter.count(answer or "")
+        except LLMRateLimited:
+            raise
         except Exception as e:
-            print(f"OpenAI API Error: {e}")
+            logger.warning("OpenAI API Error: %s", e)
             return f"🚫 Ошибка AI: {str(e)}"
 
-    def stream_answer(self, prompt: str, task_context: str):
+        clean_answer = self._clean_answer(answer)
+        if answer:
+            await self._remember_answer(cache_key, system_prompt, prompt, scope, clean_answer)
+        return clean_answer
+
+    async def stream_answer(self, prompt: str, task_context: str, use_cache: bool = True, task_id: Optional[int] = None, user_id: Optional[int] = None, priority: str = INTERACTIVE):
+        system_prompt, prompt = self.fit_answer_prompt(task_context, prompt)
+        cache_key = await self._response_cache_key_for(system_prompt, prompt, use_cache)
+        scope = self._semantic_scope(task_id, user_id, use_cache)
+        cached_answer = await self._lookup_answer(cache_key, system_prompt, prompt, scope)
+        if cached_answer is not None:
+            # Быстрое воспроизведение кэшированного ответа без обращения к LLM
+            for chunk in self._replay_chunks(cached_answer):
+                yield chunk
+            return
+
+        chunks = []
+        messages = [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
         try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are an AI assistant helping with task management. Here's the task context:\n{task_context}"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=1000,
-                stream=True
-            )
+            async with self._llm_slot(messages, ANSWER_MAX_TOKENS, priority) as usage:
+                started = time.perf_counter()
+                stream = self.provider.stream(
+                    messages,
+                    temperature=ANSWER_TEMPERATURE,
+                    max_tokens=ANSWER_MAX_TOKENS
+                )
 
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    content = chunk.choices[0].delta.content
+                async for content in stream:
+                    if usage["latency"] is None:
+                        # Для AIMD важна задержка до первого чанка, а не длина ответа
+                        usage["latency"] = time.perf_counter() - started
                     if content and content.strip():  
+                        chunks.append(content)
                         yield content
+                usage["tokens"] = self.prompt_builder.messages_tokens(messages) + self.prompt_builder.counter.count("".join(chunks))
                     
+        except LLMRateLimited:
+            raise
         except Exception as e:
-            print(f"OpenAI Streaming API Error: {e}")
-            yield f"🚫 Ошибка AI: {str(e)}"
+            logger.warning("OpenAI Streaming API Error: %s", e)
+            raise LLMStreamError(f"🚫 Ошибка AI: {str(e)}") from e
+
+        if chunks:
+            await self._remember_answer(cache_key, system_prompt, prompt, scope, self._clean_answer("".join(chunks)))
 
     async def invalidate_task_cache(self, task_id: int, user_id: int):
         await self.redis.invalidate_task_context(task_id, user_id)
+
+    def context_is_stale(self, watermark: int, built_at: Optional[float], exchange_count: int) -> bool:
+        if built_at is None:
+            return True
+        new_exchanges = exchange_count - watermark
+        if new_exchanges >= CONTEXT_REFRESH_EXCHANGES:
+            return True
+        return new_exchanges > 0 and time.time() - built_at >= CONTEXT_REFRESH_SECONDS
+
+    def _task_context_built_at(self, task: dict) -> Optional[float]:
+        updated_at = task.get("context_updated_at")
+        if updated_at is None:
+            return None
+        return updated_at.replace(tzinfo=timezone.utc).timestamp()
+
+    async def get_fresh_task_context(self, task: dict) -> Optional[str]:
+        """Контекст из БД или Redis, если он не устарел, иначе None"""
+        task_id, user_id = task["id"], task["user_id"]
+        exchange_count = task.get("exchange_count", 0)
+
+        if not self.context_is_stale(task.get("context_exchange_count", 0), self._task_context_built_at(task), exchange_count):
+            return task["task_context"]
+
+        cached = await self.redis.get_task_context(task_id, user_id)
+        if cached and not self.context_is_stale(cached["watermark"], cached["built_at"], exchange_count):
+            logger.debug("Using cached context for task %s", task_id)
+            return cached["context"]
+        return None
+
+    async def get_last_good_context(self, task: dict) -> str:
+        """Последний известный контекст задачи без обращения к LLM"""
+        existing_context = task.get("task_context")
+        if existing_context and existing_context.strip() and existing_context != "no context":
+            return existing_context
+
+        cached = await self.redis.get_task_context(task["id"], task["user_id"])
+        if cached and cached.get("context"):
+            return cached["context"]
+        return f"📋 Task: {task['task_name']}\n📝 Description: {task['task_description']}"
+
+    async def resolve_task_context(self, task: dict, priority: str = INTERACTIVE) -> str:
+        """Возвращает актуальный контекст задачи, перегенерируя его только по политике устаревания"""
+        fresh_context = await self.get_fresh_task_context(task)
+        if fresh_context is not None:
+            return fresh_context
+
+        return await self.regenerate_task_context(task, priority)
+
+    async def regenerate_task_context(self, task: dict, priority: str = INTERACTIVE) -> str:
+        """Генерирует и сохраняет контекст; параллельные вызовы для одной задачи объединяются"""
+        task_id, user_id = task["id"], task["user_id"]
+        exchange_count = task.get("exchange_count", 0)
+
+        async def _generate():
+            task_context, generated = await self.generate_task_context(
+                task["task_name"],
+                task["task_description"],
+                task_id,
+                user_id,
+                task["task_context"],
+                exchange_count=exchange_count,
+                priority=priority
+            )
+            # Заглушку после сбоя не сохраняем: watermark и context_updated_at остаются прежними,
+            # и следующий запрос снова попробует сгенерировать контекст
+            if generated:
+                await self.db.update_task_context(task_id, user_id, task_context, exchange_count=exchange_count)
+            return task_context
+
+        return await self.redis.single_flight(f"task_context:{task_id}:{user_id}", _generate, wait_timeout=CONTEXT_GENERATION_MAX_SECONDS)
     
-    async def generate_task_context(self, task_name: str, task_description: str, task_id: int, user_id: int, existing_context: str | None = None) -> str:
-        cached_context = await self.redis.get_task_context(task_id, user_id)
-        if cached_context:
-            print(f"🚀 Using cached context for task {task_id}")
-            return cached_context
-        
-        print(f"🔄 Generating new context for task {task_id}")
+    async def generate_task_context(self, task_name: str, task_description: str, task_id: int, user_id: int, existing_context: str | None = None, exchange_count: int = 0, priority: str = INTERACTIVE) -> tuple[str, bool]:
+        """Возвращает контекст и признак того, что он актуален и его можно сохранить"""
+        logger.debug("Generating new context for task %s", task_id)
         try:
-            history = await self.db.get_task_exchanges(task_id=task_id, user_id=user_id)
+            history = await self.db.get_recent_exchanges(task_id=task_id, user_id=user_id, limit=3)
             
             has_existing_context = existing_context and existing_context.strip() and existing_context != "no context"
             has_history = history and len(history) > 0
             
-            if has_history:
-                formatted_history = "\n".join([
-                    f"User: {exchange['prompt']}\nAI: {exchange['response'][:100]}{'...' if len(exchange['response']) > 100 else ''}\n---"
-                    for exchange in history[-3:]
+            def format_history(entries: list) -> str:
+                if not has_history:
+                    return "No conversation history yet - this is the first interaction with AI for this task."
+                return "\n".join([
+                    f"User: {exchange['prompt']}\nAI: {exchange['response_summary']}\n---"
+                    for exchange in entries
                 ])
-            else:
-                formatted_history = "No conversation history yet - this is the first interaction with AI for this task."
             
             if has_existing_context and has_history:
-                prompt = f"""You are an AI assistant that updates task contexts in AI Task Manager system.
+                def render(existing_context: str, history: list, task_description: str) -> str:
+                    return f"""You are an AI assistant that updates task contexts in AI Task Manager system.
 
 CURRENT SITUATION: This task already has a context and new conversation history. Your job is to UPDATE the existing context intelligently.
 
@@ -105,7 +371,7 @@ EXISTING CONTEXT:
 {existing_context}
 
 NEW CONVERSATION DATA:
-{formatted_history}
+{format_history(history)}
 
 TASK INFO:
 - Task Name: {task_name}
@@ -121,16 +387,24 @@ YOUR TASK: UPDATE the existing context by:
 IMPORTANT: Do not completely rewrite the context. Instead, intelligently merge new information with existing content.
 
 UPDATED CONTEXT:"""
+
+                prompt = render(**self.prompt_builder.fit(
+                    render,
+                    {"existing_context": existing_context, "history": history, "task_description": task_description},
+                    ["history", "existing_context", "task_description"],
+                    CONTEXT_PROMPT_TOKEN_BUDGET
+                ))
                 
             elif has_existing_context and not has_history:
                 if existing_context:
-                    await self.redis.set_task_context(task_id, user_id, existing_context, ttl_hours=24)
-                    return existing_context or ""
+                    await self.redis.set_task_context(task_id, user_id, existing_context, ttl_hours=24, watermark=exchange_count)
+                    return existing_context or "", True
                 else:
-                    return f"📋 Task: {task_name}\n📝 Description: {task_description}\n🔧 Basic context generated."
+                    return f"📋 Task: {task_name}\n📝 Description: {task_description}\n🔧 Basic context generated.", True
                 
             else:
-                prompt = f"""You are an AI assistant that creates task contexts for AI Task Manager system.
+                def render(history: list, task_description: str) -> str:
+                    return f"""You are an AI assistant that creates task contexts for AI Task Manager system.
 
 YOUR OBJECTIVE:
 Create a comprehensive context for a task that will be used by other AI assistants when communicating with users about this specific task.
@@ -140,7 +414,7 @@ TASK INFORMATION:
 - Task Description: {task_description}
 - Task ID: {task_id}
 - User ID: {user_id}
-- Conversation History: {formatted_history}
+- Conversation History: {format_history(history)}
 
 WHAT THE CONTEXT SHOULD INCLUDE:
 1. Brief summary of the task and its main objectives
@@ -166,37 +440,44 @@ FORMAT REQUIREMENTS:
 - Make it actionable for the AI assistant
 
 GENERATE TASK CONTEXT:"""
+
+                prompt = render(**self.prompt_builder.fit(
+                    render,
+                    {"history": history, "task_description": task_description},
+                    ["history", "task_description"],
+                    CONTEXT_PROMPT_TOKEN_BUDGET
+                ))
             
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3, 
-                max_tokens=800
-            )
+            messages = [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+            async with self._llm_slot(messages, 800, priority) as usage:
+                generated_context = await self.provider.complete(
+                    messages,
+                    temperature=0.3, 
+                    max_tokens=800
+                )
+                usage["tokens"] = self.prompt_builder.messages_tokens(messages) + self.prompt_builder.counter.count(generated_context or "")
             
-            if completion.choices[0].message.content:
-                generated_context = completion.choices[0].message.content.strip()
-                await self.redis.set_task_context(task_id, user_id, generated_context)
-                return generated_context
+            if generated_context:
+                generated_context = generated_context.strip()
+                await self.redis.set_task_context(task_id, user_id, generated_context, watermark=exchange_count)
+                return generated_context, True
             else:
-                fallback_context = f"📋 Task: {task_name}\n📝 Description: {task_description}\n🔧 Basic context generated."
-                await self.redis.set_task_context(task_id, user_id, fallback_context, ttl_hours=1)
-                return fallback_context
+                return f"📋 Task: {task_name}\n📝 Description: {task_description}\n🔧 Basic context generated.", False
                 
+        except LLMRateLimited:
+            # Контекст-заглушка не сохраняется: задача повторит генерацию, когда лимит освободится
+            raise
         except Exception as e:
-            print(f"OpenAI API Error in generate_task_context: {e}")
+            logger.warning("OpenAI API Error in generate_task_context: %s", e)
             if existing_context and existing_context.strip() and existing_context != "no context":
-                await self.redis.set_task_context(task_id, user_id, existing_context, ttl_hours=1)
-                return existing_context or ""
+                return existing_context, False
             else:
-                error_context = f"📋 Task: {task_name}\n📝 Description: {task_description}\n⚠️ Context generation failed: {str(e)}"
-                await self.redis.set_task_context(task_id, user_id, error_context, ttl_hours=1)
-                return error_context
+                return f"📋 Task: {task_name}\n📝 Description: {task_description}\n⚠️ Context generation failed: {str(e)}", False
 
 
 
@@ -0,0 +1,91 @@
+import importlib
+import time
+from typing import AsyncIterator, Optional, Protocol
+
+import httpx
+from openai import AsyncOpenAI
+
+from metrics import metrics
+from config import LLM_PROVIDER, LLM_MODEL, LLM_TOKEN, LLM_BASE_URL, LLM_MAX_CONNECTIONS, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES, FAKE_LLM_URL, LLM_GOVERNOR
+
+# С общим лимитером 429 не повторяются внутри клиента: паузу и повтор решает лимитер
+PROVIDER_MAX_RETRIES = 0 if LLM_GOVERNOR else LLM_MAX_RETRIES
+
+
+class LLMProvider(Protocol):
+    model: str
+
+    async def complete(self, messages: list, temperature: float, max_tokens: int) -> Optional[str]:
+        ...
+
+    def stream(self, messages: list, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        ...
+
+    async def close(self):
+        ...
+
+
+class OpenAICompatibleProvider:
+    """Любой сервер с OpenAI-совместимым /chat/completions: OpenAI, локальные модели, фейковый сервер"""
+
+    def __init__(self, model: str, api_key: str, base_url: Optional[str] = None, max_connections: int = 64, timeout: float = 60, max_retries: int = 2):
+        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            timeout=timeout,
+            max_retries=max_retries,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
+        )
+
+    async def complete(self, messages: list, temperature: float, max_tokens: int) -> Optional[str]:
+        with metrics.span("llm_request_seconds", model=self.model, mode="complete"):
+            completion = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        if completion.usage:
+            metrics.inc("llm_tokens_total", completion.usage.prompt_tokens, model=self.model, kind="prompt")
+            metrics.inc("llm_tokens_total", completion.usage.completion_tokens, model=self.model, kind="completion")
+        return completion.choices[0].message.content
+
+    async def stream(self, messages: list, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        with metrics.span("llm_request_seconds", model=self.model, mode="stream"):
+            started = time.perf_counter()
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            first_chunk = True
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
+                    if first_chunk:
+                        metrics.observe("llm_ttft_seconds", time.perf_counter() - started, model=self.model)
+                        first_chunk = False
+                    # Без usage в стриме считаем чанки: обычно один токен на чанк
+                    metrics.inc("llm_tokens_total", model=self.model, kind="completion_chunks")
+                    yield chunk.choices[0].delta.content
+
+    async def close(self):
+        await self.client.close()
+
+
+def create_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    """"openai" — LLM_BASE_URL/LLM_TOKEN, "fake" — локальный benchmarks.fake_llm_server,
+    иначе "module:attr" — фабрика без аргументов"""
+    if name == "openai":
+        return OpenAICompatibleProvider(LLM_MODEL, LLM_TOKEN, LLM_BASE_URL, LLM_MAX_CONNECTIONS, LLM_TIMEOUT_SECONDS, PROVIDER_MAX_RETRIES)
+    if name == "fake":
+        return OpenAICompatibleProvider(LLM_MODEL, LLM_TOKEN or "fake", FAKE_LLM_URL, LLM_MAX_CONNECTIONS, LLM_TIMEOUT_SECONDS, PROVIDER_MAX_RETRIES)
+    module_name, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
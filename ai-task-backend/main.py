@@ -1,22 +1,32 @@
 import asyncio
+import logging
+import os
+import sys
 from databasemanager import DatabaseManager
 from llmmanager import LLMManager
 from config import DATABASE_URL
+# Общая с API настройка логирования
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai-task-common"))
+from logsetup import configure_logging  # noqa: E402
+
+logger = logging.getLogger(__name__)
 
 db_manager = DatabaseManager(DATABASE_URL)
-llm_manager = LLMManager()
+llm_manager = LLMManager(db=db_manager)
 
 async def init_backend():
     """Инициализация backend сервиса"""
-    print("Backend microservice started")
+    logger.info("Backend microservice started")
     await db_manager.init_db()
     await llm_manager.init_redis()
-    print("✅ Database and Redis initialized")
+    logger.info("Database and Redis initialized")
 
 async def shutdown_backend():
     """Завершение работы backend сервиса"""
-    await llm_manager.redis.close()
-    print("Backend microservice ended")
+    await llm_manager.close()
+    await db_manager.close()
+    logger.info("Backend microservice ended")
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(init_backend())
\ No newline at end of file
@@ -0,0 +1,190 @@
+import bisect
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from config import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Границы бакетов гистограмм длительности, секунды
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+COUNTERS_KEY = "metrics:counters"
+HISTOGRAMS_KEY = "metrics:histograms"
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry: "Metrics", name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels, status="error" if exc_type else "ok")
+        self.registry.observe(self.name, time.perf_counter() - self.started, **labels)
+        return False
+
+
+class Metrics:
+    """Счётчики и гистограммы процесса; приращения периодически сбрасываются в Redis.
+
+    Выключенный реестр ничего не хранит: span() возвращает общий пустой контекст,
+    inc()/observe() сразу возвращаются.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: dict = defaultdict(float)
+        self._histograms: dict = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        bucket = bisect.bisect_left(DURATION_BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Последний бакет — +Inf, затем сумма и количество
+                histogram = self._histograms[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0, 0]
+            histogram[bucket] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def span(self, name: str, **labels):
+        """Замер длительности блока: with metrics.span("stage_seconds", stage="db.get_task")"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, labels)
+
+    def _drain(self) -> tuple:
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(float)
+            histograms, self._histograms = self._histograms, {}
+        return counters, histograms
+
+    async def flush(self, redis_client):
+        """Переносит накопленные приращения в общие для всех воркеров hash в Redis"""
+        if not self.enabled or redis_client is None:
+            return
+        counters, histograms = self._drain()
+        if not counters and not histograms:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for (name, labels), value in counters.items():
+                    pipe.hincrbyfloat(COUNTERS_KEY, json.dumps([name, labels]), value)
+                for (name, labels), histogram in histograms.items():
+                    for index, count in enumerate(histogram[:-2]):
+                        if count:
+                            pipe.hincrby(HISTOGRAMS_KEY, json.dumps([name, labels, index]), count)
+                    pipe.hincrbyfloat(HISTOGRAMS_KEY, json.dumps([name, labels, "sum"]), histogram[-2])
+                    pipe.hincrby(HISTOGRAMS_KEY, json.dumps([name, labels, "count"]), histogram[-1])
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Metrics flush error: %s", e)
+
+
+def _format_labels(labels: list, extra: Optional[tuple] = None) -> str:
+    pairs = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus(counters: dict, histograms: dict) -> str:
+    """Текстовый формат Prometheus из hash-ей Redis (значения — строки, как их отдаёт HGETALL)"""
+    lines = []
+    by_name = defaultdict(list)
+    for field, value in counters.items():
+        name, labels = json.loads(field)
+        by_name[name].append((labels, float(value)))
+    for name in sorted(by_name):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in by_name[name]:
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    series = defaultdict(lambda: {"buckets": [0] * (len(DURATION_BUCKETS) + 1), "sum": 0.0, "count": 0})
+    for field, value in histograms.items():
+        name, labels, part = json.loads(field)
+        entry = series[(name, json.dumps(labels))]
+        if part in ("sum", "count"):
+            entry[part] = float(value) if part == "sum" else int(value)
+        else:
+            entry["buckets"][part] += int(value)
+    names = sorted({name for name, _ in series})
+    for name in names:
+        lines.append(f"# TYPE {name} histogram")
+        for (series_name, labels_json), entry in sorted(series.items()):
+            if series_name != name:
+                continue
+            labels = json.loads(labels_json)
+            cumulative = 0
+            for bound, count in zip(list(DURATION_BUCKETS) + ["+Inf"], entry["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {entry['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def instrument_methods(component: str):
+    """Декоратор класса: каждый публичный async метод замеряется как stage_seconds{stage="<component>.<метод>"}.
+
+    При выключенных метриках класс не меняется.
+    """
+    def decorate(cls):
+        if not metrics.enabled:
+            return cls
+        for attr, method in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, attr, _timed(f"{component}.{attr}", method))
+        return cls
+    return decorate
+
+
+def _timed(stage: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with metrics.span("stage_seconds", stage=stage):
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+metrics = Metrics(enabled=METRICS_ENABLED)
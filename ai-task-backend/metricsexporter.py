@@ -0,0 +1,40 @@
+"""Prometheus endpoint с метриками всех воркеров, агрегированными в Redis.
+
+    python metricsexporter.py --port 9808
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import redis
+
+from config import REDIS_URL, METRICS_PORT
+from metrics import COUNTERS_KEY, HISTOGRAMS_KEY, render_prometheus
+
+
+def make_handler(redis_client: redis.Redis):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(redis_client.hgetall(COUNTERS_KEY), redis_client.hgetall(HISTOGRAMS_KEY)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(redis.Redis.from_url(REDIS_URL, decode_responses=True)))
+    print(f"✅ Metrics exporter listening on http://{args.host}:{args.port}/metrics")
+    server.serve_forever()
@@ -0,0 +1,96 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# Произвольный ключ advisory lock, чтобы миграции не применялись параллельно
+MIGRATIONS_LOCK_KEY = 7305011
+
+# (версия, описание, SQL). Применённые миграции не редактируются — только новые версии в конце списка.
+MIGRATIONS = [
+    (1, "initial schema", [
+        """CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            telegram_id INTEGER UNIQUE,
+            telegram_username VARCHAR(255),
+            google_id VARCHAR(255) UNIQUE,
+            email TEXT,
+            name VARCHAR(255),
+            picture TEXT,
+            access_token TEXT,
+            refresh_token TEXT,
+            token_expires_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS tasks (
+            id SERIAL PRIMARY KEY,
+            task_name TEXT NOT NULL,
+            task_description TEXT NOT NULL,
+            task_context TEXT,
+            task_status TEXT NOT NULL,
+            private BOOLEAN DEFAULT TRUE,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)""",
+        """CREATE TABLE IF NOT EXISTS exchanges (
+            id SERIAL PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            prompt TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)""",
+    ]),
+    (2, "task context watermark", [
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS exchange_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS context_exchange_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS context_updated_at TIMESTAMP",
+        """UPDATE tasks t SET exchange_count = c.total
+           FROM (SELECT task_id, COUNT(*) AS total FROM exchanges GROUP BY task_id) c
+           WHERE c.task_id = t.id AND t.exchange_count = 0""",
+    ]),
+    (3, "indexes for hot queries", [
+        # get_users_tasks: WHERE user_id ORDER BY created_at DESC, id DESC
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at DESC, id DESC)",
+        # get_public_tasks: WHERE private = FALSE ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_tasks_public_created ON tasks (created_at DESC, id DESC) WHERE private = FALSE",
+        # get_task_exchanges: WHERE task_id AND user_id ORDER BY created_at
+        "CREATE INDEX IF NOT EXISTS idx_exchanges_task_created ON exchanges (task_id, created_at, id)",
+        # ON DELETE CASCADE от users
+        "CREATE INDEX IF NOT EXISTS idx_exchanges_user ON exchanges (user_id)",
+        # get_user_by_email
+        "CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)",
+    ]),
+    (4, "precomputed exchange response summary", [
+        # Короткая версия ответа для окна истории, чтобы не читать полный ответ из TOAST
+        "ALTER TABLE exchanges ADD COLUMN IF NOT EXISTS response_summary TEXT",
+        """UPDATE exchanges
+           SET response_summary = LEFT(response, 100) || CASE WHEN length(response) > 100 THEN '...' ELSE '' END
+           WHERE response_summary IS NULL""",
+    ]),
+]
+
+
+async def run_migrations(conn: AsyncConnection) -> list:
+    """Применяет недостающие миграции в транзакции conn и возвращает их версии"""
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    await conn.execute(text("""CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)"""))
+
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    applied_versions = {row[0] for row in result.fetchall()}
+
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version in applied_versions:
+            continue
+        logger.info("Applying migration %s: %s", version, name)
+        for statement in statements:
+            await conn.execute(text(statement))
+        await conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"), {"version": version, "name": name})
+        applied.append(version)
+    return applied
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+from typing import Callable
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Служебные токены, которые API добавляет к каждому сообщению
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Подсчёт токенов локальным токенизатором; без tiktoken — оценка по длине в байтах"""
+
+    def __init__(self, model: str, cache_size: int = 4096):
+        self.encoding = self._load_encoding(model)
+        self.cache_size = cache_size
+        # Контекст задачи меняется редко — его длина считается один раз. Ключ — дайджест текста,
+        # чтобы кэш не удерживал в памяти сами контексты и ответы
+        self._cache: OrderedDict = OrderedDict()
+
+    def _load_encoding(self, model: str):
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Файлы BPE недоступны (нет сети и локального кэша)
+            logger.warning("Tokenizer unavailable, using approximate counts: %s", e)
+            return None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        tokens = self._cache.get(key)
+        if tokens is not None:
+            self._cache.move_to_end(key)
+            return tokens
+        tokens = self._count(text)
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def _count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text.encode("utf-8")) / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        # Приближённо: байты на токен считаем по всей строке
+        chars = len(text) * max_tokens // self.count(text)
+        return text[:chars]
+
+
+class PromptBuilder:
+    """Собирает промпт в пределах бюджета токенов, урезая части с наименьшим приоритетом"""
+
+    def __init__(self, counter: TokenCounter):
+        self.counter = counter
+
+    def fit(self, render: Callable[..., str], parts: dict, trim_order: list, budget: int) -> dict:
+        """Возвращает части, при которых render(**parts) укладывается в budget.
+
+        Части урезаются в порядке trim_order: из списков выбрасываются самые старые элементы,
+        строки обрезаются с конца. Части вне trim_order не меняются. Части — строки и списки.
+        """
+        parts = dict(parts)
+        empty = {name: [] if isinstance(value, list) else "" for name, value in parts.items()}
+        base = self.counter.count(render(**empty))
+        for name in trim_order:
+            overflow = self._estimate(render, parts, empty, base) - budget
+            if overflow <= 0:
+                break
+            value = parts[name]
+            if isinstance(value, list):
+                value = list(value)
+                while value and self._estimate(render, {**parts, name: value}, empty, base) > budget:
+                    value.pop(0)
+                parts[name] = value
+            else:
+                parts[name] = self.counter.truncate(value, self.counter.count(value) - overflow)
+        return parts
+
+    def _estimate(self, render: Callable[..., str], parts: dict, empty: dict, base: int) -> int:
+        """Токены render(**parts) без рендера целиком: шаблон плюс каждая часть отдельно.
+
+        Длинные неизменные части (контекст задачи) берутся из кэша счётчика, а не токенизируются
+        заново вместе с новым вопросом. Списки считаются в обёртке шаблона, по токену на часть —
+        запас на слияние токенов на стыках.
+        """
+        total = base + len(parts)
+        for name, value in parts.items():
+            if isinstance(value, list):
+                total += self.counter.count(render(**{**empty, name: value})) - base
+            else:
+                total += self.counter.count(value)
+        return total
+
+    def messages_tokens(self, messages: list) -> int:
+        return sum(self.counter.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
@@ -1,12 +1,194 @@
+import asyncio
+import logging
 import redis.asyncio as redis
 import json
-from typing import Optional
-from datetime import timedelta
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+from datetime import datetime, timedelta
 
+from config import REDIS_COUNT_ROUND_TRIPS
+from metrics import instrument_methods, metrics
+
+logger = logging.getLogger(__name__)
+
+# Разделитель имени очереди и приоритета в ключах Redis транспорта kombu
+PRIORITY_SEPARATOR = "\x06\x16"
+
+# Снимает блокировку только если она всё ещё принадлежит владельцу токена
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Продлевает блокировку, только если она всё ещё принадлежит владельцу токена
+EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Версия и запись кэша за один запрос: значение хранится под ключом <prefix>:v<версия>
+READ_VERSIONED_SCRIPT = """
+local version = redis.call("get", KEYS[1]) or "0"
+return {version, redis.call("get", ARGV[1] .. ":v" .. version)}
+"""
+
+# Версия алиаса пользователя и его запись за один запрос
+READ_IDENTITY_SCRIPT = """
+return {redis.call("get", KEYS[1]) or "0", redis.call("get", KEYS[2])}
+"""
+
+# Запись пользователя сохраняется под всеми алиасами, только если версия алиаса, по которому
+# он загружался (KEYS[1]), не изменилась с момента чтения. KEYS[2..] — ключи записей.
+# ARGV: ожидаемая версия, запись, TTL
+SET_IDENTITY_IF_VERSION_SCRIPT = """
+if (redis.call("get", KEYS[1]) or "0") ~= ARGV[1] then
+    return 0
+end
+for i = 2, #KEYS do
+    redis.call("set", KEYS[i], ARGV[2], "EX", ARGV[3])
+end
+return 1
+"""
+
+# Версии алиасов пользователей живут заведомо дольше любой загрузки из БД
+IDENTITY_VERSION_TTL_SECONDS = 86400
+
+# Ключи общего лимитера LLM: два token bucket (запросы и токены в минуту), аренды слотов
+# одновременных запросов (zset, score — срок аренды) и состояние AIMD (limit, blocked_until, last_decrease)
+LLM_GOVERNOR_KEYS = ["llm_governor:requests", "llm_governor:tokens", "llm_governor:leases", "llm_governor:state"]
+
+# Выдаёт слот, если есть свободная конкурентность и запас в обоих bucket.
+# ARGV: rpm, tpm (0 — без лимита), оценка токенов, доля лимитов для этого приоритета,
+# id аренды, срок аренды, начальный лимит конкурентности.
+# Ответ: {1, "0", "ok"} или {0, "<секунд ждать>", "<причина>"}
+LLM_GOVERNOR_ACQUIRE_SCRIPT = """
+local t = redis.call("time")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rpm, tpm, tokens, share = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+
+local blocked_until = tonumber(redis.call("hget", KEYS[4], "blocked_until") or "0")
+if blocked_until > now then
+    return {0, tostring(blocked_until - now), "blocked"}
+end
+
+redis.call("zremrangebyscore", KEYS[3], "-inf", now)
+local limit = tonumber(redis.call("hget", KEYS[4], "limit") or ARGV[7])
+if redis.call("zcard", KEYS[3]) >= math.max(1, math.floor(limit * share)) then
+    return {0, "0.05", "concurrency"}
+end
+
+-- Уровень bucket после пополнения; запрос с меньшей долей должен оставить запас (1 - share) ёмкости
+local function level(key, capacity)
+    local state = redis.call("hmget", key, "level", "ts")
+    local value = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, value + (now - ts) * capacity / 60)
+end
+local function wait_for(value, need, capacity)
+    local reserve = capacity * (1 - share)
+    local cost = math.min(need, capacity - reserve)
+    if value - cost >= reserve then
+        return 0
+    end
+    return (cost + reserve - value) * 60 / capacity
+end
+
+local requests = rpm > 0 and level(KEYS[1], rpm) or 0
+local budget = tpm > 0 and level(KEYS[2], tpm) or 0
+local wait = 0
+if rpm > 0 then wait = math.max(wait, wait_for(requests, 1, rpm)) end
+if tpm > 0 then wait = math.max(wait, wait_for(budget, tokens, tpm)) end
+if wait > 0 then
+    return {0, tostring(wait), "rate"}
+end
+
+if rpm > 0 then
+    redis.call("hset", KEYS[1], "level", requests - 1, "ts", now)
+    redis.call("expire", KEYS[1], 120)
+end
+if tpm > 0 then
+    redis.call("hset", KEYS[2], "level", budget - tokens, "ts", now)
+    redis.call("expire", KEYS[2], 120)
+end
+redis.call("zadd", KEYS[3], now + tonumber(ARGV[6]), ARGV[5])
+redis.call("expire", KEYS[3], math.ceil(tonumber(ARGV[6]) * 2))
+return {1, "0", "ok"}
+"""
+
+# Возвращает слот и подстраивает лимит конкурентности: +1/limit за успешный запрос,
+# умножение на decrease за 429 или медленный ответ (не чаще раза в cooldown секунд).
+# ARGV: id аренды, поправка токенов (оценка - факт), исход, retry_after,
+# начальный, минимальный и максимальный лимит, decrease при 429, decrease при медленном ответе, cooldown
+LLM_GOVERNOR_RELEASE_SCRIPT = """
+local t = redis.call("time")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call("zrem", KEYS[3], ARGV[1])
+local correction = tonumber(ARGV[2])
+if correction ~= 0 and redis.call("exists", KEYS[2]) == 1 then
+    redis.call("hincrbyfloat", KEYS[2], "level", correction)
+end
+
+local outcome = ARGV[3]
+local limit = tonumber(redis.call("hget", KEYS[4], "limit") or ARGV[5])
+local min_limit, max_limit = tonumber(ARGV[6]), tonumber(ARGV[7])
+if outcome == "ok" then
+    limit = math.min(max_limit, limit + 1 / limit)
+elseif outcome == "rate_limited" or outcome == "slow" then
+    local last_decrease = tonumber(redis.call("hget", KEYS[4], "last_decrease") or "0")
+    if now - last_decrease >= tonumber(ARGV[10]) then
+        local factor = outcome == "rate_limited" and tonumber(ARGV[8]) or tonumber(ARGV[9])
+        limit = math.max(min_limit, limit * factor)
+        redis.call("hset", KEYS[4], "last_decrease", now)
+    end
+    local retry_after = tonumber(ARGV[4])
+    if outcome == "rate_limited" and retry_after > 0 then
+        local blocked_until = tonumber(redis.call("hget", KEYS[4], "blocked_until") or "0")
+        redis.call("hset", KEYS[4], "blocked_until", math.max(blocked_until, now + retry_after))
+    end
+end
+redis.call("hset", KEYS[4], "limit", limit)
+return tostring(limit)
+"""
+
+def _cache_json_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    return str(value)
+
+def _cache_json_object_hook(obj: dict):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+@instrument_methods("redis")
 class RedisManager:
     def __init__(self, redis_url: str):
         self.redis_url = redis_url
         self.redis_client = None
+        # Число отправок команд на сервер (пайплайн — одна отправка) для измерения round-trip на задачу;
+        # считается только при REDIS_COUNT_ROUND_TRIPS=true
+        self.round_trip_count = 0
+        self.single_flight_stats = {
+            "leader_calls": 0,
+            "coalesced_calls": 0,
+            "fallback_calls": 0,
+            "waiters": 0,
+            "lock_hold_seconds_total": 0.0,
+            "lock_hold_seconds_max": 0.0,
+        }
+        self.task_cache_stats = {
+            "hits": 0,
+            "misses": 0,
+            "errors": 0,
+            "invalidations": 0,
+            "hit_seconds_total": 0.0,
+            "miss_seconds_total": 0.0,
+        }
         
     async def init_redis(self):
         try:
@@ -15,37 +197,56 @@ class RedisManager:
                 encoding="utf-8",
                 decode_responses=True
             )
+            if REDIS_COUNT_ROUND_TRIPS:
+                self._count_round_trips()
             await self.redis_client.ping()
-            print("✅ Redis connected successfully")
+            logger.info("Redis connected successfully")
         except Exception as e:
-            print(f"❌ Redis connection failed: {e}")
+            logger.error("Redis connection failed: %s", e)
             self.redis_client = None
     
     async def close(self):
         if self.redis_client:
             await self.redis_client.close()
+
+    def _count_round_trips(self):
+        manager = self
+        pool = self.redis_client.connection_pool
+
+        class CountingConnection(pool.connection_class):
+            async def send_packed_command(self, command, check_health=True):
+                manager.round_trip_count += 1
+                await super().send_packed_command(command, check_health)
+
+        pool.connection_class = CountingConnection
     
     def _make_task_context_key(self, task_id: int, user_id: int) -> str:
         return f"task_context:{task_id}:{user_id}"
     
     def _make_task_exchanges_key(self, task_id: int, user_id: int) -> str:
         return f"task_exchanges:{task_id}:{user_id}"
+
+    def _make_context_refresh_key(self, task_id: int, user_id: int) -> str:
+        return f"task_context_refresh:{task_id}:{user_id}"
     
-    async def get_task_context(self, task_id: int, user_id: int) -> Optional[str]:
+    async def get_task_context(self, task_id: int, user_id: int) -> Optional[dict]:
+        """Возвращает {"context", "watermark", "built_at"} или None"""
         if not self.redis_client:
             return None
         
         try:
             key = self._make_task_context_key(task_id, user_id)
             cached_context = await self.redis_client.get(key)
-            return cached_context
+            if not cached_context:
+                return None
+            return json.loads(cached_context)
         except Exception as e:
-            print(f"Redis get error for task context: {e}")
+            logger.warning("Redis get error for task context: %s", e)
             return None
     
-    async def set_task_context(self, task_id: int, user_id: int, context: str, ttl_hours: int = 24) -> bool:
+    async def set_task_context(self, task_id: int, user_id: int, context: str, ttl_hours: int = 24, watermark: int = 0) -> bool:
         if not self.redis_client:
-            print(f"❌ Redis client not connected!")
+            logger.error("Redis client not connected!")
             return False
         
         try:
@@ -53,14 +254,59 @@ class RedisManager:
             await self.redis_client.setex(
                 key, 
                 timedelta(hours=ttl_hours), 
-                context
+                json.dumps({"context": context, "watermark": watermark, "built_at": time.time()})
             )
-            print(f"✅ Cached context for task {task_id}:{user_id} (TTL: {ttl_hours}h)")
+            logger.debug("Cached context for task %s:%s (TTL: %sh)", task_id, user_id, ttl_hours)
             return True
         except Exception as e:
-            print(f"❌ Redis set error for task context: {e}")
+            logger.error("Redis set error for task context: %s", e)
             return False
     
+    async def acquire_context_refresh(self, task_id: int, user_id: int, ttl_seconds: int = 300) -> bool:
+        """Помечает задачу как обновляемую; False, если фоновое обновление уже запланировано"""
+        if not self.redis_client:
+            return True
+        
+        try:
+            key = self._make_context_refresh_key(task_id, user_id)
+            return bool(await self.redis_client.set(key, "1", nx=True, ex=ttl_seconds))
+        except Exception as e:
+            logger.warning("Redis set error for context refresh: %s", e)
+            return True
+    
+    async def extend_context_refresh(self, task_id: int, user_id: int, ttl_seconds: int):
+        """Продлевает пометку обновления, пока отложенная задача ждёт запуска"""
+        if not self.redis_client:
+            return
+
+        try:
+            await self.redis_client.expire(self._make_context_refresh_key(task_id, user_id), ttl_seconds)
+        except Exception as e:
+            logger.warning("Redis expire error for context refresh: %s", e)
+
+    async def queue_length(self, queue: str, priorities: Iterable[int]) -> int:
+        """Сообщения в очереди брокера с данными приоритетами; брокер Celery — база 0 того же Redis"""
+        if not self.redis_client:
+            return 0
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for priority in priorities:
+                    pipe.llen(f"{queue}{PRIORITY_SEPARATOR}{priority}" if priority else queue)
+                return sum(await pipe.execute())
+        except Exception as e:
+            logger.warning("Redis queue length error: %s", e)
+            return 0
+    
+    async def release_context_refresh(self, task_id: int, user_id: int):
+        if not self.redis_client:
+            return
+        
+        try:
+            await self.redis_client.delete(self._make_context_refresh_key(task_id, user_id))
+        except Exception as e:
+            logger.warning("Redis delete error for context refresh: %s", e)
+    
     async def invalidate_task_context(self, task_id: int, user_id: int) -> bool:
         if not self.redis_client:
             return False
@@ -74,7 +320,7 @@ class RedisManager:
             
             return True
         except Exception as e:
-            print(f"Redis delete error for task context: {e}")
+            logger.warning("Redis delete error for task context: %s", e)
             return False
     
     async def cache_task_exchanges(self, task_id: int, user_id: int, exchanges: list, ttl_hours: int = 1) -> bool:
@@ -91,7 +337,7 @@ class RedisManager:
             )
             return True
         except Exception as e:
-            print(f"Redis cache exchanges error: {e}")
+            logger.warning("Redis cache exchanges error: %s", e)
             return False
     
     async def get_cached_task_exchanges(self, task_id: int, user_id: int) -> Optional[list]:
@@ -105,5 +351,409 @@ class RedisManager:
                 return json.loads(cached_exchanges)
             return None
         except Exception as e:
-            print(f"Redis get exchanges error: {e}")
+            logger.warning("Redis get exchanges error: %s", e)
+            return None
+
+    def _make_chat_stream_key(self, stream_id: str) -> str:
+        return f"chat_stream:{stream_id}"
+
+    async def append_chat_stream(self, stream_id: str, seq: int, event_type: str, data: str = "", ttl_seconds: int = 3600) -> bool:
+        """Добавляет событие (chunk/done/error/reset) в стрим ответа; id записи — 0-<seq>"""
+        if not self.redis_client:
+            return False
+
+        try:
+            key = self._make_chat_stream_key(stream_id)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.xadd(key, {"seq": seq, "type": event_type, "data": data}, id=f"0-{seq}")
+                pipe.expire(key, ttl_seconds)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning("Redis stream append error: %s", e)
+            return False
+
+    async def get_chat_stream_last_seq(self, stream_id: str) -> int:
+        if not self.redis_client:
+            return 0
+
+        try:
+            entries = await self.redis_client.xrevrange(self._make_chat_stream_key(stream_id), count=1)
+            if not entries:
+                return 0
+            return int(entries[0][0].split("-")[1])
+        except Exception as e:
+            logger.warning("Redis stream read error: %s", e)
+            return 0
+
+    async def read_chat_stream(self, stream_id: str, offset: int = 0, count: int = 500, block_ms: Optional[int] = None) -> list:
+        """События стрима с seq > offset; при block_ms ждёт новые события"""
+        if not self.redis_client:
+            return []
+
+        key = self._make_chat_stream_key(stream_id)
+        if block_ms is None:
+            entries = await self.redis_client.xrange(key, min=f"(0-{offset}", count=count)
+        else:
+            response = await self.redis_client.xread({key: f"0-{offset}"}, count=count, block=block_ms)
+            entries = response[0][1] if response else []
+        return [{"seq": int(fields["seq"]), "type": fields["type"], "data": fields.get("data", "")} for _, fields in entries]
+
+    def _make_single_flight_lock_key(self, key: str) -> str:
+        return f"single_flight:lock:{key}"
+
+    def _make_single_flight_result_key(self, key: str) -> str:
+        return f"single_flight:result:{key}"
+
+    async def single_flight(self, key: str, fn: Callable[[], Awaitable[Any]], lease_seconds: int = 30, wait_timeout: float = 150) -> Any:
+        """Выполняет fn один раз на кластер для ключа; остальные вызовы ждут результат лидера.
+
+        Лидер продлевает аренду блокировки, пока fn выполняется, поэтому lease_seconds
+        ограничивает только время до освобождения блокировки упавшего лидера; wait_timeout
+        должен покрывать самое долгое выполнение fn. Результат fn должен сериализоваться в JSON.
+        """
+        if not self.redis_client:
+            return await fn()
+
+        lock_key = self._make_single_flight_lock_key(key)
+        result_key = self._make_single_flight_result_key(key)
+        deadline = time.monotonic() + wait_timeout
+
+        while True:
+            token = uuid.uuid4().hex
+            if await self.redis_client.set(lock_key, token, nx=True, ex=lease_seconds):
+                return await self._run_single_flight_leader(lock_key, result_key, token, fn, lease_seconds)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            found, result = await self._wait_single_flight_result(lock_key, result_key, remaining)
+            if found:
+                await self._record_single_flight("coalesced_calls", 1)
+                return result
+
+        # Лидер не уложился во время ожидания — считаем сами
+        await self._record_single_flight("fallback_calls", 1)
+        return await fn()
+
+    async def _run_single_flight_leader(self, lock_key: str, result_key: str, token: str, fn: Callable[[], Awaitable[Any]], lease_seconds: int) -> Any:
+        started = time.perf_counter()
+        renewer = asyncio.create_task(self._renew_single_flight_lease(lock_key, token, lease_seconds))
+        try:
+            result = await fn()
+            payload = json.dumps({"token": token, "result": result}, default=str)
+            await self.redis_client.set(result_key, payload, ex=30)
+            await self.redis_client.publish(result_key, payload)
+            return result
+        finally:
+            renewer.cancel()
+            hold_seconds = time.perf_counter() - started
+            try:
+                await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning("Redis single-flight release error: %s", e)
+            await self._record_single_flight("leader_calls", 1)
+            await self._record_single_flight("lock_hold_seconds_total", hold_seconds)
+            self.single_flight_stats["lock_hold_seconds_max"] = max(self.single_flight_stats["lock_hold_seconds_max"], hold_seconds)
+
+    async def _renew_single_flight_lease(self, lock_key: str, token: str, lease_seconds: int):
+        """Продлевает аренду каждую треть срока, пока лидер выполняет fn"""
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                if not await self.redis_client.eval(EXTEND_LOCK_SCRIPT, 1, lock_key, token, lease_seconds):
+                    logger.warning("Single-flight lease for %s lost", lock_key)
+                    return
+            except Exception as e:
+                logger.warning("Redis single-flight renew error: %s", e)
+
+    async def _wait_single_flight_result(self, lock_key: str, result_key: str, timeout: float) -> tuple:
+        """Ждёт публикации результата текущего лидера; (False, None), если лидер пропал"""
+        self.single_flight_stats["waiters"] += 1
+        pubsub = self.redis_client.pubsub()
+        try:
+            await pubsub.subscribe(result_key)
+            leader_token = await self.redis_client.get(lock_key)
+            if leader_token is None:
+                return False, None
+
+            # Лидер мог опубликовать результат до нашей подписки
+            payload = await self.redis_client.get(result_key)
+            deadline = time.monotonic() + timeout
+            while True:
+                if payload:
+                    message = json.loads(payload)
+                    if message.get("token") == leader_token:
+                        return True, message["result"]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, None
+
+                event = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1.0))
+                payload = event["data"] if event else None
+                if event is None and await self.redis_client.get(lock_key) != leader_token:
+                    # Блокировка освобождена или истекла — проверяем результат последний раз
+                    payload = await self.redis_client.get(result_key)
+                    if not payload or json.loads(payload).get("token") != leader_token:
+                        return False, None
+        finally:
+            self.single_flight_stats["waiters"] -= 1
+            await pubsub.unsubscribe(result_key)
+            await pubsub.close()
+
+    async def _record_single_flight(self, name: str, value: float):
+        self.single_flight_stats[name] += value
+        if name == "lock_hold_seconds_total":
+            metrics.observe("single_flight_lock_hold_seconds", value)
+        else:
+            metrics.inc("single_flight_total", value, event=name)
+        try:
+            await self.redis_client.hincrbyfloat("single_flight_stats", name, value)
+        except Exception as e:
+            logger.warning("Redis single-flight stats error: %s", e)
+
+    async def get_single_flight_stats(self) -> dict:
+        """Счётчики single-flight по всем воркерам плюс текущие значения процесса"""
+        stats = {"process": dict(self.single_flight_stats)}
+        if self.redis_client:
+            try:
+                cluster = await self.redis_client.hgetall("single_flight_stats")
+                stats["cluster"] = {name: float(value) for name, value in cluster.items()}
+            except Exception as e:
+                logger.warning("Redis single-flight stats error: %s", e)
+        return stats
+
+    def _make_task_version_key(self, task_id: int) -> str:
+        return f"cache_version:task:{task_id}"
+
+    def _make_user_tasks_version_key(self, user_id: int) -> str:
+        return f"cache_version:user_tasks:{user_id}"
+
+    def _make_public_tasks_version_key(self) -> str:
+        return "cache_version:public_tasks"
+
+    async def get_task_record(self, task_id: int, user_id: int, loader: Callable[[], Awaitable[Any]], ttl_seconds: int = 300) -> Any:
+        return await self.read_through(self._make_task_version_key(task_id), f"cache:task:{task_id}:{user_id}", loader, ttl_seconds)
+
+    async def get_user_tasks_page(self, user_id: int, limit: int, cursor: Optional[str], loader: Callable[[], Awaitable[Any]], ttl_seconds: int = 300) -> Any:
+        return await self.read_through(self._make_user_tasks_version_key(user_id), f"cache:user_tasks:{user_id}:{limit}:{cursor or ''}", loader, ttl_seconds)
+
+    async def get_public_tasks_page(self, limit: int, cursor: Optional[str], loader: Callable[[], Awaitable[Any]], ttl_seconds: int = 300) -> Any:
+        return await self.read_through(self._make_public_tasks_version_key(), f"cache:public_tasks:{limit}:{cursor or ''}", loader, ttl_seconds)
+
+    async def read_through(self, version_key: str, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: int = 300) -> Any:
+        """Читает запись текущей версии или загружает её из loader.
+
+        Запись сохраняется под версией, прочитанной до загрузки: если писатель успел
+        увеличить версию, устаревшая запись окажется под старым ключом и не будет прочитана.
+        """
+        if not self.redis_client:
+            return await loader()
+
+        started = time.perf_counter()
+        try:
+            version, payload = await self.redis_client.eval(READ_VERSIONED_SCRIPT, 1, version_key, key)
+        except Exception as e:
+            logger.warning("Redis cache read error: %s", e)
+            self.task_cache_stats["errors"] += 1
+            return await loader()
+
+        if payload is not None:
+            self.task_cache_stats["hits"] += 1
+            metrics.inc("cache_requests_total", cache="task", result="hit")
+            self.task_cache_stats["hit_seconds_total"] += time.perf_counter() - started
+            return json.loads(payload, object_hook=_cache_json_object_hook)
+
+        value = await loader()
+        try:
+            await self.redis_client.set(f"{key}:v{version}", json.dumps(value, default=_cache_json_default), ex=ttl_seconds)
+        except Exception as e:
+            logger.warning("Redis cache write error: %s", e)
+            self.task_cache_stats["errors"] += 1
+        self.task_cache_stats["misses"] += 1
+        metrics.inc("cache_requests_total", cache="task", result="miss")
+        self.task_cache_stats["miss_seconds_total"] += time.perf_counter() - started
+        return value
+
+    async def invalidate_task_records(self, task_ids: list, user_ids: list, public_feed: bool = False):
+        """Увеличивает версии записей задач, списков задач пользователей и, при необходимости, публичной ленты"""
+        if not self.redis_client:
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for task_id in set(task_ids):
+                    pipe.incr(self._make_task_version_key(task_id))
+                for user_id in set(user_ids):
+                    pipe.incr(self._make_user_tasks_version_key(user_id))
+                if public_feed:
+                    pipe.incr(self._make_public_tasks_version_key())
+                await pipe.execute()
+            self.task_cache_stats["invalidations"] += 1
+        except Exception as e:
+            logger.warning("Redis cache invalidation error: %s", e)
+            self.task_cache_stats["errors"] += 1
+
+    def get_task_cache_stats(self) -> dict:
+        stats = dict(self.task_cache_stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["hit_seconds_avg"] = stats["hit_seconds_total"] / stats["hits"] if stats["hits"] else 0.0
+        stats["miss_seconds_avg"] = stats["miss_seconds_total"] / stats["misses"] if stats["misses"] else 0.0
+        return stats
+
+    def _make_identity_key(self, alias: str) -> str:
+        return f"identity:{alias}"
+
+    def _make_identity_version_key(self, alias: str) -> str:
+        return f"identity_version:{alias}"
+
+    async def get_identity(self, alias: str) -> Tuple[Optional[str], Optional[dict]]:
+        """Возвращает версию алиаса и запись; версия None — Redis недоступен, сохранять нельзя"""
+        if not self.redis_client:
+            return None, None
+
+        try:
+            version, payload = await self.redis_client.eval(READ_IDENTITY_SCRIPT, 2, self._make_identity_version_key(alias), self._make_identity_key(alias))
+            return version, json.loads(payload, object_hook=_cache_json_object_hook) if payload else None
+        except Exception as e:
+            logger.warning("Redis identity get error: %s", e)
+            return None, None
+
+    async def set_identity(self, alias: str, version: str, aliases: list, record: dict, ttl_seconds: int = 600) -> bool:
+        """Сохраняет запись под всеми алиасами, если алиас alias не инвалидировали после чтения версии"""
+        if not self.redis_client:
+            return False
+
+        try:
+            payload = json.dumps(record, default=_cache_json_default)
+            keys = [self._make_identity_version_key(alias)] + [self._make_identity_key(a) for a in aliases]
+            return bool(await self.redis_client.eval(SET_IDENTITY_IF_VERSION_SCRIPT, len(keys), *keys, version, payload, ttl_seconds))
+        except Exception as e:
+            logger.warning("Redis identity set error: %s", e)
+            return False
+
+    async def invalidate_identities(self, aliases: list, channel: str):
+        """Удаляет записи из Redis, увеличивает версии алиасов и рассылает алиасы воркерам для очистки локальных кэшей"""
+        if not self.redis_client or not aliases:
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(*[self._make_identity_key(alias) for alias in aliases])
+                for alias in aliases:
+                    pipe.incr(self._make_identity_version_key(alias))
+                    pipe.expire(self._make_identity_version_key(alias), IDENTITY_VERSION_TTL_SECONDS)
+                pipe.publish(channel, json.dumps(aliases))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Redis identity invalidation error: %s", e)
+
+    def _make_llm_response_key(self, cache_key: str) -> str:
+        return f"llm_response:{cache_key}"
+
+    async def get_llm_response(self, cache_key: str) -> Optional[str]:
+        if not self.redis_client:
+            return None
+
+        try:
+            return await self.redis_client.get(self._make_llm_response_key(cache_key))
+        except Exception as e:
+            logger.warning("Redis LLM response get error: %s", e)
+            return None
+
+    async def set_llm_response(self, cache_key: str, answer: str, ttl_seconds: int, max_entries: int) -> int:
+        """Сохраняет ответ и вытесняет самые старые записи сверх max_entries; возвращает число вытесненных"""
+        if not self.redis_client:
+            return 0
+
+        try:
+            key = self._make_llm_response_key(cache_key)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(key, answer, ex=ttl_seconds)
+                pipe.zadd("llm_response_index", {key: time.time()})
+                pipe.zcard("llm_response_index")
+                _, _, size = await pipe.execute()
+
+            if size <= max_entries:
+                return 0
+            evicted = await self.redis_client.zpopmin("llm_response_index", size - max_entries)
+            if evicted:
+                await self.redis_client.delete(*[member for member, _ in evicted])
+            return len(evicted)
+        except Exception as e:
+            logger.warning("Redis LLM response set error: %s", e)
+            return 0
+
+    async def incr_stats(self, name: str, field: str, value: float = 1):
+        """Счётчик в общем для всех воркеров hash"""
+        if not self.redis_client:
+            return
+
+        try:
+            await self.redis_client.hincrbyfloat(name, field, value)
+        except Exception as e:
+            logger.warning("Redis stats error: %s", e)
+
+    async def get_stats(self, name: str) -> dict:
+        if not self.redis_client:
+            return {}
+
+        try:
+            return {field: float(value) for field, value in (await self.redis_client.hgetall(name)).items()}
+        except Exception as e:
+            logger.warning("Redis stats error: %s", e)
+            return {}
+
+    async def get_semantic_entries(self, key: str, count: int) -> list:
+        if not self.redis_client:
+            return []
+
+        try:
+            return [json.loads(entry) for entry in await self.redis_client.lrange(key, -count, -1)]
+        except Exception as e:
+            logger.warning("Redis semantic index read error: %s", e)
+            return []
+
+    async def append_semantic_entry(self, key: str, entry: str, max_entries: int, ttl_seconds: int):
+        if not self.redis_client:
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.rpush(key, entry)
+                pipe.ltrim(key, -max_entries, -1)
+                pipe.expire(key, ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Redis semantic index write error: %s", e)
+
+    async def governor_acquire(self, rpm: int, tpm: int, tokens: int, share: float, lease_id: str, lease_seconds: float, initial_limit: float) -> Optional[tuple]:
+        """(выдан ли слот, сколько секунд ждать, причина); None без Redis — вызов не ограничивается"""
+        if not self.redis_client:
+            return None
+        
+        try:
+            granted, wait, reason = await self.redis_client.eval(
+                LLM_GOVERNOR_ACQUIRE_SCRIPT, len(LLM_GOVERNOR_KEYS), *LLM_GOVERNOR_KEYS,
+                rpm, tpm, tokens, share, lease_id, lease_seconds, initial_limit
+            )
+            return bool(granted), float(wait), reason
+        except Exception as e:
+            logger.warning("Redis LLM governor acquire error: %s", e)
+            return None
+    
+    async def governor_release(self, lease_id: str, token_correction: int, outcome: str, retry_after: float, limits: tuple, decrease: float, slow_decrease: float, cooldown: float) -> Optional[float]:
+        """Возвращает слот и сообщает исход запроса; limits — (начальный, минимальный, максимальный) лимит"""
+        if not self.redis_client:
+            return None
+        
+        try:
+            limit = await self.redis_client.eval(
+                LLM_GOVERNOR_RELEASE_SCRIPT, len(LLM_GOVERNOR_KEYS), *LLM_GOVERNOR_KEYS,
+                lease_id, token_correction, outcome, retry_after, *limits, decrease, slow_decrease, cooldown
+            )
+            return float(limit)
+        except Exception as e:
+            logger.warning("Redis LLM governor release error: %s", e)
             return None
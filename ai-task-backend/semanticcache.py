@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import hashlib
+import importlib
+import json
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+import numpy as np
+
+from metrics import metrics
+from redismanager import RedisManager
+
+
+class Embedder(Protocol):
+    dim: int
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Матрица (len(texts), dim) float32 с L2-нормированными строками"""
+        ...
+
+
+class HashedNgramEmbedder:
+    """Локальный эмбеддер без сети: символьные n-граммы, хешированные в вектор фиксированной длины"""
+
+    def __init__(self, dim: int = 1024, ngram_sizes: tuple = (3, 4, 5)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def _normalize(self, text: str) -> str:
+        return " " + re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text.lower())).strip() + " "
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            normalized = self._normalize(text)
+            for size in self.ngram_sizes:
+                for start in range(max(len(normalized) - size + 1, 0)):
+                    bucket = zlib.crc32(normalized[start:start + size].encode())
+                    # Старший бит хеша задаёт знак, чтобы коллизии взаимно гасились
+                    vectors[row, bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def load_embedder(spec: str, dim: int = 1024) -> Embedder:
+    """"hashed" — встроенный эмбеддер, иначе "module:attr" — фабрика или класс без аргументов"""
+    if spec == "hashed":
+        return HashedNgramEmbedder(dim=dim)
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+def _encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.astype(np.float16).tobytes()).decode()
+
+
+def _decode_vector(payload: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload), dtype=np.float16).astype(np.float32)
+
+
+class TaskVectorIndex:
+    """Ограниченный индекс одной задачи: матрица векторов и ответы, самые старые вытесняются"""
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.context_hashes: list = []
+        self.answers: list = []
+        self.loaded_at = time.monotonic()
+
+    def add(self, vectors: np.ndarray, context_hashes: list, answers: list):
+        self.vectors = np.vstack([self.vectors, vectors])[-self.max_entries:]
+        self.context_hashes = (self.context_hashes + context_hashes)[-self.max_entries:]
+        self.answers = (self.answers + answers)[-self.max_entries:]
+
+    def search(self, vector: np.ndarray, context_hash: str) -> tuple:
+        """(сходство, ответ) ближайшей записи с тем же контекстом или (0.0, None)"""
+        if not self.answers:
+            return 0.0, None
+        scores = self.vectors @ vector
+        mask = np.fromiter((h == context_hash for h in self.context_hashes), dtype=bool, count=len(self.context_hashes))
+        if not mask.any():
+            return 0.0, None
+        scores = np.where(mask, scores, -1.0)
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.answers[best]
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+
+class SemanticCache:
+    """Кэш ответов на близкие по смыслу вопросы в рамках одной задачи.
+
+    Ответ переиспользуется, только если он был получен с тем же системным промптом
+    (контекстом задачи). Индексы задач живут в LRU процесса и восстанавливаются из Redis.
+    """
+
+    def __init__(self, redis: RedisManager, embedder: Embedder, threshold: float = 0.87, max_entries_per_task: int = 200, max_tasks: int = 1000, ttl_seconds: int = 86400, refresh_seconds: float = 30):
+        self.redis = redis
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries_per_task = max_entries_per_task
+        self.max_tasks = max_tasks
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._indexes: OrderedDict = OrderedDict()
+
+    def _make_index_key(self, task_id: int, user_id: int) -> str:
+        return f"semantic_index:{task_id}:{user_id}"
+
+    def context_hash(self, system_prompt: str) -> str:
+        return hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+
+    async def _embed(self, text: str) -> np.ndarray:
+        # Эмбеддинг — CPU-работа NumPy или модели, она не должна блокировать event loop воркера
+        return await asyncio.get_running_loop().run_in_executor(None, self.embedder.embed, [text])
+
+    async def _get_index(self, task_id: int, user_id: int) -> TaskVectorIndex:
+        key = (task_id, user_id)
+        index = self._indexes.get(key)
+        # Записи других воркеров подтягиваются из Redis не реже refresh_seconds
+        if index is None or time.monotonic() - index.loaded_at > self.refresh_seconds:
+            index = TaskVectorIndex(self.embedder.dim, self.max_entries_per_task)
+            entries = await self.redis.get_semantic_entries(self._make_index_key(task_id, user_id), self.max_entries_per_task)
+            if entries:
+                index.add(
+                    np.vstack([_decode_vector(entry["vector"]) for entry in entries]),
+                    [entry["context_hash"] for entry in entries],
+                    [entry["answer"] for entry in entries]
+                )
+            self._indexes[key] = index
+        self._indexes.move_to_end(key)
+        while len(self._indexes) > self.max_tasks:
+            self._indexes.popitem(last=False)
+        return index
+
+    async def lookup(self, task_id: int, user_id: int, system_prompt: str, prompt: str) -> Optional[str]:
+        vector = await self._embed(prompt)
+        index = await self._get_index(task_id, user_id)
+        score, answer = index.search(vector[0], self.context_hash(system_prompt))
+        name = "hits" if answer is not None and score >= self.threshold else "misses"
+        self.stats[name] += 1
+        metrics.inc("cache_requests_total", cache="semantic", result=name)
+        await self.redis.incr_stats("semantic_cache_stats", name)
+        return answer if name == "hits" else None
+
+    async def store(self, task_id: int, user_id: int, system_prompt: str, prompt: str, answer: str):
+        vector = await self._embed(prompt)
+        context_hash = self.context_hash(system_prompt)
+        index = await self._get_index(task_id, user_id)
+        index.add(vector, [context_hash], [answer])
+        entry = json.dumps({"vector": _encode_vector(vector[0]), "context_hash": context_hash, "answer": answer})
+        await self.redis.append_semantic_entry(self._make_index_key(task_id, user_id), entry, self.max_entries_per_task, self.ttl_seconds)
+        self.stats["stores"] += 1
+        await self.redis.incr_stats("semantic_cache_stats", "stores")
+
+    def memory_bytes(self) -> int:
+        return sum(index.nbytes for index in self._indexes.values())
@@ -0,0 +1,20 @@
+"""Запуск Celery воркера по имени профиля из celery_config.WORKER_PROFILES:
+
+    python worker.py llm
+    python worker.py db --loglevel=INFO
+    WORKER_PROFILE=db python worker.py
+"""
+import sys
+
+from celery_config import celery_app, worker_argv, WORKER_PROFILES
+from config import WORKER_PROFILE
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    profile = WORKER_PROFILE
+    if args and not args[0].startswith("-"):
+        profile, args = args[0], args[1:]
+    if profile not in WORKER_PROFILES:
+        sys.exit(f"Unknown worker profile {profile!r}, expected one of: {', '.join(WORKER_PROFILES)}")
+    # Аргументы после имени профиля дописываются в конец и перекрывают значения профиля
+    celery_app.worker_main(worker_argv(profile) + args)
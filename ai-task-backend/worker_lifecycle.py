@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from celery.signals import task_postrun, task_prerun, task_retry, worker_process_init, worker_process_shutdown, worker_shutdown
+
+from config import DATABASE_URL, REDIS_URL, EXCHANGE_WRITE_BEHIND, EXCHANGE_BUFFER_SIZE, EXCHANGE_BATCH_SIZE, EXCHANGE_FLUSH_SECONDS, EXCHANGE_MAX_RETRIES, EXCHANGE_RETRY_SECONDS, METRICS_FLUSH_SECONDS
+from databasemanager import DatabaseManager
+from exchangewriter import ExchangeWriter
+from llmmanager import LLMManager
+from metrics import metrics
+from redismanager import RedisManager
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerResources:
+    """Долгоживущие ресурсы процесса воркера: event loop, пул соединений БД, Redis и LLM клиент"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="worker-event-loop", daemon=True)
+        self._thread.start()
+
+        self.redis_manager = RedisManager(REDIS_URL)
+        self.db_manager = DatabaseManager(DATABASE_URL, cache=self.redis_manager)
+        self.llm_manager = LLMManager(db=self.db_manager, redis=self.redis_manager)
+        self.exchange_writer = ExchangeWriter(
+            self.db_manager,
+            enabled=EXCHANGE_WRITE_BEHIND,
+            max_buffer=EXCHANGE_BUFFER_SIZE,
+            batch_size=EXCHANGE_BATCH_SIZE,
+            flush_interval=EXCHANGE_FLUSH_SECONDS,
+            max_retries=EXCHANGE_MAX_RETRIES,
+            retry_delay=EXCHANGE_RETRY_SECONDS
+        )
+        self._metrics_task: Optional[asyncio.Task] = None
+        self.run(self._startup())
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _startup(self):
+        await self.redis_manager.init_redis()
+        await self.db_manager.identity_cache.start()
+        await self.exchange_writer.start()
+        if metrics.enabled:
+            self._metrics_task = asyncio.create_task(self._flush_metrics_loop())
+
+    async def _flush_metrics_loop(self):
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+            await metrics.flush(self.redis_manager.redis_client)
+
+    async def _shutdown(self):
+        # Буфер обменов сбрасывается до закрытия пула соединений
+        await self.exchange_writer.close()
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            await metrics.flush(self.redis_manager.redis_client)
+        await self.db_manager.identity_cache.close()
+        await self.llm_manager.close()
+        await self.redis_manager.close()
+        await self.db_manager.close()
+
+    def run(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        try:
+            self.run(self._shutdown())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+            self.loop.close()
+
+
+_resources: Optional[WorkerResources] = None
+_resources_lock = threading.Lock()
+
+
+def get_resources() -> WorkerResources:
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                _resources = WorkerResources()
+    return _resources
+
+
+def run_async(coro):
+    return get_resources().run(coro)
+
+
+def get_db_manager() -> DatabaseManager:
+    return get_resources().db_manager
+
+
+def get_llm_manager() -> LLMManager:
+    return get_resources().llm_manager
+
+
+def get_redis_manager() -> RedisManager:
+    return get_resources().redis_manager
+
+
+def get_exchange_writer() -> ExchangeWriter:
+    return get_resources().exchange_writer
+
+
+def shutdown_resources():
+    global _resources
+    with _resources_lock:
+        resources, _resources = _resources, None
+    if resources is not None:
+        resources.close()
+        logger.info("Worker resources disposed")
+
+
+def _forget_resources_after_fork():
+    # Поток event loop не переживает fork, поэтому дочерний процесс создаёт свои ресурсы заново
+    global _resources, _resources_lock
+    _resources = None
+    _resources_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_resources_after_fork)
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    get_resources()
+    logger.info("Worker process %s resources initialized", os.getpid())
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker_process(**kwargs):
+    shutdown_resources()
+
+
+@worker_shutdown.connect
+def _shutdown_worker(**kwargs):
+    # Для solo/threads пулов ресурсы живут в главном процессе
+    shutdown_resources()
+
+
+# Время выполнения задач по task_id: prerun и postrun приходят в одном потоке исполнителя
+_task_started: dict = {}
+
+
+@task_prerun.connect
+def _task_started_metric(task_id=None, **kwargs):
+    if metrics.enabled:
+        _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_finished_metric(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.observe("celery_task_seconds", time.perf_counter() - started, task=task.name, state=state)
+
+
+@task_retry.connect
+def _task_retry_metric(sender=None, **kwargs):
+    metrics.inc("celery_task_retries_total", task=sender.name if sender else "unknown")
@@ -0,0 +1,27 @@
+import os
+import sys
+
+from celery import Celery
+
+from config import REDIS_URL
+
+# Общий с API клиент задач backend
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ai-task-common"))
+from celeryrpc import BackendRPC  # noqa: E402
+
+backend_celery = Celery(
+    "bot-client",
+    broker=f"{REDIS_URL}/0",
+    backend=f"{REDIS_URL}/1"
+)
+
+# В Redis транспорте 0 — наивысший приоритет, как в celery_config backend
+PRIORITY_INTERACTIVE = 0
+
+backend_celery.conf.task_routes = {
+    "authenticate_telegram_user": {"queue": "user_auth", "priority": PRIORITY_INTERACTIVE},
+    "get_user_by_telegram_id": {"queue": "user_auth", "priority": PRIORITY_INTERACTIVE},
+    "get_user_tasks": {"queue": "task_management", "priority": PRIORITY_INTERACTIVE},
+}
+
+backend_rpc = BackendRPC(REDIS_URL, backend_celery)
@@ -0,0 +1,84 @@
+"""Bot handler concurrency with simulated slow backend tasks: blocking .get() vs BackendRPC.
+
+A fake worker consumes Celery messages from the Redis broker and answers after --delay
+seconds, so only Redis is required:
+
+    python -m benchmarks.bench_handler_concurrency --handlers 50 --delay 1.0
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+import redis.asyncio as redis
+
+from backendrpc import backend_celery, backend_rpc
+from config import REDIS_URL
+
+PRIORITY_SEPARATOR = "\x06\x16"
+
+
+async def fake_worker(delay: float):
+    broker = redis.from_url(f"{REDIS_URL}/0", decode_responses=True)
+    results = redis.from_url(f"{REDIS_URL}/1", decode_responses=True)
+    queues = [f"{queue}{PRIORITY_SEPARATOR}{priority}" if priority else queue
+              for queue in ("user_auth", "task_management", "celery") for priority in range(10)]
+
+    async def _answer(task_id: str, args: list):
+        await asyncio.sleep(delay)
+        key = f"celery-task-meta-{task_id}"
+        meta = json.dumps({"status": "SUCCESS", "result": {"id": args[0]}, "traceback": None, "children": [],
+                           "date_done": datetime.now(timezone.utc).isoformat(), "task_id": task_id})
+        await results.set(key, meta, ex=600)
+        await results.publish(key, meta)
+
+    while True:
+        popped = await broker.brpop(queues, timeout=1)
+        if popped:
+            message = json.loads(popped[1])
+            args, _, _ = json.loads(base64.b64decode(message["body"]))
+            asyncio.create_task(_answer(message["headers"]["id"], args))
+
+
+async def blocking_handler(user_id: int) -> float:
+    # Старый путь: .get() блокирует event loop бота
+    started = time.perf_counter()
+    backend_celery.send_task("get_user_by_telegram_id", args=[user_id]).get(timeout=60)
+    return time.perf_counter() - started
+
+
+async def async_handler(user_id: int) -> float:
+    started = time.perf_counter()
+    await backend_rpc.call("get_user_by_telegram_id", args=[user_id], timeout=60)
+    return time.perf_counter() - started
+
+
+async def measure(label: str, handler, handlers: int):
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(handler(user_id) for user_id in range(handlers)))
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    print(f"{label:<22} handlers={handlers} wall={wall:7.2f}s mean={statistics.fmean(latencies):6.2f}s "
+          f"p95={ordered[round(0.95 * (len(ordered) - 1))]:6.2f}s")
+
+
+async def main(args):
+    # Фейковый воркер в отдельном потоке, чтобы блокирующий .get() не останавливал и его
+    threading.Thread(target=asyncio.run, args=(fake_worker(args.delay),), daemon=True).start()
+    await backend_rpc.start()
+    try:
+        await measure("before: blocking .get()", blocking_handler, args.handlers)
+        await measure("after: BackendRPC", async_handler, args.handlers)
+    finally:
+        await backend_rpc.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--handlers", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
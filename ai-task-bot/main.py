@@ -1,15 +1,10 @@
 import asyncio
-from aiogram import Bot, Dispatcher, types
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.filters import Command
 from config import BOT_TOKEN
-from celery import Celery
-
-backend_celery = Celery(
-    "bot-client",
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/1"
-)
+from backendrpc import backend_celery, backend_rpc
 
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher(storage=MemoryStorage())
@@ -20,7 +15,7 @@ async def start_command(message: types.Message):
         return
         
     try:
-        result = backend_celery.send_task(
+        user_data = await backend_rpc.call(
             "authenticate_telegram_user",
             args=[
                 message.from_user.id,
@@ -34,8 +29,6 @@ async def start_command(message: types.Message):
             ]
         )
         
-        user_data = result.get(timeout=10)
-        
         if user_data:
             await message.answer(f"Добро пожаловать! Для помощи введите /help")
         else:
@@ -56,7 +49,7 @@ async def help_command(message: types.Message):
 async def status_command(message: types.Message):
     try:
         inspect = backend_celery.control.inspect()
-        stats = inspect.stats()
+        stats = await asyncio.to_thread(inspect.stats)
         
         if stats:
             await message.answer("✅ Backend workers активны!")
@@ -69,32 +62,56 @@ async def status_command(message: types.Message):
         await message.answer(f"❌ Ошибка: {str(e)}")
 
         
+TASKS_PAGE_SIZE = 10
+
+async def send_tasks_page(message: types.Message, telegram_id: int, cursor: str = ""):
+    user = await backend_rpc.call("get_user_by_telegram_id", args=[telegram_id])
+    if not user:
+        await message.answer("Сначала выполните /start")
+        return
+
+    page = await backend_rpc.call("get_user_tasks", args=[user["id"], cursor, TASKS_PAGE_SIZE])
+    if not page or not page["tasks"]:
+        await message.answer("У пользователя пока нет задач")
+        return
+
+    tasks_list = "\n".join([f"{task['id']}. {task['task_name']}" for task in page["tasks"]])
+    keyboard = None
+    if page["next_cursor"]:
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="Далее ➡️", callback_data=f"tasks:{page['next_cursor']}")
+        ]])
+    await message.answer(f"Ваши задачи:\n{tasks_list}", reply_markup=keyboard)
+        
 @dp.message(Command("view_tasks"))
 async def view_tasks_command(message: types.Message):
     if not message.from_user:
         return
         
     try:
-        result = backend_celery.send_task(
-            "get_user_tasks",
-            args=[message.from_user.id]
-        )
-
-        tasks = result.get(timeout=10)
-        
-        if not tasks:
-            await message.answer("У пользователя пока нет задач")
-            return
-        
-        tasks_list = "\n".join([f"{task['id']}. {task['title']}" for task in tasks])
-        await message.answer(f"Ваши задачи:\n{tasks_list}")
-        
+        await send_tasks_page(message, message.from_user.id)
     except Exception as e:
         print(f"❌ Ошибка получения задач: {e}")
         await message.answer("❌ Ошибка: не удалось получить задачи")
 
+@dp.callback_query(F.data.startswith("tasks:"))
+async def view_tasks_page_callback(callback: types.CallbackQuery):
+    await callback.answer()
+    if not isinstance(callback.message, types.Message):
+        return
+
+    try:
+        await send_tasks_page(callback.message, callback.from_user.id, callback.data.split(":", 1)[1])
+    except Exception as e:
+        print(f"❌ Ошибка получения задач: {e}")
+        await callback.message.answer("❌ Ошибка: не удалось получить задачи")
+
 async def main():
-    await dp.start_polling(bot)
+    await backend_rpc.start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await backend_rpc.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import uuid
+from typing import Optional
+
+import redis.asyncio as redis
+from celery import Celery
+
+READY_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+
+class BackendRPC:
+    """Асинхронные вызовы задач backend без блокировки event loop.
+
+    Результаты приходят через pub/sub канал celery-task-meta-<id> result backend Celery,
+    одно соединение обслуживает все одновременные вызовы. Общий для API и бота: каждый
+    сервис передаёт свой клиент Celery с маршрутами задач.
+    """
+
+    def __init__(self, redis_url: str, celery_client: Celery):
+        self.celery_client = celery_client
+        self.redis_client = redis.from_url(f"{redis_url}/1", decode_responses=True)
+        self.pubsub = self.redis_client.pubsub()
+        self.pending: dict = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        # pubsub.listen завершается сразу, если нет ни одной подписки
+        await self.pubsub.subscribe("backend_rpc:keepalive")
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+        await self.pubsub.close()
+        await self.redis_client.close()
+
+    async def send(self, name: str, args: list, task_id: Optional[str] = None, **options) -> str:
+        task_id = task_id or str(uuid.uuid4())
+        # Публикация в брокер — блокирующий вызов, выносим его из event loop
+        await asyncio.to_thread(self.celery_client.send_task, name, args=args, task_id=task_id, **options)
+        return task_id
+
+    async def call(self, name: str, args: list, timeout: float = 10, **options):
+        task_id = str(uuid.uuid4())
+        channel = f"celery-task-meta-{task_id}"
+        future = asyncio.get_running_loop().create_future()
+        self.pending[channel] = future
+        try:
+            await self.pubsub.subscribe(channel)
+            await self.send(name, args, task_id=task_id, **options)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(channel, None)
+            await self.pubsub.unsubscribe(channel)
+
+    async def _listen(self):
+        async for message in self.pubsub.listen():
+            if message["type"] != "message":
+                continue
+            future = self.pending.get(message["channel"])
+            if future is None or future.done():
+                continue
+            meta = json.loads(message["data"])
+            if meta["status"] not in READY_STATES:
+                continue
+            if meta["status"] == "SUCCESS":
+                future.set_result(meta["result"])
+            else:
+                future.set_exception(RuntimeError(f"Backend task failed: {meta.get('result')}"))
@@ -0,0 +1,113 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Optional
+
+from config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE
+
+# Атрибуты LogRecord, которые не считаются дополнительными полями (extra=...)
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class DebugSampler(logging.Filter):
+    """Пропускает долю rate записей DEBUG; записи уровня INFO и выше проходят всегда"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON строка на запись; поля из extra=... добавляются как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(spec: str) -> dict:
+    """"sqlalchemy.engine=INFO,redismanager=DEBUG" -> {"sqlalchemy.engine": "INFO", ...}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class _LoggingState:
+    def __init__(self, queue_handler: logging.handlers.QueueHandler, output: logging.Handler):
+        self.queue_handler = queue_handler
+        self.output = output
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self):
+        # Запись в stderr идёт в отдельном потоке; вызывающий код только кладёт запись в очередь
+        self.queue_handler.queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+_state: Optional[_LoggingState] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, module_levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT, debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE):
+    """Настраивает корневой логгер процесса: очередь -> поток записи в stderr. Повторный вызов ничего не меняет"""
+    global _state
+    if _state is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(process)d] %(message)s"))
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(DebugSampler(debug_sample_rate))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+    for name, module_level in parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _state = _LoggingState(queue_handler, output)
+    _state.start()
+    atexit.register(_stop_listener)
+
+
+def _stop_listener():
+    if _state is not None:
+        _state.stop()
+
+
+def _restart_listener_after_fork():
+    # Поток записи не переживает fork: дочерний процесс (prefork воркер) запускает свой
+    if _state is not None:
+        _state.listener = None
+        _state.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)